@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import urllib.parse
+
+import api_server
+import synthetic_catalog
+import track_library
+from jukebox_model import JukeboxModel
+from library_item import LibraryItem
+
+# Load generator for api_server.py. Opens several keep-alive connections,
+# pipelines requests on each and reports requests per second and latency.
+# Without --url it starts an in-process server over a synthetic catalog.
+
+REQUEST_MIX = [
+    ("GET", "/tracks/{id}", None, 40),
+    ("GET", "/tracks?limit=20&offset={offset}", None, 15),
+    ("GET", "/search?q={term}&type=ALL&limit=20", None, 10),
+    ("POST", "/tracks/{id}/play", {}, 20),
+    ("POST", "/tracks/{id}/rating", {"rating": "{rating}"}, 10),
+    ("GET", "/playlist", None, 5),
+]
+SEARCH_TERMS = ["love", "night", "fire", "kings", "blue", "zzz"]
+
+
+def build_requests(host, ids, count, seed):
+    # Pre-encode `count` requests so the client loop only does I/O
+    rng = random.Random(seed)
+    weights = [entry[3] for entry in REQUEST_MIX]
+    requests = []
+    for _ in range(count):
+        method, template, body, _ = rng.choices(REQUEST_MIX, weights)[0]
+        path = template.format(
+            id=urllib.parse.quote(rng.choice(ids)),
+            offset=rng.randrange(max(1, len(ids))),
+            term=rng.choice(SEARCH_TERMS),
+        )
+        payload = b""
+        if body is not None:
+            payload = json.dumps({key: rng.randint(0, 5) if value == "{rating}" else value
+                                  for key, value in body.items()}).encode()
+        head = f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(payload)}\r\n\r\n"
+        requests.append(head.encode("latin-1") + payload)
+    return requests
+
+
+async def read_response(reader):
+    # Read one response, returning its status code
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("server closed the connection")
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+
+async def run_connection(host, port, requests, pipeline_depth, latencies, statuses):
+    # Keep up to pipeline_depth requests outstanding on one connection
+    reader, writer = await asyncio.open_connection(host, port)
+    sent_at = []
+    window = asyncio.Semaphore(pipeline_depth)
+
+    async def send_all():
+        for request in requests:
+            await window.acquire()
+            sent_at.append(time.perf_counter())
+            writer.write(request)
+            await writer.drain()
+
+    sender = asyncio.create_task(send_all())
+    for index in range(len(requests)):
+        status = await read_response(reader)
+        latencies.append(time.perf_counter() - sent_at[index])
+        statuses[status] = statuses.get(status, 0) + 1
+        window.release()
+    await sender
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run_load(host, port, ids, total, connections, pipeline_depth, seed):
+    per_connection = max(1, total // connections)
+    latencies = []
+    statuses = {}
+    workloads = [
+        build_requests(host, ids, per_connection, seed + index) for index in range(connections)
+    ]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_connection(host, port, workload, pipeline_depth, latencies, statuses) for workload in workloads
+    ))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "connections": connections,
+        "pipeline_depth": pipeline_depth,
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed,
+        "latency_ms": {
+            "p50": statistics.median(latencies) * 1000,
+            "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+            "max": latencies[-1] * 1000,
+        },
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+async def main_async(args):
+    if args.url:
+        url = urllib.parse.urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(f"GET /tracks?limit={api_server.MAX_LIMIT} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        ids = [track["id"] for track in json.loads(response.split(b"\r\n\r\n", 1)[1])["tracks"]]
+        return await run_load(host, port, ids, args.requests, args.connections, args.pipeline, args.seed)
+
+    _load_synthetic(args.tracks, args.seed)
+    model = JukeboxModel()
+    server = await api_server.ApiServer(api_server.JukeboxApi(model), "127.0.0.1", 0).start()
+    try:
+        return await run_load("127.0.0.1", server.port, list(track_library.library),
+                              args.requests, args.connections, args.pipeline, args.seed)
+    finally:
+        await server.close()
+
+
+def _load_synthetic(total, seed):
+    track_library.library.clear()
+    for row in synthetic_catalog.iter_rows(total, seed):
+        track_library.library[row[0]] = LibraryItem(row[1], row[2], row[5], row[3], row[4])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate load against the JukeBox JSON API")
+    parser.add_argument("--url", default=None, help="server to load, e.g. http://127.0.0.1:8080 "
+                                                     "(default: start one in-process)")
+    parser.add_argument("--tracks", type=int, default=10_000, help="synthetic catalog size for the in-process server")
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--pipeline", type=int, default=8, help="requests in flight per connection")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+import argparse
+import asyncio
+import json
+import traceback
+import urllib.parse
+from http import HTTPStatus
+
+import track_library
+from jukebox_model import JukeboxModel, SEARCH_TYPES
+from smart_playlist import SmartPlaylist
+
+# Local HTTP/1.1 JSON API over track_library, using only the standard library.
+#
+#   GET    /tracks?offset=0&limit=100    list tracks
+#   GET    /search?q=term&type=ALL       search (limit/offset as above)
+#   GET    /tracks/<id>                  one track
+#   POST   /tracks/<id>/rating           {"rating": 4}
+#   POST   /tracks/<id>/play             record a play
+#   GET    /playlist                     current playlist
+#   POST   /playlist                     {"id": "01"} add a track
+#   DELETE /playlist/<id>                remove a track
+#   GET    /smart-playlists              smart playlist definitions
+#   POST   /smart-playlists              {"name": ..., "rules": [["rating", ">=", 4]], "order_by": ..., "limit": ...}
+#   GET    /smart-playlists/<name>       a smart playlist and its tracks (limit/offset as above)
+#   DELETE /smart-playlists/<name>       delete a smart playlist
+#   POST   /batch                        {"requests": [{"method": ..., "path": ..., "body": ...}]}
+#
+# Connections are kept alive and pipelined requests are answered in order.
+# Backpressure: each connection waits for its socket buffer to drain before
+# reading the next request, and connections beyond MAX_CONNECTIONS are left
+# unread until a slot frees up, so clients feel it through TCP flow control.
+
+MAX_REQUEST_LINE = 8 * 1024
+MAX_HEADERS = 100
+MAX_BODY = 1024 * 1024
+MAX_BATCH = 1000
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 10_000
+MAX_CONNECTIONS = 256  # Connections served at once
+KEEP_ALIVE_TIMEOUT = 15  # Seconds an idle connection is kept open
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def track_to_dict(track_id, track):
+    return {
+        "id": track_id,
+        "name": track.name,
+        "artist": track.artist,
+        "rating": track.rating,
+        "play_count": track.play_count,
+        "image_path": track.image_path,
+    }
+
+
+def _page_args(query):
+    try:
+        offset = max(0, int(query.get("offset", 0)))
+        limit = min(MAX_LIMIT, max(0, int(query.get("limit", DEFAULT_LIMIT))))
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "offset and limit must be integers")
+    return offset, limit
+
+
+def _page(pairs, offset, limit):
+    items = []
+    for index, (track_id, track) in enumerate(pairs):
+        if index < offset:
+            continue
+        if len(items) >= limit:
+            break
+        items.append(track_to_dict(track_id, track))
+    return items
+
+
+class JukeboxApi:
+    # Routes requests to a JukeboxModel; knows nothing about sockets
+
+    def __init__(self, model=None):
+        self.model = model or JukeboxModel()
+
+    def handle(self, method, path, body, in_batch=False):
+        # Return (status, payload) for a parsed request
+        url = urllib.parse.urlsplit(path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        parts = [urllib.parse.unquote(part) for part in url.path.split("/") if part]
+
+        try:
+            return HTTPStatus.OK, self._route(method, parts, query, body, in_batch)
+        except ApiError as e:
+            return e.status, {"error": e.message}
+        except Exception:
+            # A bug must not drop the connection, answer 500 and keep serving
+            traceback.print_exc()
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "internal server error"}
+
+    def _route(self, method, parts, query, body, in_batch=False):
+        if parts == ["tracks"] and method == "GET":
+            offset, limit = _page_args(query)
+            return {"tracks": _page(self.model.tracks(), offset, limit), "total": len(track_library.library)}
+
+        if parts == ["search"] and method == "GET":
+            search_type = query.get("type", "ALL")
+            if search_type not in SEARCH_TYPES:
+                raise ApiError(HTTPStatus.BAD_REQUEST, f"type must be one of {', '.join(SEARCH_TYPES)}")
+            offset, limit = _page_args(query)
+            return {"tracks": _page(self.model.search(query.get("q", ""), search_type), offset, limit)}
+
+        if len(parts) == 2 and parts[0] == "tracks" and method == "GET":
+            return track_to_dict(parts[1], self._get_track(parts[1]))
+
+        if len(parts) == 3 and parts[0] == "tracks" and method == "POST":
+            track_id = parts[1]
+            track = self._get_track(track_id)
+            if parts[2] == "rating":
+                rating = self._field(body, "rating")
+                try:
+                    self.model.update_track(track_id, track.name, track.artist, rating)
+                except (TypeError, ValueError):
+                    raise ApiError(HTTPStatus.BAD_REQUEST, "rating must be an integer")
+                return track_to_dict(track_id, track)
+            if parts[2] == "play":
+                self.model.play_track(track_id)
+                return track_to_dict(track_id, track)
+
+        if parts == ["playlist"]:
+            if method == "GET":
+                return {
+                    "name": self.model.playlist_name,
+                    "tracks": [
+                        track_to_dict(track_id, track) for track_id, track in self.model.playlist_items if track
+                    ],
+                }
+            if method == "POST":
+                track_id = str(self._field(body, "id"))
+                self._get_track(track_id)
+                return {"added": self.model.add_to_playlist(track_id)}
+
+        if len(parts) == 2 and parts[0] == "playlist" and method == "DELETE":
+            return {"removed": self.model.remove_from_playlist(parts[1])}
+
+        if parts == ["smart-playlists"]:
+            if method == "GET":
+                return {"smart_playlists": [
+                    dict(playlist.to_dict(), total=len(playlist)) for playlist in self.model.smart_playlists]}
+            if method == "POST":
+                try:
+                    playlist = SmartPlaylist.from_dict(body)
+                except ValueError as e:
+                    raise ApiError(HTTPStatus.BAD_REQUEST, str(e))
+                self.model.save_smart_playlist(playlist)
+                return dict(playlist.to_dict(), total=len(playlist))
+
+        if len(parts) == 2 and parts[0] == "smart-playlists":
+            if parts[1] not in self.model.smart_playlists:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"no smart playlist named {parts[1]}")
+            if method == "GET":
+                playlist = self.model.smart_playlists.get(parts[1])
+                offset, limit = _page_args(query)
+                return dict(
+                    playlist.to_dict(),
+                    total=len(playlist),
+                    tracks=_page(self.model.smart_playlist_tracks(parts[1]), offset, limit),
+                )
+            if method == "DELETE":
+                return {"removed": self.model.delete_smart_playlist(parts[1])}
+
+        if parts == ["batch"] and method == "POST":
+            if in_batch:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "batches cannot be nested")
+            return {"responses": self._batch(self._field(body, "requests"))}
+
+        raise ApiError(HTTPStatus.NOT_FOUND, f"no route for {method} /{'/'.join(parts)}")
+
+    def _batch(self, requests):
+        # Run several requests in one round trip, in order
+        if not isinstance(requests, list) or len(requests) > MAX_BATCH:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"requests must be a list of at most {MAX_BATCH} items")
+
+        responses = []
+        for request in requests:
+            if not isinstance(request, dict) or not isinstance(request.get("path"), str):
+                responses.append({"status": HTTPStatus.BAD_REQUEST, "body": {"error": "each request needs a path"}})
+                continue
+            method = request.get("method", "GET")
+            if not isinstance(method, str):
+                responses.append({"status": HTTPStatus.BAD_REQUEST, "body": {"error": "method must be a string"}})
+                continue
+            status, payload = self.handle(method.upper(), request["path"], request.get("body"), in_batch=True)
+            responses.append({"status": int(status), "body": payload})
+        return responses
+
+    def _get_track(self, track_id):
+        track = self.model.get_track(track_id)
+        if track is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"no track with id {track_id}")
+        return track
+
+    def _field(self, body, name):
+        if not isinstance(body, dict) or name not in body:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"request body must be a JSON object with '{name}'")
+        return body[name]
+
+
+class ApiServer:
+    def __init__(self, api, host="127.0.0.1", port=8080, max_connections=MAX_CONNECTIONS):
+        self.api = api
+        self.host = host
+        self.port = port
+        self._connection_slots = asyncio.Semaphore(max_connections)
+        self._connection_tasks = set()
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        # Stop accepting connections and close the open ones
+        self._server.close()
+        for task in list(self._connection_tasks):
+            task.cancel()
+        await asyncio.gather(*self._connection_tasks, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def _serve_connection(self, reader, writer):
+        # Answer requests on one connection until it closes or asks to
+        task = asyncio.current_task()
+        self._connection_tasks.add(task)
+        try:
+            async with self._connection_slots:
+                await self._serve_requests(reader, writer)
+        except asyncio.CancelledError:
+            # The server is shutting down
+            writer.close()
+        finally:
+            self._connection_tasks.discard(task)
+
+    async def _serve_requests(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except ApiError as e:
+                    self._write_response(writer, e.status, {"error": e.message}, keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+
+                method, path, body, keep_alive = request
+                status, payload = self.api.handle(method, path, body)
+                self._write_response(writer, status, payload, keep_alive)
+
+                # Stop reading pipelined requests while the client is not reading replies
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader):
+        # Parse one request, returning None on a clean end of stream
+        request_line = await self._read_line(reader, HTTPStatus.REQUEST_URI_TOO_LONG, "request line too long")
+        if not request_line:
+            return None
+        if len(request_line) > MAX_REQUEST_LINE:
+            raise ApiError(HTTPStatus.REQUEST_URI_TOO_LONG, "request line too long")
+
+        try:
+            method, path, version = request_line.decode("latin-1").split()
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "malformed request line")
+
+        headers = {}
+        while True:
+            line = await self._read_line(reader, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "header line too long")
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(line) > MAX_REQUEST_LINE:
+                raise ApiError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "header line too long")
+            if len(headers) >= MAX_HEADERS:
+                raise ApiError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "too many headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        # Only Content-Length bodies are read; guessing where a chunked body
+        # ends would desync the pipelined requests behind it
+        if "transfer-encoding" in headers:
+            raise ApiError(HTTPStatus.NOT_IMPLEMENTED, "Transfer-Encoding is not supported, send Content-Length")
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "invalid Content-Length")
+        if length < 0 or length > MAX_BODY:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "request body too large")
+        body = None
+        if length:
+            raw = await reader.readexactly(length)
+            try:
+                body = json.loads(raw)
+            except ValueError:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "request body is not valid JSON")
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        return method.upper(), path, body, keep_alive
+
+    async def _read_line(self, reader, status, message):
+        # readline() raises ValueError for a line beyond the StreamReader limit
+        try:
+            return await reader.readline()
+        except ValueError:
+            raise ApiError(status, message)
+
+    def _write_response(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        status = HTTPStatus(status)
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+
+
+async def run_server(csv_path, host, port, smart_playlist_file=None):
+    model = JukeboxModel(smart_playlist_file=smart_playlist_file)
+    model.load_csv(csv_path)
+    server = await ApiServer(JukeboxApi(model), host, port).start()
+    print(f"Serving {len(track_library.library)} tracks on http://{server.host}:{server.port}")
+    await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the track library as a local JSON API")
+    parser.add_argument("--csv", default="tracks_data.csv", help="tracks_data.csv-format file to load")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--smart-playlists", default="smart_playlists.json",
+                        help="JSON file smart playlist definitions are kept in")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run_server(args.csv, args.host, args.port, args.smart_playlists))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
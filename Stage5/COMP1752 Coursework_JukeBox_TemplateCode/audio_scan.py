@@ -0,0 +1,463 @@
+import collections
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import os
+import struct
+import tempfile
+
+import track_library
+from library_item import LibraryItem
+
+# Builds library tracks from the tags of the audio files under a folder.
+#
+# Tags are read with the standard library only: ID3v2.2-2.4 (and ID3v1) in
+# MP3 files, Vorbis comments and PICTURE blocks in FLAC files, and LIST/INFO
+# or embedded ID3 chunks in WAV files. Only the metadata is read, never the
+# audio. Embedded cover art is written once per distinct image into the
+# cover folder, named by a hash of its bytes.
+#
+# FolderScanner remembers each file's size and modification time in a
+# small JSON state file, so a rescan only reads the files that were added
+# or changed and removes the tracks of files that are gone.
+
+AUDIO_EXTENSIONS = {".mp3", ".flac", ".wav"}
+COVER_DIR = "images"
+UNKNOWN_ARTIST = "Unknown Artist"
+STATE_VERSION = 1
+HEADER_BYTES = 64 * 1024  # Read per file up front; covers most tags in one read
+COVER_EXTENSIONS = {"image/jpeg": ".jpg", "image/jpg": ".jpg", "image/png": ".png", "image/gif": ".gif",
+                    "jpg": ".jpg", "png": ".png", "gif": ".gif"}  # MIME types, and ID3v2.2 formats
+FRONT_COVER = 3  # ID3 and FLAC picture type
+
+# Tags read from one file; picture is (bytes, MIME type or ID3v2.2 format) or None
+Tags = collections.namedtuple("Tags", ["title", "artist", "picture"])
+
+# What one scan did: track IDs added, changed and removed, how many files
+# were unchanged, and path -> message for files that could not be read
+ScanResult = collections.namedtuple("ScanResult", ["added", "changed", "removed", "unchanged", "errors"])
+
+_ID3_HEADER = struct.Struct(">3sBBBI")
+
+
+class TagError(ValueError):
+    pass
+
+
+def _synchsafe(value):
+    # A 28-bit integer stored in the low 7 bits of four bytes
+    return (value & 0x7F) | (value >> 8 & 0x7F) << 7 | (value >> 16 & 0x7F) << 14 | (value >> 24 & 0x7F) << 21
+
+
+def _decode_text(encoding, data):
+    # An ID3 text field, the first value if there are several
+    if encoding == 0:
+        text = data.decode("latin-1")
+    elif encoding == 1:
+        text = data.decode("utf-16")
+    elif encoding == 2:
+        text = data.decode("utf-16-be")
+    elif encoding == 3:
+        text = data.decode("utf-8")
+    else:
+        raise TagError(f"Unknown ID3 text encoding {encoding}")
+    return text.split("\x00", 1)[0].strip()
+
+
+def _skip_terminated(encoding, data, start):
+    # Offset just past the null terminator of a string in the given ID3 encoding
+    if encoding in (1, 2):
+        position = start
+        while True:
+            end = data.find(b"\x00\x00", position)
+            if end < 0:
+                raise TagError("Unterminated ID3 string")
+            if (end - start) % 2 == 0:
+                return end + 2
+            position = end + 1
+    end = data.find(b"\x00", start)
+    if end < 0:
+        raise TagError("Unterminated ID3 string")
+    return end + 1
+
+
+def _id3_picture(frame_id, data):
+    # (picture type, (bytes, MIME type or format)) of an APIC or PIC frame
+    encoding = data[0]
+    if frame_id == "PIC":
+        mime = data[1:4].decode("latin-1").lower()
+        position = 4
+    else:
+        end = data.index(b"\x00", 1)
+        mime = data[1:end].decode("latin-1").lower()
+        position = end + 1
+    picture_type = data[position]
+    position = _skip_terminated(encoding, data, position + 1)
+    return picture_type, (data[position:], mime)
+
+
+def parse_id3v2(data):
+    # Tags of an ID3v2 tag held in data, which starts with its 10-byte header
+    magic, major, _revision, flags, size = _ID3_HEADER.unpack_from(data)
+    if magic != b"ID3" or major not in (2, 3, 4):
+        raise TagError("Not an ID3v2 tag")
+    body = data[10:10 + _synchsafe(size)]
+    if flags & 0x80 and major < 4:
+        body = body.replace(b"\xff\x00", b"\xff")  # Whole-tag unsynchronisation
+    position = 0
+    if flags & 0x40 and major == 3:
+        position = 4 + struct.unpack_from(">I", body)[0]
+    elif flags & 0x40 and major == 4:
+        position = _synchsafe(struct.unpack_from(">I", body)[0])
+
+    if major == 2:
+        id_size, header_size, names = 3, 6, {"TT2": "title", "TP1": "artist", "PIC": "picture"}
+    else:
+        id_size, header_size, names = 4, 10, {"TIT2": "title", "TPE1": "artist", "APIC": "picture"}
+    found = {}
+    pictures = []
+    while position + header_size <= len(body):
+        frame_id = body[position:position + id_size]
+        if not frame_id.strip(b"\x00"):
+            break  # Padding
+        if major == 2:
+            frame_size = int.from_bytes(body[position + 3:position + 6], "big")
+            frame_flags = 0
+        else:
+            frame_size, frame_flags = struct.unpack_from(">IH", body, position + 4)
+            if major == 4:
+                frame_size = _synchsafe(frame_size)
+        start = position + header_size
+        position = start + frame_size
+        name = names.get(frame_id.decode("latin-1"))
+        if name is None or frame_flags & (0x00C0 if major == 3 else 0x000C):
+            continue  # Not wanted, or compressed/encrypted
+        frame = body[start:position]
+        if major == 4 and frame_flags & 0x0001:
+            frame = frame[4:]  # Data length indicator
+        if major == 4 and frame_flags & 0x0002:
+            frame = frame.replace(b"\xff\x00", b"\xff")
+        if not frame:
+            continue
+        if name == "picture":
+            pictures.append(_id3_picture(frame_id.decode("latin-1"), frame))
+        elif name not in found:
+            found[name] = _decode_text(frame[0], frame[1:])
+    return Tags(found.get("title"), found.get("artist"), _choose_picture(pictures))
+
+
+def parse_id3v1(data):
+    # Tags of the 128-byte ID3v1 tag at the end of an MP3 file
+    if len(data) != 128 or not data.startswith(b"TAG"):
+        return Tags(None, None, None)
+
+    def text(raw):
+        return raw.split(b"\x00", 1)[0].decode("latin-1").strip() or None
+
+    return Tags(text(data[3:33]), text(data[33:63]), None)
+
+
+def _choose_picture(pictures):
+    # The front cover if there is one, otherwise the first picture
+    for picture_type, picture in pictures:
+        if picture_type == FRONT_COVER:
+            return picture
+    return pictures[0][1] if pictures else None
+
+
+def _read_at_least(file, data, size):
+    # data extended from file to at least size bytes, or to the end of the file
+    if len(data) < size:
+        data += file.read(size - len(data))
+    return data
+
+
+def read_mp3_tags(file):
+    data = file.read(HEADER_BYTES)
+    tags = Tags(None, None, None)
+    if data.startswith(b"ID3") and len(data) >= 10:
+        data = _read_at_least(file, data, 10 + _synchsafe(_ID3_HEADER.unpack_from(data)[4]))
+        tags = parse_id3v2(data)
+    if tags.title is None or tags.artist is None:
+        file.seek(0, os.SEEK_END)
+        if file.tell() >= 128:
+            file.seek(-128, os.SEEK_END)
+            old = parse_id3v1(file.read(128))
+            tags = Tags(tags.title or old.title, tags.artist or old.artist, tags.picture)
+    return tags
+
+
+def read_flac_tags(file):
+    data = file.read(HEADER_BYTES)
+    position = 0
+    if data.startswith(b"ID3") and len(data) >= 10:
+        position = 10 + _synchsafe(_ID3_HEADER.unpack_from(data)[4])  # Some taggers prepend ID3
+        data = _read_at_least(file, data, position + 4)
+    if data[position:position + 4] != b"fLaC":
+        raise TagError("Not a FLAC file")
+    position += 4
+    comments = {}
+    pictures = []
+    last = False
+    while not last:
+        data = _read_at_least(file, data, position + 4)
+        if len(data) < position + 4:
+            break
+        header = data[position]
+        last = bool(header & 0x80)
+        block_type = header & 0x7F
+        length = int.from_bytes(data[position + 1:position + 4], "big")
+        start = position + 4
+        position = start + length
+        if block_type not in (4, 6):
+            continue
+        data = _read_at_least(file, data, position)
+        block = data[start:position]
+        if block_type == 4:
+            _read_vorbis_comments(block, comments)
+        else:
+            pictures.append(_flac_picture(block))
+    return Tags(comments.get("TITLE"), comments.get("ARTIST"), _choose_picture(pictures))
+
+
+def _read_vorbis_comments(block, comments):
+    # Add the first value of each KEY=value comment, keys upper-cased
+    (vendor_length,) = struct.unpack_from("<I", block)
+    position = 4 + vendor_length
+    (count,) = struct.unpack_from("<I", block, position)
+    position += 4
+    for _ in range(count):
+        (length,) = struct.unpack_from("<I", block, position)
+        position += 4
+        key, _, value = block[position:position + length].decode("utf-8").partition("=")
+        position += length
+        comments.setdefault(key.upper(), value.strip())
+
+
+def _flac_picture(block):
+    picture_type, mime_length = struct.unpack_from(">II", block)
+    position = 8
+    mime = block[position:position + mime_length].decode("latin-1").lower()
+    position += mime_length
+    (description_length,) = struct.unpack_from(">I", block, position)
+    position += 4 + description_length + 16  # Description, then width, height, depth and colours
+    (data_length,) = struct.unpack_from(">I", block, position)
+    position += 4
+    return picture_type, (block[position:position + data_length], mime)
+
+
+def read_wav_tags(file):
+    header = file.read(12)
+    if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        raise TagError("Not a WAV file")
+    info = {}
+    tags = Tags(None, None, None)
+    while True:
+        chunk = file.read(8)
+        if len(chunk) < 8:
+            break
+        chunk_id, size = struct.unpack("<4sI", chunk)
+        if chunk_id == b"LIST" or chunk_id in (b"id3 ", b"ID3 "):
+            body = file.read(size)
+            if chunk_id == b"LIST" and body[:4] == b"INFO":
+                _read_info(body, info)
+            elif chunk_id != b"LIST":
+                tags = parse_id3v2(body)
+            if size % 2:
+                file.seek(1, os.SEEK_CUR)
+        else:
+            file.seek(size + size % 2, os.SEEK_CUR)  # Skip the audio and anything else
+    return Tags(tags.title or info.get(b"INAM"), tags.artist or info.get(b"IART"), tags.picture)
+
+
+def _read_info(body, info):
+    position = 4
+    while position + 8 <= len(body):
+        key, size = struct.unpack_from("<4sI", body, position)
+        position += 8
+        info.setdefault(key, body[position:position + size].split(b"\x00", 1)[0].decode("latin-1").strip())
+        position += size + size % 2
+
+
+_READERS = {".mp3": read_mp3_tags, ".flac": read_flac_tags, ".wav": read_wav_tags}
+
+
+def read_tags(path):
+    # Tags of an audio file, raising TagError (or OSError) if they cannot be read
+    reader = _READERS[os.path.splitext(path)[1].lower()]
+    with open(path, "rb") as file:
+        try:
+            return reader(file)
+        except TagError:
+            raise
+        except (struct.error, IndexError, ValueError) as e:  # ValueError covers UnicodeDecodeError
+            raise TagError(f"Damaged tags: {e}") from e
+
+
+def save_cover(picture, cover_dir=COVER_DIR):
+    # Write cover art bytes into cover_dir once per distinct image, returning its path
+    data, mime = picture
+    extension = COVER_EXTENSIONS.get(mime, ".img")
+    path = os.path.join(cover_dir, f"cover_{hashlib.sha1(data).hexdigest()[:16]}{extension}")
+    if not os.path.exists(path):
+        os.makedirs(cover_dir, exist_ok=True)
+        # Workers may write the same cover at once, so each writes a temporary file and renames it
+        handle, temp_path = tempfile.mkstemp(prefix=".cover-", dir=cover_dir)
+        try:
+            with os.fdopen(handle, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+    return path
+
+
+def scan_file(path, cover_dir=COVER_DIR):
+    # (title, artist, image path, error message or None) for one audio file.
+    # Files with damaged tags are still tracks, named after the file.
+    title = artist = image_path = error = None
+    try:
+        tags = read_tags(path)
+    except TagError as e:
+        error = str(e)
+    else:
+        title, artist = tags.title, tags.artist
+        if tags.picture is not None and tags.picture[0]:
+            image_path = save_cover(tags.picture, cover_dir)
+    title = title or os.path.splitext(os.path.basename(path))[0]
+    return title, artist or UNKNOWN_ARTIST, image_path, error
+
+
+def _scan_file_args(args):
+    path, cover_dir = args
+    try:
+        return scan_file(path, cover_dir)
+    except OSError as e:
+        return None, None, None, str(e)
+
+
+def iter_audio_files(root):
+    # (path relative to root with "/" separators, size, mtime_ns) of each audio
+    # file, in name order with a folder's files before its subfolders
+    for directory, subdirectories, names in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() not in AUDIO_EXTENSIONS:
+                continue
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # Removed while walking
+            yield os.path.relpath(path, root).replace(os.sep, "/"), stat.st_size, stat.st_mtime_ns
+
+
+def next_track_ids(used):
+    # Numeric track IDs after the highest of the used ones, zero-padded like "01"
+    highest = max((int(track_id) for track_id in used if track_id.isdigit()), default=0)
+    return (str(number).zfill(2) for number in itertools.count(highest + 1))
+
+
+class FolderScanner:
+    # Adds the audio files under root to track_library and keeps them in step
+    # on later scans. state_path (optional) keeps the path -> size, mtime and
+    # track ID record between runs; without it only rescans by the same
+    # scanner are incremental. Ratings and play counts of rescanned tracks
+    # are kept, only the title, artist and cover come from the tags.
+
+    def __init__(self, root, state_path=None, cover_dir=COVER_DIR, jobs=1):
+        self.root = root
+        self.state_path = state_path
+        self.cover_dir = cover_dir
+        self.jobs = jobs
+        self._files = self._load_state()  # Relative path -> [size, mtime_ns, track ID]
+
+    def scan(self):
+        # Read the new and changed files and update track_library, returning a ScanResult.
+        # Raises NotADirectoryError if root is gone, e.g. an unmounted drive,
+        # rather than treating every known file as deleted.
+        if not os.path.isdir(self.root):
+            raise NotADirectoryError(f"Scan folder {self.root} is not a directory")
+        library = track_library.library
+        found = {}
+        to_read = []
+        unchanged = 0
+        for path, size, mtime_ns in iter_audio_files(self.root):
+            found[path] = size, mtime_ns
+            known = self._files.get(path)
+            if known is not None and known[:2] == [size, mtime_ns] and known[2] in library:
+                unchanged += 1
+            else:
+                to_read.append(path)
+
+        added, changed, errors = [], [], {}
+        # IDs recorded for files whose tracks were deleted from the library stay reserved
+        new_ids = next_track_ids(itertools.chain(library, (entry[2] for entry in self._files.values())))
+        work = [(os.path.join(self.root, path), self.cover_dir) for path in to_read]
+        for path, (title, artist, image_path, error) in zip(to_read, self._map(work)):
+            if title is None:
+                errors[path] = error  # Could not be read at all
+                continue
+            if error is not None:
+                errors[path] = error
+            known = self._files.get(path)
+            track_id = known[2] if known is not None else next(new_ids)
+            fields = {"name": title, "artist": artist, "image_path": image_path}
+            track = library.get(track_id)
+            if track is not None:
+                if any(getattr(track, field) != value for field, value in fields.items()):
+                    track_library.update(track_id, **fields)
+                    changed.append(track_id)
+            else:
+                track_library.add(track_id, LibraryItem(title, artist, image_path=image_path))
+                added.append(track_id)
+            self._files[path] = [*found[path], track_id]
+
+        removed = []
+        # An empty walk over a folder that had files is more likely a drive
+        # not yet mounted than a deleted library, so nothing is removed
+        gone = [path for path in self._files if path not in found] if found else []
+        for path in gone:
+            track_id = self._files.pop(path)[2]
+            if track_library.remove(track_id) is not None:
+                removed.append(track_id)
+        if self.state_path is not None:
+            self._save_state()
+        return ScanResult(added, changed, removed, unchanged, errors)
+
+    def _map(self, work):
+        if self.jobs <= 1 or len(work) < 2:
+            return map(_scan_file_args, work)
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.jobs)
+        chunk_size = max(1, len(work) // (self.jobs * 4))
+
+        def results():
+            with pool:
+                yield from pool.map(_scan_file_args, work, chunksize=chunk_size)
+        return results()
+
+    def _load_state(self):
+        if self.state_path is None or not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, "r", encoding="utf-8") as file:
+            state = json.load(file)
+        if state.get("version") != STATE_VERSION or state.get("root") != os.path.abspath(self.root):
+            return {}  # Another format or folder, read everything again
+        return state["files"]
+
+    def _save_state(self):
+        # Replace the state file in one rename, like track_library.save_csv()
+        state = {"version": STATE_VERSION, "root": os.path.abspath(self.root), "files": self._files}
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        handle, temp_path = tempfile.mkstemp(prefix=".scan-", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as file:
+                json.dump(state, file, separators=(",", ":"))
+            os.replace(temp_path, self.state_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
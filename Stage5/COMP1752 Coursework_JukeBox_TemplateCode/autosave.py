@@ -0,0 +1,112 @@
+import threading
+import time
+
+import track_library
+
+AUTOSAVE_DELAY = 2.0  # Seconds without changes before the library is saved
+AUTOSAVE_MAX_DELAY = 30.0  # Longest a change waits for a save while edits keep coming
+
+
+class AutoSaver:
+    # Saves track_library to its CSV file from a background thread once edits settle.
+    #
+    # Each change notification pushes the save back to `delay` seconds
+    # later, but never past `max_delay` after the first unsaved change. A
+    # burst of edits therefore costs one save and a steady stream of plays
+    # one save per max_delay, so the number of full rewrites depends on
+    # time, not on how many edits are made. Nothing is written while the
+    # library has no unsaved changes, nor while hold() returns True, e.g.
+    # while an outside edit to the file has not been merged yet; a held
+    # save is tried again after another quiet period.
+
+    def __init__(self, path, delay=AUTOSAVE_DELAY, max_delay=AUTOSAVE_MAX_DELAY, save=track_library.save_csv,
+                 hold=None):
+        self.path = path
+        self.delay = delay
+        self.max_delay = max_delay
+        self._save = save  # save(path), track_library.save_csv by default
+        self._hold = hold
+        self.saves = 0
+        self.held = False  # Whether the last save was held back by hold()
+        self.last_error = None  # OSError of the last failed background save
+
+        self._condition = threading.Condition()
+        self._save_lock = threading.Lock()
+        self._due = None  # time.monotonic() of the next save
+        self._deadline = None  # Latest the next save may be pushed back to
+        self._closed = False
+
+        track_library.subscribe(self._on_change)
+        self._subscribed = True
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    def schedule(self):
+        # Save after the next quiet period, e.g. after a change made without notifications
+        with self._condition:
+            self._schedule_locked()
+
+    def flush(self):
+        # Save now if there are unsaved changes, returning whether a save was made
+        with self._condition:
+            self._due = self._deadline = None
+        return self._save_if_dirty()
+
+    def close(self):
+        # Stop the thread and save what is left, raising OSError if that fails
+        if self._subscribed:
+            track_library.unsubscribe(self._on_change)
+            self._subscribed = False
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def _schedule_locked(self):
+        now = time.monotonic()
+        if self._deadline is None:
+            self._deadline = now + self.max_delay
+        waiting = self._due is not None
+        self._due = min(now + self.delay, self._deadline)
+        if not waiting:
+            self._condition.notify()
+
+    def _on_change(self, change):
+        self.schedule()
+
+    def _save_if_dirty(self):
+        with self._save_lock:
+            if not track_library.is_dirty():
+                return False
+            self.held = self._hold is not None and self._hold()
+            if self.held:
+                return False
+            self._save(self.path)
+            self.saves += 1
+            self.last_error = None
+            return True
+
+    def _run(self):
+        with self._condition:
+            while not self._closed:
+                if self._due is None:
+                    self._condition.wait()
+                    continue
+                remaining = self._due - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                self._due = self._deadline = None
+                self._condition.release()
+                try:
+                    failed = False
+                    self._save_if_dirty()
+                except OSError as e:
+                    self.last_error = e
+                    failed = True
+                finally:
+                    self._condition.acquire()
+                if (failed or self.held) and not self._closed:
+                    # The changes stay dirty, try again after another quiet period
+                    self._schedule_locked()
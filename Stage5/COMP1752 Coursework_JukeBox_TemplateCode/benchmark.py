@@ -0,0 +1,430 @@
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import main
+import parallel_load
+import synthetic_catalog
+import track_library
+from jukebox_model import JukeboxModel
+from image_registry import THUMBNAIL_SIZE, ImageRegistry
+from library_index import LibraryIndexes
+from library_item import LibraryItem
+from play_stats import PlayCharts
+from recommend import Recommender
+from shuffle import ShuffleEngine
+from smart_playlist import SmartPlaylist, SmartPlaylists
+
+# Benchmarks for the JukeBox hot paths over synthetic catalogs.
+# Usage: python benchmark.py --sizes 1000,100000 --output results.json
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+PLAYLIST_OPERATIONS = 2_000  # Playlist adds/removes per run, capped by catalog size
+THUMBNAILS = 100  # Covers decoded per run, capped by catalog size
+CONSTRUCT_ROWS = 1_000_000  # Rows kept in memory for the LibraryItem benchmark
+SMART_PLAYLISTS = 300  # Active smart playlists during the update benchmark
+SMART_UPDATES = 2_000  # Library updates per run, capped by catalog size
+SMART_REBUILDS = 10  # Playlists evaluated from scratch for comparison
+SHUFFLE_TRACKS = 10_000  # Shuffled tracks produced per run, capped by catalog size
+PLAY_EVENTS = 100_000  # Plays charted per run, one per simulated second
+PLAYLIST_LENGTH = 1_000  # Tracks per playlist in the recommender rebuild
+INDEX_UPDATES = 2_000  # Library updates per run with every sorted index built
+LOAD_JOBS = [1, 2, 4, 8]  # Worker processes for the parallel load benchmarks
+PIL_BENCHMARKS = ["thumbnail_decode", "thumbnail_shared"]
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    # Register a benchmark taking (context, size) and returning items processed
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def load_library(csv_path):
+    track_library.library.clear()
+    JukeboxModel().load_csv(csv_path)
+
+
+@benchmark("csv_load")
+def bench_csv_load(context, size):
+    load_library(context["csv_path"])
+    return len(track_library.library)
+
+
+def parallel_csv_load(jobs):
+    # The csv_load benchmark split across `jobs` worker processes, whatever the file size
+    def bench(context, size):
+        track_library.library.clear()
+        for track_id, item in parallel_load.iter_tracks_parallel(context["csv_path"], jobs):
+            track_library.add(track_id, item)
+        track_library.mark_clean()
+        return len(track_library.library)
+    return bench
+
+
+# Load scaling by worker count, compare with csv_load and with meta.cpu_count
+for _jobs in LOAD_JOBS:
+    benchmark(f"csv_load_jobs_{_jobs}")(parallel_csv_load(_jobs))
+
+
+@benchmark("library_item_construct")
+def bench_library_item_construct(context, size):
+    for row in context["rows"]:
+        LibraryItem(row[1], row[2], rating=row[5], play_count=row[3], image_path=row[4])
+    return len(context["rows"])
+
+
+@benchmark("filter_tracks")
+def bench_filter_tracks(context, size):
+    model = JukeboxModel()
+    for term, search_type in [("love", "ALL"), ("night fire", "Tracks"), ("kings", "Artists"), ("zzz", "ALL")]:
+        for _ in model.search(term, search_type):
+            pass
+    return size * 4
+
+
+@benchmark("track_library_accessors")
+def bench_track_library_accessors(context, size):
+    for key in context["ids"]:
+        track_library.get_name(key)
+        track_library.get_artist(key)
+        track_library.get_rating(key)
+        track_library.get_play_count(key)
+    return size * 4
+
+
+@benchmark("track_library_updates")
+def bench_track_library_updates(context, size):
+    for key in context["ids"]:
+        track_library.increment_play_count(key)
+        track_library.set_rating(key, 3)
+    return size * 2
+
+
+@benchmark("list_all")
+def bench_list_all(context, size):
+    track_library.list_all()
+    return size
+
+
+def format_row_uncached(track_id, track):
+    # A list row and an export line formatted from scratch, as before the string cache
+    stars = ""
+    for _ in range(track.rating):
+        stars += "*"
+    label = f"{track.name} - {track.artist}"
+    details = f"Play count: {track.play_count} | Rating: {track.rating}"
+    return label, details, f"{track_id} {label} {stars}\n"
+
+
+@benchmark("row_format_uncached")
+def bench_row_format_uncached(context, size):
+    # Strings for every row of the track list and the text export
+    for track_id, track in track_library.library.items():
+        format_row_uncached(track_id, track)
+    return size
+
+
+@benchmark("row_format_cached")
+def bench_row_format_cached(context, size):
+    # The same strings read from the per-track cache, warmed by the warmup run
+    for track_id, track in track_library.library.items():
+        track.label(), track.details(), f"{track_id} {track.info()}\n"
+    return size
+
+
+@benchmark("export")
+def bench_export(context, size):
+    # The library streamed to a null device in every export format
+    with open(os.devnull, "w") as stream:
+        for output_format in track_library.EXPORT_FORMATS:
+            track_library.export(stream, output_format)
+    return size * len(track_library.EXPORT_FORMATS)
+
+
+@benchmark("playlist_operations")
+def bench_playlist_operations(context, size):
+    model = JukeboxModel()
+    ids = context["ids"][:PLAYLIST_OPERATIONS]
+    for key in ids:
+        model.add_to_playlist(key)
+    for key in ids:
+        model.add_to_playlist(key)  # Duplicates are rejected
+    for key in ids[::2]:
+        model.remove_from_playlist(key)
+    return len(ids) * 2 + len(ids[::2])
+
+
+def smart_playlist_definitions(context, count):
+    # A mix of artist-pinned, top-N and whole-library rules
+    artists = sorted({track_library.get_artist(key) for key in context["ids"][:count * 10]})
+    definitions = []
+    for index in range(count):
+        kind = index % 4
+        if kind == 0:
+            rules = [("artist", "==", artists[index % len(artists)]), ("rating", ">=", 4)]
+            definitions.append(SmartPlaylist(f"artist {index}", rules))
+        elif kind == 1:
+            definitions.append(SmartPlaylist(f"top {index}", order_by="play_count", limit=50))
+        elif kind == 2:
+            rules = [("rating", "==", index % 6), ("play_count", ">=", index)]
+            definitions.append(SmartPlaylist(f"rated {index}", rules))
+        else:
+            rules = [("artist", "==", artists[index % len(artists)])]
+            definitions.append(SmartPlaylist(f"best of {index}", rules, order_by="rating", limit=10))
+    return definitions
+
+
+@benchmark("smart_playlist_updates")
+def bench_smart_playlist_updates(context, size):
+    # Play count and rating updates with SMART_PLAYLISTS playlists kept current.
+    # The playlists are built on the first (warmup) run and dropped after the benchmark.
+    if "smart_playlists" not in context:
+        smart = SmartPlaylists()
+        for playlist in smart_playlist_definitions(context, SMART_PLAYLISTS):
+            smart.add(playlist)
+        context["smart_playlists"] = smart
+    ids = context["ids"][:SMART_UPDATES]
+    for index, key in enumerate(ids):
+        track_library.increment_play_count(key)
+        track_library.set_rating(key, index % 6)
+    return len(ids) * 2
+
+
+@benchmark("smart_playlist_rebuild")
+def bench_smart_playlist_rebuild(context, size):
+    # Evaluating playlists over the whole library, the cost each update would pay without incremental upkeep
+    definitions = smart_playlist_definitions(context, SMART_REBUILDS)
+    for playlist in definitions:
+        playlist.rebuild(track_library.library.items())
+    return len(definitions)
+
+
+@benchmark("sorted_index_updates")
+def bench_sorted_index_updates(context, size):
+    # Play count, rating and name updates moving entries in the sorted indexes.
+    # The indexes are built on the first (warmup) run and dropped after the benchmark.
+    if "library_indexes" not in context:
+        indexes = LibraryIndexes()
+        for field in ("name", "artist", "rating", "play_count"):
+            indexes.index(field)
+        context["library_indexes"] = indexes
+    ids = context["ids"][:INDEX_UPDATES]
+    for index, key in enumerate(ids):
+        track_library.increment_play_count(key)
+        track_library.set_rating(key, index % 6)
+        track_library.update(key, name=f"Track {index}")
+    context["library_indexes"].sorted_ids("play_count", descending=True, stop=100)
+    return len(ids) * 3
+
+
+@benchmark("shuffle_stream")
+def bench_shuffle_stream(context, size):
+    # The first tracks of a constrained shuffle over the whole catalog
+    engine = ShuffleEngine(context["ids"], artist_of=track_library.get_artist, seed=0, no_repeat=50, artist_gap=3)
+    produced = 0
+    for _ in range(min(SHUFFLE_TRACKS, size)):
+        engine.next()
+        produced += 1
+    return produced
+
+
+@benchmark("play_charts")
+def bench_play_charts(context, size):
+    # Plays skewed towards a few popular tracks, counted in every chart window
+    charts = PlayCharts()
+    try:
+        ids = context["ids"]
+        popular = ids[:100]
+        for second in range(PLAY_EVENTS):
+            track_id = popular[second % len(popular)] if second % 3 else ids[(second * 7919) % len(ids)]
+            charts.record(track_id, timestamp=second)
+        for window in charts.windows:
+            charts.windows[window].top(10)
+    finally:
+        charts.close()
+    return PLAY_EVENTS
+
+
+@benchmark("recommend_rebuild")
+def bench_recommend_rebuild(context, size):
+    # Co-occurrences of the whole catalog split into playlists, plus one play per track
+    ids = context["ids"]
+    recommender = Recommender()
+    for start in range(0, len(ids), PLAYLIST_LENGTH):
+        recommender.add_sequence(ids[start:start + PLAYLIST_LENGTH])
+    for index in range(len(ids)):
+        recommender.add_play(ids[(index * 7919) % len(ids)], index * 60)
+    recommender.apply_batch()
+    for track_id in ids[:1000]:
+        recommender.recommend(track_id)
+    return len(ids) * 2
+
+
+@benchmark("thumbnail_decode")
+def bench_thumbnail_decode(context, size):
+    Image, _ = main._import_pil()
+    paths = context["image_paths"][:THUMBNAILS]
+    for path in paths:
+        Image.open(path).resize((80, 80), Image.Resampling.LANCZOS)
+    return len(paths)
+
+
+@benchmark("thumbnail_shared")
+def bench_thumbnail_shared(context, size):
+    # Thumbnails for the first THUMBNAILS track rows, decoded once per distinct image
+    Image, _ = main._import_pil()
+    registry = ImageRegistry(lambda path: Image.open(path).resize(THUMBNAIL_SIZE, Image.Resampling.LANCZOS))
+    rows = context["row_image_paths"][:THUMBNAILS]
+    for path in rows:
+        registry.thumbnail(path)
+    return len(rows)
+
+
+@benchmark("image_registry")
+def bench_image_registry(context, size):
+    # Content hashes for the image path of every track, each file read once
+    registry = ImageRegistry()
+    paths = context["row_image_paths"]
+    registry.add_paths(paths)
+    return len(paths)
+
+
+def pil_available():
+    try:
+        main._import_pil()
+    except ImportError:
+        return False
+    return True
+
+
+def prepare(scratch_dir, size, seed, image_count):
+    # Write the catalog for one size and load it into track_library
+    image_dir = os.path.join(scratch_dir, "images")
+    csv_path = os.path.join(scratch_dir, f"tracks_{size}.csv")
+    if not os.path.exists(csv_path):
+        synthetic_catalog.write_catalog(csv_path, size, seed, image_count, image_dir)
+    if not os.path.isdir(image_dir):
+        synthetic_catalog.write_album_art(image_dir, image_count, seed)
+
+    load_library(csv_path)
+    ids = list(track_library.library)
+    return {
+        "csv_path": csv_path,
+        "ids": ids,
+        "rows": list(itertools.islice(
+            synthetic_catalog.iter_rows(size, seed, image_count, image_dir), CONSTRUCT_ROWS
+        )),
+        "image_paths": sorted(
+            os.path.join(image_dir, name) for name in os.listdir(image_dir) if name.endswith(".png")
+        ),
+        "row_image_paths": [track.image_path for track in track_library.library.values() if track.image_path],
+    }
+
+
+def run_benchmark(func, context, size, repeats, warmup):
+    # Median of `repeats` timed runs after `warmup` untimed runs
+    for _ in range(warmup):
+        func(context, size)
+    timings = []
+    items = 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        items = func(context, size)
+        timings.append(time.perf_counter() - started)
+    median = statistics.median(timings)
+    return {
+        "median_s": median,
+        "min_s": min(timings),
+        "max_s": max(timings),
+        "repeats": repeats,
+        "items": items,
+        "per_item_us": median / items * 1e6 if items else None,
+    }
+
+
+def run(sizes, selected, repeats, warmup, seed, image_count, scratch_dir):
+    results = []
+    skipped = {}
+    if not pil_available():
+        skipped.update((name, "PIL is not installed") for name in PIL_BENCHMARKS if name in selected)
+
+    for size in sizes:
+        context = prepare(scratch_dir, size, seed, image_count)
+        for name in selected:
+            if name in skipped:
+                continue
+            result = run_benchmark(BENCHMARKS[name], context, size, repeats, warmup)
+            for subscriber in ("smart_playlists", "library_indexes"):
+                if subscriber in context:
+                    context.pop(subscriber).close()
+            result.update(name=name, size=size)
+            results.append(result)
+            print(f"{name:<26}{size:>10}{result['median_s'] * 1000:>12.2f} ms"
+                  f"{result['per_item_us'] or 0:>10.3f} us/item", file=sys.stderr)
+        del context
+
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": seed,
+            "repeats": repeats,
+            "warmup": warmup,
+        },
+        "skipped": skipped,
+        "results": results,
+    }
+
+
+def parse_sizes(text):
+    return [int(float(size)) for size in text.split(",") if size]
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the JukeBox hot paths")
+    parser.add_argument("--sizes", type=parse_sizes, default=DEFAULT_SIZES,
+                        help="comma separated catalog sizes, e.g. 1e3,1e5,1e7")
+    parser.add_argument("--only", default=None, help="comma separated benchmark names")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--images", type=int, default=100, help="distinct covers to generate")
+    parser.add_argument("--scratch", default=None, help="directory for generated catalogs")
+    parser.add_argument("--output", default="-", help="JSON results file, - for stdout")
+    args = parser.parse_args(argv)
+
+    selected = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    if args.scratch:
+        os.makedirs(args.scratch, exist_ok=True)
+        report = run(args.sizes, selected, args.repeats, args.warmup, args.seed, args.images, args.scratch)
+    else:
+        with tempfile.TemporaryDirectory(prefix="jukebox_bench_") as scratch_dir:
+            report = run(args.sizes, selected, args.repeats, args.warmup, args.seed, args.images, scratch_dir)
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,164 @@
+import collections
+import csv
+import os
+import threading
+
+import track_library
+from library_item import LibraryItem
+
+# What changed in a catalog file compared with track_library.
+#   added    track ID -> LibraryItem for IDs not in the library
+#   removed  track IDs no longer in the file
+#   changed  track ID -> {field: new value} for the fields that differ
+CatalogDiff = collections.namedtuple("CatalogDiff", ["added", "removed", "changed"])
+
+# tracks_data.csv column -> LibraryItem field
+COLUMNS = {"Title": "name", "Artist": "artist", "Play Count": "play_count", "Image Path": "image_path", "Rating": "rating"}
+FIELDS = list(COLUMNS.values())
+
+
+def diff_catalog(file, library, skip=()):
+    # Compare an open tracks_data.csv-format file with a library dict, row by
+    # row keyed on ID. Tracks in `skip` (e.g. edits not saved yet) are left
+    # out. A row is compared as raw strings first and only parsed into a
+    # LibraryItem when those differ, so unchanged rows cost no objects.
+    reader = csv.reader(file)
+    header = next(reader, None)
+    if header is None or "ID" not in header:
+        raise ValueError("The catalog has no ID column")
+    position = {column: index for index, column in enumerate(header)}
+    id_index = position["ID"]
+    name_index, artist_index, plays_index, image_index, rating_index = (
+        position.get(column) for column in COLUMNS
+    )
+
+    added, changed = {}, {}
+    seen = set()
+    for row in reader:
+        if len(row) <= id_index:
+            continue
+        track_id = row[id_index]
+        seen.add(track_id)
+        if track_id in skip:
+            continue
+        values = [row[index] if index is not None and index < len(row) else None for index in (
+            name_index, artist_index, plays_index, image_index, rating_index
+        )]
+        track = library.get(track_id)
+        if (
+            track is not None
+            and values[0] == track.name
+            and values[1] == track.artist
+            and values[2] == str(track.play_count)
+            and values[4] == str(track.rating)
+            and (values[3] or None) == track.image_path
+        ):
+            continue
+
+        # Parsed the way JukeboxModel.load_csv reads a row
+        new = LibraryItem(
+            name=values[0],
+            artist=values[1],
+            rating=values[4] if rating_index is not None else 0,
+            play_count=values[2] if plays_index is not None else 0,
+            image_path=values[3],
+        )
+        if track is None:
+            added[track_id] = new
+            continue
+        fields = {field: getattr(new, field) for field in FIELDS if getattr(new, field) != getattr(track, field)}
+        if fields:
+            changed[track_id] = fields
+
+    removed = [track_id for track_id in list(library) if track_id not in seen and track_id not in skip]
+    return CatalogDiff(added, removed, changed)
+
+
+def _stat(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class CatalogWatcher:
+    # Notices changes to a catalog file by polling its modification time and
+    # size, and diffs the new contents against track_library.
+    #
+    # poll() never blocks: it starts the read and diff in a background
+    # thread and returns the CatalogDiff on a later call, so the owner (the
+    # Tk event loop) only does the apply step. Files written by
+    # track_library.save_csv, e.g. by the autosave, are recognised and not
+    # read back. A file that changes while it is being read is read again
+    # on the next poll, so a half-written catalog is never applied.
+
+    def __init__(self, path):
+        self.path = path
+        self.last_error = None  # Error from the last file that could not be read
+        self._seen = _stat(path)  # (mtime_ns, size) of the contents already applied
+        self._thread = None
+        self._pending = None
+
+    def changed(self):
+        # Whether the file differs from the version last read or saved
+        current = _stat(self.path)
+        if current is None or current == self._seen:
+            return False
+        if current == track_library.saved_stat(self.path):
+            self._seen = current
+            return False
+        return True
+
+    def pending(self):
+        # Whether the file has changes that poll() has not handed out yet.
+        # Saving over the file before then would lose them.
+        return self._thread is not None or self.changed()
+
+    def drain(self):
+        # Wait for a background read and return its diff, or read the file now if it changed
+        self.close()
+        diff, self._pending = self._pending, None
+        if diff is None:
+            self._read()
+            diff, self._pending = self._pending, None
+        return diff
+
+    def check(self):
+        # Read and diff the file now if it changed, returning a CatalogDiff or None
+        if not self.changed():
+            return None
+        before = _stat(self.path)
+        with open(self.path, "r", newline="", buffering=1024 * 1024) as file:
+            diff = diff_catalog(file, track_library.library, track_library.dirty_keys())
+        if _stat(self.path) != before:
+            return None  # Still being written, read it again on the next poll
+        self._seen = before
+        return diff
+
+    def poll(self):
+        # A CatalogDiff read in the background since the last poll, or None
+        if self._thread is not None:
+            if self._thread.is_alive():
+                return None
+            self._thread = None
+            diff, self._pending = self._pending, None
+            return diff
+        if self.changed():
+            self._thread = threading.Thread(target=self._read, name="catalog-watch", daemon=True)
+            self._thread.start()
+        return None
+
+    def close(self):
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _read(self):
+        stat = _stat(self.path)
+        try:
+            self._pending = self.check()
+        except (OSError, ValueError, csv.Error) as e:
+            # Wait for the next change rather than rereading a broken file on every poll
+            self.last_error = e
+            self._seen = stat
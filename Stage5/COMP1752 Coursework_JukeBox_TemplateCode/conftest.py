@@ -0,0 +1,120 @@
+import gc
+import json
+import os
+import platform
+import statistics
+import time
+
+import pytest
+
+import track_library
+
+# Performance budgets for the tests marked with @pytest.mark.perf.
+# They are skipped unless pytest runs with --perf (or JUKEBOX_PERF=1).
+# A test fails when its median time is more than the tolerance above the
+# median stored in perf_baseline.json; --update-perf-baseline rewrites it.
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "perf_baseline.json")
+DEFAULT_TOLERANCE = 0.5  # Allowed slowdown, 0.5 means 50% slower than baseline
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("perf", "performance budgets")
+    group.addoption("--perf", action="store_true", help="run the performance tests")
+    group.addoption("--update-perf-baseline", action="store_true",
+                    help="store the measured times as the new baseline")
+    group.addoption("--perf-tolerance", type=float, default=None,
+                    help=f"allowed slowdown over the baseline (default {DEFAULT_TOLERANCE})")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "perf: performance test with a time budget")
+    config._perf_baseline = _load_baseline()
+    config._perf_baseline_changed = False
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--perf") or config.getoption("--update-perf-baseline") or os.environ.get("JUKEBOX_PERF"):
+        return
+    skip = pytest.mark.skip(reason="performance test, run with --perf")
+    for item in items:
+        if "perf" in item.keywords:
+            item.add_marker(skip)
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    if getattr(config, "_perf_baseline_changed", False):
+        with open(BASELINE_FILE, "w") as file:
+            json.dump(config._perf_baseline, file, indent=2, sort_keys=True)
+            file.write("\n")
+
+
+def _load_baseline():
+    try:
+        with open(BASELINE_FILE) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def measure(func, repeats=5, warmup=1):
+    # Median wall time of func() with the garbage collector paused
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return statistics.median(timings)
+
+
+@pytest.fixture
+def empty_library():
+    # An empty track_library for the test, restored afterwards
+    saved = dict(track_library.library)
+    track_library.library.clear()
+    yield track_library.library
+    track_library.library.clear()
+    track_library.library.update(saved)
+
+
+@pytest.fixture
+def perf_budget(request):
+    # Time a callable and compare the median with the stored baseline
+    config = request.config
+    tolerance = config.getoption("--perf-tolerance")
+    if tolerance is None:
+        tolerance = float(os.environ.get("JUKEBOX_PERF_TOLERANCE", DEFAULT_TOLERANCE))
+
+    def check(func, repeats=5, warmup=1):
+        name = request.node.name
+        median = measure(func, repeats, warmup)
+        baseline = config._perf_baseline.get(name)
+
+        if config.getoption("--update-perf-baseline") or baseline is None:
+            config._perf_baseline[name] = {
+                "median_s": median,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+            }
+            config._perf_baseline_changed = True
+            return median
+
+        budget = baseline["median_s"] * (1 + tolerance)
+        assert median <= budget, (
+            f"{name} took {median * 1000:.1f} ms, budget is {budget * 1000:.1f} ms "
+            f"(baseline {baseline['median_s'] * 1000:.1f} ms + {tolerance:.0%})"
+        )
+        return median
+
+    return check
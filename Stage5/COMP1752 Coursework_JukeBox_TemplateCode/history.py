@@ -0,0 +1,170 @@
+import collections
+import contextlib
+
+import track_library
+
+# One recorded change. Deltas hold track IDs and changed values only, never
+# copies of the playlist or the tracks.
+#   kind       "insert": track_ids were added in order in front of `new` (None: at the end)
+#              "remove": the single track in track_ids was removed from in front of `old`
+#              "move":   the single track moved from in front of `old` to in front of `new`
+#              "edit":   each track's fields in `old` (a list, one dict per track) were set
+#                        to the values in `new`, one dict shared by the whole run
+#   track_ids  list of the tracks affected; consecutive inserts and identical
+#              edits inside a group extend one delta instead of adding more
+Delta = collections.namedtuple("Delta", ["kind", "track_ids", "old", "new"])
+
+# An undoable step: a label for the UI and the deltas it made, in order.
+HistoryEntry = collections.namedtuple("HistoryEntry", ["label", "deltas", "size"])
+
+MAX_ENTRIES = 100  # Undo steps kept
+MAX_TRACKS = 1_000_000  # Track references kept across all steps
+
+
+class History:
+    # Undo/redo log for playlist and track edits.
+    #
+    # The model records a delta after each change; changes made inside
+    # group() become one entry, so a bulk edit undoes in one step. Undo and
+    # redo act on the playlist and track_library directly and are not
+    # recorded themselves. The oldest entries are dropped once more than
+    # MAX_ENTRIES steps or MAX_TRACKS track references are kept; the newest
+    # entry always stays, however large.
+
+    def __init__(self, playlist, max_entries=MAX_ENTRIES, max_tracks=MAX_TRACKS):
+        self.playlist = playlist
+        self.max_entries = max_entries
+        self.max_tracks = max_tracks
+        self._undo = collections.deque()
+        self._redo = []
+        self._size = 0  # Track references held by the undo entries
+        self._group_label = None
+        self._group_depth = 0
+        self._pending = []
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo_label(self):
+        return self._undo[-1].label if self._undo else None
+
+    def redo_label(self):
+        return self._redo[-1].label if self._redo else None
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._size = 0
+
+    @contextlib.contextmanager
+    def group(self, label):
+        # Record every change made inside the block as one undo step
+        if self._group_depth == 0:
+            self._group_label = label
+        self._group_depth += 1
+        try:
+            yield
+        finally:
+            self._group_depth -= 1
+            if self._group_depth == 0:
+                self._commit(self._group_label)
+
+    def record(self, kind, track_id, old=None, new=None, label=None):
+        # Add one change, merging it into the previous delta where possible
+        if kind == "edit":
+            old = [old]
+        if self._group_depth == 0:
+            if self._redo:
+                self._redo.clear()
+            self._push(HistoryEntry(label or _LABELS[kind], (Delta(kind, [track_id], old, new),), 1))
+            return
+
+        pending = self._pending
+        if pending:
+            last = pending[-1]
+            if kind == last.kind and kind in ("insert", "edit") and new == last.new:
+                last.track_ids.append(track_id)
+                if kind == "edit":
+                    last.old.append(old[0])
+                return
+        pending.append(Delta(kind, [track_id], old, new))
+
+    def undo(self):
+        # Revert the newest step, returning it, or None if there is nothing to undo
+        if not self._undo:
+            return None
+        entry = self._undo.pop()
+        self._size -= entry.size
+        for delta in reversed(entry.deltas):
+            self._revert(delta)
+        self._redo.append(entry)
+        return entry
+
+    def redo(self):
+        # Reapply the newest undone step, returning it, or None if there is nothing to redo
+        if not self._redo:
+            return None
+        entry = self._redo.pop()
+        for delta in entry.deltas:
+            self._apply(delta)
+        self._push(entry)
+        return entry
+
+    def _commit(self, label):
+        if not self._pending:
+            return
+        deltas = tuple(self._pending)
+        self._pending = []
+        self._redo.clear()
+        self._push(HistoryEntry(label, deltas, sum(len(delta.track_ids) for delta in deltas)))
+
+    def _push(self, entry):
+        undo = self._undo
+        undo.append(entry)
+        self._size += entry.size
+        while len(undo) > self.max_entries or (self._size > self.max_tracks and len(undo) > 1):
+            self._size -= undo.popleft().size
+
+    def _revert(self, delta):
+        playlist = self.playlist
+        if delta.kind == "insert":
+            for track_id in reversed(delta.track_ids):
+                playlist.remove(track_id)
+        elif delta.kind == "remove":
+            playlist.add(delta.track_ids[0], before_id=self._present(delta.old))
+        elif delta.kind == "move":
+            if delta.track_ids[0] in playlist:
+                playlist.move(delta.track_ids[0], self._present(delta.old))
+        else:
+            for track_id, fields in zip(reversed(delta.track_ids), reversed(delta.old)):
+                track_library.update(track_id, **fields)
+
+    def _apply(self, delta):
+        playlist = self.playlist
+        if delta.kind == "insert":
+            before_id = self._present(delta.new)
+            for track_id in delta.track_ids:
+                playlist.add(track_id, before_id=before_id)
+        elif delta.kind == "remove":
+            playlist.remove(delta.track_ids[0])
+        elif delta.kind == "move":
+            if delta.track_ids[0] in playlist:
+                playlist.move(delta.track_ids[0], self._present(delta.new))
+        else:
+            for track_id in delta.track_ids:
+                track_library.update(track_id, **delta.new)
+
+    def _present(self, track_id):
+        # A neighbour to position against, or None (the end) if it has since gone
+        return track_id if track_id in self.playlist else None
+
+
+_LABELS = {
+    "insert": "Add to Playlist",
+    "remove": "Remove from Playlist",
+    "move": "Move in Playlist",
+    "edit": "Edit Track",
+}
@@ -0,0 +1,156 @@
+import collections
+import hashlib
+import os
+
+# Album art addressed by content rather than by file name.
+#
+# Catalogs point many tracks at the same image_path, and often keep
+# byte-identical covers under different names. ImageRegistry hashes each
+# art file once (again only if its size or modification time changes),
+# maps every image_path to the first path seen with the same bytes, and
+# keeps one decoded thumbnail per distinct content, shared by every row
+# and panel that shows it. Only the most recently used thumbnails are
+# kept; a row showing an older one holds its own reference to it.
+
+THUMBNAIL_SIZE = (80, 80)
+THUMBNAIL_BYTES = THUMBNAIL_SIZE[0] * THUMBNAIL_SIZE[1] * 4  # Tk photo images hold 4 bytes per pixel
+HASH_BLOCK = 1024 * 1024
+THUMBNAIL_CACHE_SIZE = 512  # Decoded thumbnails kept, about 13 MB at THUMBNAIL_BYTES each
+
+
+def hash_file(path):
+    # Hex SHA-1 of a file's contents
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ImageRegistry:
+    # decode(path) turns an art file into a thumbnail (a Tk PhotoImage in the
+    # app), sizeof(thumbnail) gives its memory in bytes for stats(). Tk-free,
+    # so the CLI and tests use it without a display.
+
+    def __init__(self, decode=None, sizeof=None, max_thumbnails=THUMBNAIL_CACHE_SIZE):
+        self._decode = decode
+        self._sizeof = sizeof or (lambda thumbnail: THUMBNAIL_BYTES)
+        self.max_thumbnails = max_thumbnails
+        self._paths = {}  # Image path -> ((mtime_ns, size), digest)
+        self._canonical = {}  # Digest -> first path seen with that content
+        self._file_sizes = {}  # Digest -> bytes on disk
+        self._thumbnails = collections.OrderedDict()  # Digest -> (thumbnail, bytes in memory), least recent first
+        self._uses = collections.Counter()  # Digest -> thumbnail() calls
+        self._sharers = {}  # Digest -> paths its kept thumbnail was handed out for
+        self._evicted = 0
+
+    def __len__(self):
+        # Distinct contents registered
+        return len(self._canonical)
+
+    def digest(self, path):
+        # Content hash of the file at path, or None if there is no such file
+        try:
+            stat = os.stat(path)
+        except (OSError, ValueError):
+            return None
+        key = (stat.st_mtime_ns, stat.st_size)
+        known = self._paths.get(path)
+        if known is not None and known[0] == key:
+            return known[1]
+        digest = hash_file(path)
+        self._paths[path] = (key, digest)
+        if known is not None and known[1] != digest:
+            self._release(path, known[1])
+        self._canonical.setdefault(digest, path)
+        self._file_sizes[digest] = stat.st_size
+        return digest
+
+    def canonical(self, path):
+        # The registered path holding the same bytes as path, or None if there is no such file
+        digest = self.digest(path)
+        return self._canonical[digest] if digest is not None else None
+
+    def add_paths(self, paths):
+        # Hash the art files at paths, returning how many exist
+        return sum(1 for path in paths if path and self.digest(path) is not None)
+
+    def thumbnail(self, path):
+        # The shared thumbnail of the file at path, decoded on first use, or None if there is no such file
+        digest = self.digest(path)
+        if digest is None:
+            return None
+        thumbnails = self._thumbnails
+        entry = thumbnails.get(digest)
+        if entry is None:
+            thumbnail = self._decode_content(digest)
+            entry = thumbnails[digest] = (thumbnail, self._sizeof(thumbnail))
+            self._sharers[digest] = set()
+            while len(thumbnails) > self.max_thumbnails:
+                evicted, _ = thumbnails.popitem(last=False)
+                del self._sharers[evicted]
+                self._evicted += 1
+        else:
+            thumbnails.move_to_end(digest)
+        self._uses[digest] += 1
+        self._sharers[digest].add(path)
+        return entry[0]
+
+    def clear_thumbnails(self):
+        # Drop the decoded thumbnails, keeping the hashes
+        self._thumbnails.clear()
+        self._uses.clear()
+        self._sharers.clear()
+
+    def stats(self):
+        # Deduplication report: paths and distinct contents, with the disk
+        # bytes they take, and the kept thumbnails against one per path
+        # showing them. Showing the same path again saves nothing, a cache
+        # keyed by path would have reused that thumbnail too.
+        unique_bytes = sum(self._file_sizes.values())
+        path_bytes = sum(self._file_sizes[digest] for _, digest in self._paths.values())
+        uses = sum(self._uses.values())
+        held = sum(size for _, size in self._thumbnails.values())
+        saved = sum(size * (len(self._sharers[digest]) - 1) for digest, (_, size) in self._thumbnails.items())
+        return {
+            "paths": len(self._paths),
+            "contents": len(self._canonical),
+            "dedup_ratio": len(self._paths) / len(self._canonical) if self._canonical else 1.0,
+            "path_bytes": path_bytes,
+            "unique_bytes": unique_bytes,
+            "thumbnails": len(self._thumbnails),
+            "thumbnail_uses": uses,
+            "thumbnail_bytes": held,
+            "memory_saved": saved,
+            "thumbnails_evicted": self._evicted,
+        }
+
+    def _decode_content(self, digest):
+        # Decode the canonical file of digest. If it was deleted or rewritten
+        # since it was hashed, move on to another path still holding the bytes.
+        while True:
+            path = self._canonical[digest]
+            try:
+                return self._decode(path)
+            except OSError:
+                current = self.digest(path)  # Re-points the canonical path if the file changed
+                if current == digest:
+                    raise  # The file is still there, it just does not decode
+                if current is None:
+                    del self._paths[path]
+                    self._release(path, digest)
+                if digest not in self._canonical:
+                    raise
+
+    def _release(self, path, digest):
+        # path no longer holds the content digest, move or drop what pointed at it
+        if self._canonical.get(digest) != path:
+            return
+        others = [other for other, (_, other_digest) in self._paths.items() if other_digest == digest]
+        if others:
+            self._canonical[digest] = others[0]
+            return
+        del self._canonical[digest], self._file_sizes[digest]
+        self._thumbnails.pop(digest, None)
+        self._uses.pop(digest, None)
+        self._sharers.pop(digest, None)
@@ -0,0 +1,255 @@
+import atexit
+import functools
+import inspect
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+# Metrics are switched on with JUKEBOX_METRICS=table or JUKEBOX_METRICS=json.
+# When they are off, timed() hands back the undecorated function and timer()
+# returns a shared no-op context manager, so the hot paths pay nothing.
+METRICS_MODE = os.environ.get("JUKEBOX_METRICS", "").strip().lower()
+ENABLED = METRICS_MODE not in ("", "0", "off", "false")
+METRICS_FILE = os.environ.get("JUKEBOX_METRICS_FILE")
+
+HISTOGRAM_SAMPLE_SIZE = 1024  # Samples kept per histogram for percentiles
+
+
+class Counter:
+    def __init__(self, name):
+        self.name = name
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def summary(self):
+        return {"type": "counter", "value": self.value}
+
+
+class Histogram:
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self._samples = []
+        self._random = random.Random(0)
+        self._lock = threading.Lock()
+
+    def record(self, value):
+        # Keep running totals and a bounded reservoir sample for percentiles
+        with self._lock:
+            self.count += 1
+            self.total += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+            if len(self._samples) < HISTOGRAM_SAMPLE_SIZE:
+                self._samples.append(value)
+            else:
+                slot = self._random.randrange(self.count)
+                if slot < HISTOGRAM_SAMPLE_SIZE:
+                    self._samples[slot] = value
+
+    def percentile(self, fraction):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+    def summary(self):
+        return {
+            "type": "histogram",
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "max": self.max,
+        }
+
+
+class Timer(Histogram):
+    # A histogram of durations in seconds
+
+    def time(self):
+        return _TimerContext(self)
+
+    def summary(self):
+        summary = super().summary()
+        summary["type"] = "timer"
+        return summary
+
+
+class _TimerContext:
+    def __init__(self, timer):
+        self._timer = timer
+        self._started = 0.0
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._timer.record(time.perf_counter() - self._started)
+        return False
+
+
+class _NullContext:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name, metric_class):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(name, metric_class(name))
+        if not isinstance(metric, metric_class):
+            raise TypeError(f"Metric {name} is a {type(metric).__name__}, not a {metric_class.__name__}")
+        return metric
+
+    def counter(self, name):
+        return self._get(name, Counter)
+
+    def histogram(self, name):
+        return self._get(name, Histogram)
+
+    def timer(self, name):
+        return self._get(name, Timer)
+
+    def reset(self):
+        with self._lock:
+            self._metrics.clear()
+
+    def snapshot(self):
+        # Summaries of every metric, keyed by name
+        return {name: metric.summary() for name, metric in sorted(self._metrics.items())}
+
+    def format_table(self):
+        # Render the snapshot as a fixed-width text table
+        lines = [
+            f"{'metric':<44}{'type':<11}{'count':>10}{'total ms':>12}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}"
+        ]
+        for name, summary in self.snapshot().items():
+            if summary["type"] == "counter":
+                lines.append(f"{name:<44}{'counter':<11}{summary['value']:>10}")
+                continue
+
+            # Timers are shown in milliseconds, plain histograms as recorded
+            scale = 1000 if summary["type"] == "timer" else 1
+
+            def fmt(value):
+                return f"{value * scale:.3f}" if value is not None else "-"
+
+            lines.append(
+                f"{name:<44}{summary['type']:<11}{summary['count']:>10}{fmt(summary['total']):>12}"
+                f"{fmt(summary['mean']):>10}{fmt(summary['p95']):>10}{fmt(summary['max']):>10}"
+            )
+        return "\n".join(lines)
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+
+registry = MetricsRegistry()
+
+
+def timer(name):
+    # Context manager timing a block into the named timer
+    if not ENABLED:
+        return _NULL_CONTEXT
+    return registry.timer(name).time()
+
+
+def count(name, amount=1):
+    # Increment the named counter
+    if ENABLED:
+        registry.counter(name).inc(amount)
+
+
+def timed(name=None):
+    # Decorator timing every call of a function, a no-op when metrics are off
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        metric_name = name or f"{func.__module__}.{func.__qualname__}"
+        metric = registry.timer(metric_name)
+
+        if inspect.isgeneratorfunction(func):
+            yielded = registry.histogram(f"{metric_name}.yielded")
+
+            # Time only the work done inside the generator, not the consumer
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                generator = func(*args, **kwargs)
+                elapsed = 0.0
+                produced = 0
+                try:
+                    while True:
+                        started = time.perf_counter()
+                        try:
+                            item = next(generator)
+                        except StopIteration:
+                            elapsed += time.perf_counter() - started
+                            return
+                        elapsed += time.perf_counter() - started
+                        produced += 1
+                        yield item
+                finally:
+                    generator.close()
+                    metric.record(elapsed)
+                    yielded.record(produced)
+
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metric.record(time.perf_counter() - started)
+
+        return wrapper
+
+    return decorate
+
+
+def dump(stream=None, mode=None):
+    # Write the metrics summary as a table or JSON
+    mode = mode or METRICS_MODE
+    text = registry.to_json() if mode == "json" else registry.format_table()
+
+    if stream is not None:
+        stream.write(text + "\n")
+    elif METRICS_FILE:
+        with open(METRICS_FILE, "w") as file:
+            file.write(text + "\n")
+    else:
+        sys.stderr.write(text + "\n")
+
+
+if ENABLED:
+    atexit.register(dump)
@@ -0,0 +1,439 @@
+import argparse
+import collections
+import concurrent.futures
+import contextlib
+import csv
+import heapq
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import audio_scan
+import parallel_load
+import track_library
+from image_registry import THUMBNAIL_BYTES, ImageRegistry
+from jukebox_model import SEARCH_TYPES, filter_tracks, read_tracks_csv
+
+# Command-line entry point for bulk library work without the Tk GUI.
+# Every command reads and writes tracks_data.csv-format files, "-" means
+# stdin/stdout, so commands can be piped into each other:
+#
+#   python jukebox_cli.py import a.csv b.csv | python jukebox_cli.py stats --catalog -
+#   python jukebox_cli.py replay-plays plays.log --catalog tracks_data.csv -o tracks_data.csv.new
+#   python jukebox_cli.py scan ~/Music --catalog tracks_data.csv -o tracks_data.csv.new
+#
+# --jobs N spreads the per-file phases (parsing catalogs, counting play logs,
+# reading audio tags) over N worker processes, and splits a single large
+# --catalog file into byte ranges parsed in parallel.
+
+EXPORT_FORMATS = track_library.EXPORT_FORMATS
+TOP_TRACKS = 10
+
+
+@contextlib.contextmanager
+def open_input(path):
+    if path == "-":
+        yield sys.stdin
+    else:
+        with open(path, "r", newline="", buffering=1024 * 1024) as file:
+            yield file
+
+
+@contextlib.contextmanager
+def open_output(path):
+    if path == "-":
+        yield sys.stdout
+        sys.stdout.flush()
+    else:
+        with open(path, "w", newline="", buffering=1024 * 1024) as file:
+            yield file
+
+
+def iter_catalog(path):
+    # Stream (track_id, LibraryItem) pairs from a catalog file
+    with open_input(path) as file:
+        try:
+            yield from read_tracks_csv(file)
+        except ValueError as e:
+            raise ValueError(f"{catalog_name(path)}, {e}") from e
+
+
+def catalog_name(path):
+    return "<stdin>" if path == "-" else path
+
+
+def write_tracks(stream, pairs, output_format="csv", where=None):
+    # Write (track_id, track) pairs in the chosen format, returning the count
+    return track_library.export(stream, output_format, pairs, where)
+
+
+def track_filter(args):
+    # A where() predicate for track_library.export from --artist/--min-rating, or None
+    artist = args.artist.strip().lower() if args.artist else None
+    min_rating = args.min_rating
+    if artist is None and min_rating is None:
+        return None
+
+    def where(track_id, track):
+        if artist is not None and (track.artist or "").strip().lower() != artist:
+            return False
+        return min_rating is None or track.rating >= min_rating
+
+    return where
+
+
+def map_files(func, paths, jobs):
+    # Apply func to each path, in worker processes when jobs > 1
+    readable = [path for path in paths if path != "-"]
+    if jobs <= 1 or len(readable) < 2 or len(readable) != len(paths):
+        return [func(path) for path in paths]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(func, paths))
+
+
+def _catalog_ids(path):
+    # The track IDs in a catalog, and how many extra times each repeated ID occurs
+    ids = set()
+    repeats = collections.Counter()
+    with open_input(path) as file:
+        for row in csv.DictReader(file):
+            track_id = row.get("ID")
+            if track_id is None:
+                continue
+            if track_id in ids:
+                repeats[track_id] += 1
+            else:
+                ids.add(track_id)
+    return ids, repeats
+
+
+def _catalog_stats(path):
+    # Partial statistics for one catalog file
+    stats = {
+        "tracks": 0,
+        "plays": 0,
+        "rating_total": 0,
+        "ratings": [0] * 6,
+        "artists": collections.Counter(),
+        "top": [],
+    }
+    top = []
+    for track_id, track in iter_catalog(path):
+        stats["tracks"] += 1
+        stats["plays"] += track.play_count
+        stats["rating_total"] += track.rating
+        stats["ratings"][track.rating] += 1
+        stats["artists"][track.artist] += 1
+        entry = (track.play_count, track_id, f"{track.name} - {track.artist}")
+        if len(top) < TOP_TRACKS:
+            heapq.heappush(top, entry)
+        elif entry > top[0]:
+            heapq.heapreplace(top, entry)
+    stats["top"] = top
+    return stats
+
+
+def _count_plays(path):
+    # Play counts per track ID from a log with one track ID per line, or
+    # "track ID<TAB>unix time<TAB>plays" lines as written by play_stats
+    counts = collections.Counter()
+    with open_input(path) as file:
+        for line in file:
+            parts = line.strip().split("\t")
+            if not parts[0]:
+                continue
+            try:
+                counts[parts[0]] += int(parts[2]) if len(parts) > 2 else 1
+            except ValueError:
+                counts[parts[0]] += 1
+    return counts
+
+
+def stream_catalog(path, jobs=1):
+    # Stream a catalog's (track_id, LibraryItem) pairs, splitting one large file across jobs processes
+    if path != "-" and jobs > 1 and os.path.getsize(path) >= parallel_load.PARALLEL_MIN_BYTES:
+        try:
+            yield from parallel_load.iter_tracks_parallel(path, jobs)
+        except ValueError as e:
+            raise ValueError(f"{path}, {e}") from e
+        return
+    yield from iter_catalog(path)
+
+
+def check_output(catalog, output):
+    # Catalogs are rewritten row by row as they are read, so the output cannot be the catalog itself
+    if catalog != "-" and output != "-" and os.path.exists(output) and os.path.samefile(catalog, output):
+        raise ValueError(f"{output} is the catalog being read, write to another file and rename it")
+
+
+def load_catalog_into_library(path, jobs=1):
+    # Replace the library with a catalog, splitting one large file across jobs processes
+    track_library.library.clear()
+    if path != "-" and jobs > 1 and os.path.getsize(path) >= parallel_load.PARALLEL_MIN_BYTES:
+        try:
+            for track_id, track in parallel_load.iter_tracks_parallel(path, jobs):
+                track_library.library[track_id] = track
+        except ValueError as e:
+            raise ValueError(f"{path}, {e}") from e
+        return
+    for track_id, track in iter_catalog(path):
+        track_library.library[track_id] = track
+
+
+def merge_catalogs(paths, scanned):
+    # Stream the rows of each catalog in turn, skipping any row a later row
+    # with the same ID replaces; scanned holds _catalog_ids() of each path
+    later = collections.Counter()  # Track ID -> files still to come that hold it
+    for ids, _ in scanned:
+        later.update(ids)
+    for path, (ids, repeats) in zip(paths, scanned):
+        later.subtract(ids)
+        for track_id, track in iter_catalog(path):
+            if repeats[track_id]:
+                repeats[track_id] -= 1
+            elif not later[track_id]:
+                yield track_id, track
+
+
+def cmd_import(args):
+    # Merge catalogs, later files win on duplicate IDs, and write one CSV.
+    # A first pass reads only the IDs, so no catalog is held in memory.
+    with tempfile.TemporaryDirectory() as spool:
+        paths = list(args.inputs)
+        if "-" in paths:
+            # stdin can only be read once, keep a copy on disk for both passes
+            copy = os.path.join(spool, "stdin.csv")
+            with open(copy, "w", newline="") as file:
+                shutil.copyfileobj(sys.stdin, file)
+            paths = [copy if path == "-" else path for path in paths]
+        scanned = map_files(_catalog_ids, paths, args.jobs)
+        with open_output(args.output) as stream:
+            count = write_tracks(stream, merge_catalogs(paths, scanned), "csv")
+    print(f"Imported {count} tracks from {len(args.inputs)} file(s)", file=sys.stderr)
+
+
+def cmd_export(args):
+    with open_output(args.output) as stream:
+        write_tracks(stream, iter_catalog(args.catalog), args.format, track_filter(args))
+
+
+def cmd_search(args):
+    with open_output(args.output) as stream:
+        write_tracks(stream, filter_tracks(iter_catalog(args.catalog), args.term, args.type), args.format)
+
+
+def cmd_stats(args):
+    totals = {"tracks": 0, "plays": 0, "rating_total": 0, "ratings": [0] * 6}
+    artists = collections.Counter()
+    top = []
+    for stats in map_files(_catalog_stats, args.catalog, args.jobs):
+        for key in ("tracks", "plays", "rating_total"):
+            totals[key] += stats[key]
+        totals["ratings"] = [a + b for a, b in zip(totals["ratings"], stats["ratings"])]
+        artists.update(stats["artists"])
+        top.extend(stats["top"])
+
+    report = {
+        "tracks": totals["tracks"],
+        "artists": len(artists),
+        "total_plays": totals["plays"],
+        "average_rating": totals["rating_total"] / totals["tracks"] if totals["tracks"] else 0,
+        "rating_histogram": {str(stars): count for stars, count in enumerate(totals["ratings"])},
+        "top_artists": [{"artist": artist, "tracks": count} for artist, count in artists.most_common(TOP_TRACKS)],
+        "most_played": [
+            {"id": track_id, "track": label, "plays": plays}
+            for plays, track_id, label in heapq.nlargest(TOP_TRACKS, top)
+        ],
+    }
+
+    with open_output(args.output) as stream:
+        if args.json:
+            stream.write(json.dumps(report, indent=2) + "\n")
+            return
+        stream.write(f"Tracks:         {report['tracks']}\n")
+        stream.write(f"Artists:        {report['artists']}\n")
+        stream.write(f"Total plays:    {report['total_plays']}\n")
+        stream.write(f"Average rating: {report['average_rating']:.2f}\n")
+        for stars, count in report["rating_histogram"].items():
+            stream.write(f"  {stars} {'*' * int(stars):<5} {count}\n")
+        stream.write("Most played:\n")
+        for entry in report["most_played"]:
+            stream.write(f"  {entry['plays']:>8}  {entry['id']} {entry['track']}\n")
+
+
+def cmd_images(args):
+    # Report how much of the catalog's album art is the same image under another path
+    base = os.getcwd() if args.catalog == "-" else os.path.dirname(os.path.abspath(args.catalog))
+    registry = ImageRegistry()
+    found = {}  # image_path -> whether the file exists, so each path is looked at once
+    tracks = with_art = 0
+    for track_id, track in iter_catalog(args.catalog):
+        tracks += 1
+        if not track.image_path:
+            continue
+        exists = found.get(track.image_path)
+        if exists is None:
+            exists = found[track.image_path] = registry.digest(os.path.join(base, track.image_path)) is not None
+        with_art += exists
+
+    stats = registry.stats()
+    report = {
+        "tracks": tracks,
+        "tracks_with_art": with_art,
+        "art_files": stats["paths"],
+        "distinct_images": stats["contents"],
+        "dedup_ratio": stats["dedup_ratio"],  # Art files per distinct image
+        "tracks_per_image": with_art / stats["contents"] if stats["contents"] else 0,
+        "bytes_on_disk": stats["path_bytes"],
+        "duplicate_bytes": stats["path_bytes"] - stats["unique_bytes"],
+        # Every track row decoding its own thumbnail, against one per distinct image
+        "thumbnail_memory_saved": (with_art - stats["contents"]) * THUMBNAIL_BYTES,
+    }
+
+    with open_output(args.output) as stream:
+        if args.json:
+            stream.write(json.dumps(report, indent=2) + "\n")
+            return
+        stream.write(f"Tracks with art:  {report['tracks_with_art']} of {report['tracks']}\n")
+        stream.write(f"Art files:        {report['art_files']} ({report['bytes_on_disk']} bytes)\n")
+        stream.write(f"Distinct images:  {report['distinct_images']} (dedup ratio {report['dedup_ratio']:.2f}, "
+                     f"{report['tracks_per_image']:.2f} tracks per image)\n")
+        stream.write(f"Duplicate bytes:  {report['duplicate_bytes']}\n")
+        stream.write(f"Thumbnail memory saved: {report['thumbnail_memory_saved']} bytes\n")
+
+
+def cmd_rate_many(args):
+    # Apply "ID,rating" lines to the catalog, streaming it from --catalog to --output.
+    # Only the ratings are held in memory; a later line for the same ID wins.
+    check_output(args.catalog, args.output)
+    ratings = {}
+    skipped = 0
+    with open_input(args.input) as file:
+        for row in csv.reader(file):
+            try:
+                ratings[row[0]] = min(max(0, int(row[1])), 5)
+            except (IndexError, ValueError):
+                skipped += 1
+
+    def rated(pairs):
+        nonlocal applied
+        for track_id, track in pairs:
+            rating = ratings.pop(track_id, None)
+            if rating is not None:
+                track.rating = rating
+                applied += 1
+            yield track_id, track
+
+    applied = 0
+    with open_output(args.output) as stream:
+        write_tracks(stream, rated(stream_catalog(args.catalog, args.jobs)), "csv")
+    skipped += len(ratings)  # IDs not in the catalog
+    print(f"Applied {applied} ratings, skipped {skipped} lines", file=sys.stderr)
+
+
+def cmd_replay_plays(args):
+    # Add the plays recorded in play logs to the catalog play counts, streaming
+    # the catalog from --catalog to --output with only the counts in memory
+    check_output(args.catalog, args.output)
+    counts = collections.Counter()
+    for partial in map_files(_count_plays, args.logs, args.jobs):
+        counts.update(partial)
+
+    def replayed(pairs):
+        nonlocal applied
+        for track_id, track in pairs:
+            plays = counts.pop(track_id, 0)
+            track.play_count += plays
+            applied += plays
+            yield track_id, track
+
+    applied = 0
+    with open_output(args.output) as stream:
+        write_tracks(stream, replayed(stream_catalog(args.catalog, args.jobs)), "csv")
+    print(f"Replayed {applied} plays, {sum(counts.values())} for unknown tracks", file=sys.stderr)
+
+
+def cmd_scan(args):
+    # Add the audio files under a folder to the catalog from their tags
+    if os.path.exists(args.catalog) or args.catalog == "-":
+        load_catalog_into_library(args.catalog, args.jobs)
+    else:
+        track_library.library.clear()  # Start a new catalog
+    scanner = audio_scan.FolderScanner(args.folder, args.state, args.covers, args.jobs)
+    result = scanner.scan()
+    for path, error in result.errors.items():
+        print(f"{path}: {error}", file=sys.stderr)
+
+    with open_output(args.output) as stream:
+        write_tracks(stream, track_library.library.items(), "csv")
+    print(f"Added {len(result.added)}, updated {len(result.changed)}, removed {len(result.removed)} tracks, "
+          f"{result.unchanged} files unchanged", file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Bulk JukeBox library operations")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, func, help_text, catalog="single"):
+        command = commands.add_parser(name, help=help_text)
+        command.set_defaults(func=func)
+        if catalog == "single":
+            command.add_argument("--catalog", default="tracks_data.csv", help="catalog CSV, - for stdin")
+        elif catalog == "many":
+            command.add_argument("--catalog", nargs="+", default=["tracks_data.csv"], help="catalog CSV files")
+        command.add_argument("-o", "--output", default="-", help="output file, - for stdout")
+        command.add_argument("--jobs", type=int, default=1, help="worker processes for parallel phases")
+        return command
+
+    command = add_command("import", cmd_import, "merge catalogs into one CSV", catalog=None)
+    command.add_argument("inputs", nargs="+", help="catalog CSV files, later files win")
+
+    command = add_command("export", cmd_export, "write the catalog as text, CSV or JSON lines")
+    command.add_argument("--format", choices=EXPORT_FORMATS, default="text")
+    command.add_argument("--artist", help="only tracks by this artist")
+    command.add_argument("--min-rating", type=int, help="only tracks rated at least this")
+
+    command = add_command("search", cmd_search, "stream the tracks matching a term")
+    command.add_argument("term")
+    command.add_argument("--type", choices=SEARCH_TYPES, default="ALL")
+    command.add_argument("--format", choices=EXPORT_FORMATS, default="text")
+
+    command = add_command("stats", cmd_stats, "summarise one or more catalogs", catalog="many")
+    command.add_argument("--json", action="store_true", help="write JSON instead of text")
+
+    command = add_command("images", cmd_images, "report duplicate album art in the catalog")
+    command.add_argument("--json", action="store_true", help="write JSON instead of text")
+
+    command = add_command("rate-many", cmd_rate_many, "apply ID,rating lines to the catalog")
+    command.add_argument("--input", default="-", help="ID,rating lines, - for stdin")
+
+    command = add_command("replay-plays", cmd_replay_plays, "add play logs to the play counts")
+    command.add_argument("logs", nargs="+", help="play logs with one track ID per line, - for stdin")
+
+    command = add_command("scan", cmd_scan, "add the audio files under a folder from their tags")
+    command.add_argument("folder", help="folder of MP3, FLAC and WAV files")
+    command.add_argument("--state", default="scan_state.json",
+                         help="record of scanned files, so a rescan only reads what changed")
+    command.add_argument("--covers", default=audio_scan.COVER_DIR, help="folder for embedded cover art")
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    except BrokenPipeError:
+        # The reading end of a pipe went away, e.g. "| head"
+        sys.stderr.close()
+    except (OSError, ValueError, csv.Error) as e:
+        # A ValueError is a catalog row that does not parse, its message names the file and line
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,543 @@
+import concurrent.futures
+import csv
+import itertools
+import os
+import threading
+
+import parallel_load
+import track_library
+from audio_scan import FolderScanner
+from autosave import AutoSaver
+from catalog_watch import CatalogDiff, CatalogWatcher
+from history import History
+from instrumentation import timed
+from library_index import ArtistIndex, LibraryIndexes
+from play_stats import PlayCharts
+from library_item import LibraryItem
+from play_queue import PlaybackScheduler
+from playlist import Playlist
+from playlist_store import PlaylistStoreError
+from recommend import LiveRecommender
+from smart_playlist import SmartPlaylists
+
+SEARCH_TYPES = ["ALL", "Tracks", "Artists"]
+DEFAULT_PLAYLIST_NAME = "Current Playlist"
+
+
+def read_tracks_csv(file):
+    # Yield (track_id, LibraryItem) pairs from an open tracks_data.csv-format
+    # file, raising ValueError naming the line of a row that does not parse
+    reader = csv.DictReader(file)
+    for row in reader:
+        if "ID" not in row:
+            continue
+        try:
+            track = LibraryItem(
+                name=row.get("Title"),
+                artist=row.get("Artist"),
+                rating=row.get("Rating", 0),
+                play_count=row.get("Play Count", 0),
+                image_path=row.get("Image Path")
+            )
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"line {reader.line_num}: {e}") from e
+        yield row["ID"], track
+
+
+def filter_tracks(pairs, search_term, search_type="ALL"):
+    # Lazily yield the (track_id, track) pairs matching the search criteria
+    search_term = search_term.strip().lower()
+    match_names = search_type in ["ALL", "Tracks"]
+    match_artists = search_type in ["ALL", "Artists"]
+
+    for track_id, track in pairs:
+        if match_names and search_term in track.name.lower():
+            yield track_id, track
+        elif match_artists and search_term in track.artist.lower():
+            yield track_id, track
+
+
+class JukeboxModel:
+    # Library, search, playlist and play queue logic with no dependency on Tk.
+    # JukeBoxApp is a view over this class; scripts and services use it directly.
+
+    def __init__(self, playlist_store=None, play_log=None, smart_playlist_file=None):
+        # Playlist entries are track IDs, resolved from track_library when read
+        self.playlist = Playlist(resolve=track_library.library.get)
+        self.playlist_name = DEFAULT_PLAYLIST_NAME
+        self.playlist_store = playlist_store
+        self.playlist_error = None  # PlaylistStoreError from reading the store at start, if any
+        if playlist_store is not None:
+            try:
+                if DEFAULT_PLAYLIST_NAME in playlist_store:
+                    self.playlist.replace_ids(playlist_store.load(DEFAULT_PLAYLIST_NAME))
+            except PlaylistStoreError as e:
+                # A damaged store must not stop the app, start with an empty playlist
+                self.playlist_error = e
+        self.history = History(self.playlist)  # Undo/redo for playlist and track edits
+        self._scheduler = None
+        self._smart_playlists = None
+        self._smart_playlist_file = smart_playlist_file  # JSON file of smart playlist definitions, if saved
+        self.smart_playlist_error = None  # Error from reading that file, if any
+        self._play_log = play_log  # Path of the timestamped play log, if plays are logged
+        self._play_charts = None
+        self._recommender = None
+        self._library_indexes = None
+        self._artist_index = None
+        self._autosaver = None
+        self._catalog_watcher = None
+        self._builds = {}  # Name -> (structure, Future) of a build running in a worker thread
+
+    @timed("model.load_csv")
+    def load_csv(self, filename, jobs=1):
+        # Load tracks from a tracks_data.csv-format file into track_library,
+        # parsing large files in `jobs` worker processes
+        loaded = 0
+        if jobs > 1 and os.path.getsize(filename) >= parallel_load.PARALLEL_MIN_BYTES:
+            for track_id, item in parallel_load.iter_tracks_parallel(filename, jobs):
+                track_library.add(track_id, item)
+                loaded += 1
+        else:
+            with open(filename, "r", newline="") as file:
+                for track_id, item in read_tracks_csv(file):
+                    track_library.add(track_id, item)
+                    loaded += 1
+        # The library now matches the file, so there is nothing to save yet
+        track_library.mark_clean()
+        return loaded
+
+    def scan_folder(self, root, state_path=None, jobs=1):
+        # Add the audio files under root to track_library from their tags, see audio_scan.FolderScanner
+        return FolderScanner(root, state_path, jobs=jobs).scan()
+
+    def start_autosave(self, path, **kwargs):
+        # Save the library back to path in the background after edits and plays,
+        # holding the save while the watched catalog has changes not applied yet
+        if self._autosaver is None:
+            self._autosaver = AutoSaver(path, hold=self._catalog_change_pending, **kwargs)
+        return self._autosaver
+
+    def _catalog_change_pending(self):
+        watcher = self._catalog_watcher
+        return watcher is not None and watcher.pending()
+
+    def watch_catalog(self, path):
+        # Pick up changes other programs make to the catalog file, see poll_catalog()
+        if self._catalog_watcher is None:
+            self._catalog_watcher = CatalogWatcher(path)
+        return self._catalog_watcher
+
+    def poll_catalog(self):
+        # Apply a change to the watched catalog once it has been read, returning the applied CatalogDiff or None
+        if self._catalog_watcher is None:
+            return None
+        diff = self._catalog_watcher.poll()
+        return self.apply_catalog_diff(diff) if diff is not None else None
+
+    def apply_catalog_diff(self, diff):
+        # Apply only the added, removed and changed tracks of a CatalogDiff.
+        # Tracks edited since the diff was read keep the local edit. Indexes
+        # and smart playlists follow through the library notifications, and
+        # the applied tracks match the file, so they are not saved again.
+        dirty = track_library.dirty_keys()
+        removed = [track_id for track_id in diff.removed if track_id not in dirty]
+        changed = {track_id: fields for track_id, fields in diff.changed.items() if track_id not in dirty}
+        added = {track_id: item for track_id, item in diff.added.items() if track_id not in dirty}
+        for track_id in removed:
+            track_library.remove(track_id)
+        for track_id, fields in changed.items():
+            track_library.update(track_id, **fields)
+        for track_id, item in added.items():
+            track_library.add(track_id, item)
+        track_library.mark_clean(itertools.chain(removed, changed, added))
+        return CatalogDiff(added, removed, changed)
+
+    @property
+    def playlist_items(self):
+        # (track_id, track) pairs of the playlist in order
+        return self.playlist
+
+    def tracks(self):
+        # (track_id, track) pairs for the whole library in library order
+        return track_library.library.items()
+
+    def get_track(self, track_id):
+        return track_library.library.get(track_id)
+
+    @timed("model.search")
+    def search(self, search_term, search_type="ALL"):
+        # Lazily yield (track_id, track) pairs matching the search criteria.
+        # The app pauses this between pages while catalog reloads add and
+        # remove tracks, so it walks a snapshot of the track IDs and skips
+        # tracks removed since.
+        library = track_library.library
+        pairs = ((track_id, library.get(track_id)) for track_id in list(library))
+        yield from filter_tracks(
+            ((track_id, track) for track_id, track in pairs if track is not None), search_term, search_type
+        )
+
+    @property
+    def library_indexes(self):
+        # Sorted indexes over track fields, each built the first time it is sorted on
+        if self._library_indexes is None:
+            self._library_indexes = LibraryIndexes()
+        return self._library_indexes
+
+    def sorted_tracks(self, field, descending=False, start=0, stop=None):
+        # (track_id, track) pairs ordered by name, artist, rating or play_count
+        library = track_library.library
+        for track_id in self.library_indexes.sorted_ids(field, descending, start, stop):
+            yield track_id, library[track_id]
+
+    @property
+    def artist_index(self):
+        # Tracks grouped by artist with per-artist totals, built on first use
+        # or waited for if build_in_background() started it
+        if "artist_index" in self._builds:
+            self._finish_build("artist_index")
+        if self._artist_index is None:
+            self._artist_index = ArtistIndex()
+        return self._artist_index
+
+    def artist_tracks(self, artist):
+        # (track_id, track) pairs by an artist in any spelling, in library order
+        entry = self.artist_index.get(artist)
+        if entry is None:
+            return
+        library = track_library.library
+        for track_id in entry.track_ids:
+            yield track_id, library[track_id]
+
+    def play_track(self, track_id):
+        # Record a play and return the new play count, or None for unknown tracks
+        if track_library.get_name(track_id) is None:
+            return None
+        track_library.increment_play_count(track_id)
+        return track_library.get_play_count(track_id)
+
+    def add_to_playlist(self, track_id):
+        # Add a track unless it is unknown or already in the playlist
+        if track_id not in track_library.library:
+            return False
+        if not self.playlist.add(track_id):
+            return False
+        self.history.record("insert", track_id)
+        return True
+
+    def add_tracks_to_playlist(self, track_ids):
+        # Add many tracks as one undo step, returning how many were added
+        added = 0
+        with self.history.group("Add Tracks to Playlist"):
+            for track_id in track_ids:
+                added += self.add_to_playlist(track_id)
+        return added
+
+    def remove_from_playlist(self, track_id):
+        # Remove a track from the playlist, returning whether it was present
+        following = self.playlist.next_id(track_id)
+        if not self.playlist.remove(track_id):
+            return False
+        self.history.record("remove", track_id, old=following)
+        return True
+
+    def move_in_playlist(self, track_id, offset):
+        # Move a playlist track one place up (-1) or down (+1)
+        if track_id not in self.playlist:
+            return False
+        if offset < 0:
+            before_id = self.playlist.previous_id(track_id)
+            if before_id is None:
+                return False
+        else:
+            following = self.playlist.next_id(track_id)
+            if following is None:
+                return False
+            before_id = self.playlist.next_id(following)
+        old_before_id = self.playlist.next_id(track_id)
+        self.playlist.move(track_id, before_id)
+        self.history.record("move", track_id, old=old_before_id, new=before_id)
+        return True
+
+    def playlist_names(self):
+        # Stored playlist names, plus the open one if it has not been saved yet.
+        # A damaged store lists none, see playlist_error.
+        names = []
+        if self.playlist_store is not None:
+            try:
+                names = self.playlist_store.names()
+            except PlaylistStoreError as e:
+                self.playlist_error = e
+        if self.playlist_name not in names:
+            names.append(self.playlist_name)
+        return names
+
+    def save_playlist(self):
+        # Write the open playlist to the store
+        if self.playlist_store is not None:
+            self.playlist_store.save(self.playlist_name, self.playlist.iter_ids())
+
+    def open_playlist(self, name):
+        # Save the open playlist, then open a stored playlist or start a new empty one
+        if name == self.playlist_name:
+            return
+        self.save_playlist()
+        self._load_playlist(name)
+
+    def _load_playlist(self, name):
+        # Undo steps refer to the open playlist, so they do not survive a switch
+        self.history.clear()
+        self.playlist_name = name
+        track_ids = []
+        if self.playlist_store is not None and name in self.playlist_store:
+            track_ids = self.playlist_store.load(name)
+        self.playlist.replace_ids(track_ids)
+
+    def delete_playlist(self, name):
+        # Delete a stored playlist; deleting the open one falls back to the default
+        if self.playlist_store is not None:
+            self.playlist_store.delete(name)
+        if name == self.playlist_name:
+            self._load_playlist(DEFAULT_PLAYLIST_NAME)
+
+    def import_playlists(self, path):
+        # Import a JSON file of playlists, or a text file of track IDs as one playlist
+        if path.lower().endswith(".json"):
+            with open(path, "r") as file:
+                names = self.playlist_store.import_json(file)
+        else:
+            name = os.path.splitext(os.path.basename(path))[0]
+            with open(path, "r") as file:
+                self.playlist_store.save(name, [line.strip() for line in file if line.strip()])
+            names = [name]
+
+        # Reload the open playlist if the import replaced it
+        if self.playlist_name in names:
+            self.history.clear()
+            self.playlist.replace_ids(self.playlist_store.load(self.playlist_name))
+        if self._recommender is not None:
+            for name in names:
+                self._recommender.add_sequence(self.playlist_store.load(name))
+        return names
+
+    def export_playlists(self, path):
+        # Export every playlist as JSON, or the open one as a text file of track IDs
+        if path.lower().endswith(".json"):
+            self.save_playlist()
+            with open(path, "w") as file:
+                self.playlist_store.export_json(file)
+        else:
+            with open(path, "w") as file:
+                file.writelines(f"{track_id}\n" for track_id in self.playlist.iter_ids())
+
+    @property
+    def scheduler(self):
+        # Playback scheduler, started on first use
+        if self._scheduler is None:
+            self._scheduler = PlaybackScheduler(self.play_track, artist_of=track_library.get_artist)
+        return self._scheduler
+
+    def start_playback(self):
+        # Play the playlist over time through the scheduler, returning the queue length
+        track_ids = self.playlist.ids()
+        if track_ids:
+            self.scheduler.play(track_ids)
+        return len(track_ids)
+
+    @property
+    def smart_playlists(self):
+        # Rule-based playlists kept current as the library changes, created on first use
+        if self._smart_playlists is None:
+            self._smart_playlists = SmartPlaylists(self._smart_playlist_file)
+            try:
+                self._smart_playlists.load()
+            except (OSError, ValueError) as e:
+                # Keep a damaged file as it is rather than overwrite it with what is defined now
+                self.smart_playlist_error = e
+                self._smart_playlists.path = None
+        return self._smart_playlists
+
+    def save_smart_playlist(self, playlist):
+        # Add or replace a SmartPlaylist and save the definitions
+        self.smart_playlists.add(playlist)
+        self._smart_playlists.save()
+        return playlist
+
+    def delete_smart_playlist(self, name):
+        removed = self.smart_playlists.remove(name)
+        if removed:
+            self._smart_playlists.save()
+        return removed
+
+    def smart_playlist_tracks(self, name):
+        # Lazily yield the (track_id, track) pairs of a smart playlist, best first
+        library = track_library.library
+        for track_id in self.smart_playlists.get(name).ids():
+            track = library.get(track_id)
+            if track is not None:
+                yield track_id, track
+
+    @property
+    def play_charts(self):
+        # Play log and "most played" charts, recording plays from first use
+        return self.load_play_charts()
+
+    def load_play_charts(self, background=False):
+        # Start the play log and charts, reading the log back in a worker thread if background
+        if self._play_charts is None:
+            self._play_charts = PlayCharts(self._play_log, background=background)
+        return self._play_charts
+
+    @property
+    def recommender(self):
+        # Co-occurrence recommendations, built from the playlists and play log
+        # on first use, then following plays and edits to the open playlist
+        if "recommender" in self._builds:
+            self._finish_build("recommender")
+        if self._recommender is None:
+            self._recommender, _ = self._new_recommender()
+        return self._recommender
+
+    def recommend(self, track_id, count=5):
+        # Track IDs that often go with track_id, best first; none while the recommender is built in the background
+        if "recommender" in self._builds:
+            return []
+        return self.recommender.recommend(track_id, count)
+
+    def _new_recommender(self, background=False):
+        # A LiveRecommender and the arguments of its build(). The playlists
+        # are read here rather than in a worker thread, which would share the
+        # store with this one.
+        if self._play_charts is not None and (not background or self._play_charts.loaded()):
+            self._play_charts.flush()
+        playlists = [self.playlist_store.load(name) for name in self.playlist_names() if name != self.playlist_name]
+        playlists.append(self.playlist.ids())
+        recommender = LiveRecommender(playlists, self._play_log, playlist=self.playlist, background=background)
+        return recommender, (playlists, self._play_log)
+
+    def build_in_background(self, name):
+        # Start building "artist_index" or "recommender" in a worker thread,
+        # so a large library does not hold up the caller's thread. Changes
+        # made meanwhile are caught up when poll_builds() puts it in place.
+        if getattr(self, "_" + name) is not None or name in self._builds:
+            return
+        if name == "artist_index":
+            structure = ArtistIndex(background=True)
+            args = (dict(track_library.library),)  # A copy, the library keeps changing on this thread
+        elif name == "recommender":
+            structure, args = self._new_recommender(background=True)
+        else:
+            raise ValueError(f"Unknown build {name!r}")
+        future = concurrent.futures.Future()
+
+        def run():
+            try:
+                structure.build(*args)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(structure)
+
+        threading.Thread(target=run, name=f"build-{name}", daemon=True).start()
+        self._builds[name] = (structure, future)
+
+    def pending_builds(self):
+        # Names of the background builds not put in place yet
+        return list(self._builds)
+
+    def poll_builds(self):
+        # Put the background builds that have finished in place, returning their
+        # names. Raises the error of a failed build, which is then dropped.
+        done = [name for name, (_, future) in self._builds.items() if future.done()]
+        for name in done:
+            self._finish_build(name)
+        return done
+
+    def _finish_build(self, name):
+        # Wait for a background build and put it in place
+        structure, future = self._builds.pop(name)
+        try:
+            future.result()
+        except BaseException:
+            structure.close()
+            raise
+        structure.finish()
+        setattr(self, "_" + name, structure)
+
+    def close(self):
+        # Stop background work and library subscriptions, saving unsaved track changes
+        for structure, future in self._builds.values():
+            concurrent.futures.wait([future])
+            structure.close()
+        self._builds.clear()
+        if self._scheduler is not None:
+            self._scheduler.close()
+            self._scheduler = None
+        if self._smart_playlists is not None:
+            self._smart_playlists.close()
+            self._smart_playlists = None
+        if self._play_charts is not None:
+            self._play_charts.close()
+            self._play_charts = None
+        if self._recommender is not None:
+            self._recommender.close()
+            self._recommender = None
+        if self._library_indexes is not None:
+            self._library_indexes.close()
+            self._library_indexes = None
+        if self._artist_index is not None:
+            self._artist_index.close()
+            self._artist_index = None
+        if self._catalog_watcher is not None:
+            watcher, self._catalog_watcher = self._catalog_watcher, None
+            if self._autosaver is not None:
+                # Merge an outside edit first, so the final save keeps it
+                diff = watcher.drain()
+                if diff is not None:
+                    self.apply_catalog_diff(diff)
+            watcher.close()
+        # Last, as its final save may raise OSError
+        if self._autosaver is not None:
+            autosaver, self._autosaver = self._autosaver, None
+            autosaver.close()
+
+    def update_track(self, track_id, name, artist, rating):
+        # Apply an edit, raising ValueError for a non-numeric rating
+        track = track_library.library.get(track_id)
+        if not track:
+            return None
+
+        rating = min(max(0, int(rating)), 5)
+        self._edit_fields(track_id, track, {"name": name, "artist": artist, "rating": rating})
+        return track
+
+    def rate_tracks(self, track_ids, rating):
+        # Set the rating of many tracks as one undo step, returning how many changed
+        rating = min(max(0, int(rating)), 5)
+        new = {"rating": rating}
+        changed = 0
+        with self.history.group("Rate Tracks"):
+            for track_id in track_ids:
+                track = track_library.library.get(track_id)
+                if track is not None:
+                    changed += self._edit_fields(track_id, track, new)
+        return changed
+
+    def _edit_fields(self, track_id, track, fields):
+        # Apply and record the fields that actually change
+        new = {field: value for field, value in fields.items() if getattr(track, field) != value}
+        if not new:
+            return False
+        # A caller passing the same dict for a bulk edit lets the run share it
+        if len(new) == len(fields):
+            new = fields
+        old = {field: getattr(track, field) for field in new}
+        track_library.update(track_id, **new)
+        self.history.record("edit", track_id, old=old, new=new)
+        return True
+
+    def undo(self):
+        # Revert the last playlist or track edit, returning its HistoryEntry or None
+        return self.history.undo()
+
+    def redo(self):
+        return self.history.redo()
@@ -0,0 +1,320 @@
+import bisect
+import itertools
+
+import track_library
+from library_item import FIELDS, normalize
+
+CHUNK_SIZE = 1000  # Entries per chunk of a SortedList; chunks split at twice this
+
+
+class SortedList:
+    # A sorted list kept as a list of sorted chunks, with the last entry of
+    # each chunk in a separate list. Finding an entry is a bisect over the
+    # chunk maxima and then one chunk, O(log n); inserting or deleting only
+    # shifts the entries of that one chunk, which is bounded by CHUNK_SIZE,
+    # instead of everything after it as in one flat list.
+
+    def __init__(self, values=(), chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        values = sorted(values)
+        self._chunks = [values[start:start + chunk_size] for start in range(0, len(values), chunk_size)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._len = len(values)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self._chunks)
+
+    def __reversed__(self):
+        return itertools.chain.from_iterable(reversed(chunk) for chunk in reversed(self._chunks))
+
+    def __contains__(self, value):
+        position = bisect.bisect_left(self._maxes, value)
+        if position == len(self._maxes):
+            return False
+        chunk = self._chunks[position]
+        return chunk[bisect.bisect_left(chunk, value)] == value
+
+    def add(self, value):
+        chunks, maxes = self._chunks, self._maxes
+        self._len += 1
+        if not chunks:
+            chunks.append([value])
+            maxes.append(value)
+            return
+        position = bisect.bisect_left(maxes, value)
+        if position == len(maxes):
+            position -= 1
+            chunks[position].append(value)
+            maxes[position] = value
+        else:
+            bisect.insort(chunks[position], value)
+        chunk = chunks[position]
+        if len(chunk) > 2 * self.chunk_size:
+            chunks.insert(position + 1, chunk[self.chunk_size:])
+            del chunk[self.chunk_size:]
+            maxes.insert(position, chunk[-1])
+
+    def discard(self, value):
+        # Remove a value, returning whether it was present
+        chunks, maxes = self._chunks, self._maxes
+        position = bisect.bisect_left(maxes, value)
+        if position == len(maxes):
+            return False
+        chunk = chunks[position]
+        index = bisect.bisect_left(chunk, value)
+        if chunk[index] != value:
+            return False
+        del chunk[index]
+        self._len -= 1
+        if chunk:
+            maxes[position] = chunk[-1]
+        else:
+            del chunks[position]
+            del maxes[position]
+        return True
+
+    def slice(self, start=0, stop=None, reverse=False):
+        # Entries start..stop in order (or in reverse order), skipping whole chunks to reach start
+        stop = self._len if stop is None else min(stop, self._len)
+        if start >= stop:
+            return []
+        chunks = reversed(self._chunks) if reverse else self._chunks
+        result = []
+        skip = start
+        for chunk in chunks:
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            ordered = chunk[::-1] if reverse else chunk
+            result.extend(ordered[skip:skip + stop - start - len(result)])
+            skip = 0
+            if len(result) >= stop - start:
+                break
+        return result
+
+
+class LibraryIndexes:
+    # Sorted secondary indexes over track_library fields, kept current from
+    # its change notifications.
+    #
+    # Each index is a SortedList of (normalized value, track ID), so tracks
+    # with equal values stay in a stable ID order. An index is built the
+    # first time its field is sorted on; after that a rating, play count or
+    # edit moves one entry, O(log n), instead of resorting the library.
+
+    def __init__(self):
+        self._indexes = {}  # Field -> SortedList
+        track_library.subscribe(self._on_change)
+        self._subscribed = True
+
+    def __contains__(self, field):
+        return field in self._indexes
+
+    def index(self, field):
+        # The SortedList for a field, built on first use
+        index = self._indexes.get(field)
+        if index is None:
+            if field not in FIELDS:
+                raise ValueError(f"Unknown field {field!r}")
+            index = SortedList(
+                (normalize(field, getattr(track, field)), track_id)
+                for track_id, track in track_library.library.items()
+            )
+            self._indexes[field] = index
+        return index
+
+    def sorted_ids(self, field, descending=False, start=0, stop=None):
+        # Track IDs ordered by a field, positions start..stop of that order
+        return [track_id for _, track_id in self.index(field).slice(start, stop, reverse=descending)]
+
+    def close(self):
+        if self._subscribed:
+            track_library.unsubscribe(self._on_change)
+            self._subscribed = False
+
+    def _on_change(self, change):
+        indexes = self._indexes
+        if change.kind == "update":
+            index = indexes.get(change.field)
+            if index is not None:
+                index.discard((normalize(change.field, change.old), change.key))
+                index.add((normalize(change.field, change.new), change.key))
+            return
+        item = change.new if change.kind == "add" else change.old
+        for field, index in indexes.items():
+            entry = (normalize(field, getattr(item, field)), change.key)
+            if change.kind == "add":
+                index.add(entry)
+            else:
+                index.discard(entry)
+
+
+class ArtistEntry:
+    # One artist's tracks and running totals
+    __slots__ = ("name", "track_ids", "plays", "rating_total")
+
+    def __init__(self, name):
+        self.name = name  # Spelling of the first track seen, for display
+        self.track_ids = {}  # Track ID -> None, in the order added
+        self.plays = 0
+        self.rating_total = 0
+
+    @property
+    def track_count(self):
+        return len(self.track_ids)
+
+    @property
+    def average_rating(self):
+        return self.rating_total / len(self.track_ids) if self.track_ids else 0.0
+
+
+class ArtistIndex:
+    # Tracks grouped by normalized artist, with track count, total plays
+    # and average rating per artist kept as running totals. Change
+    # notifications carry the old and new values, so a play, rating or
+    # artist edit adjusts one or two entries and reading the aggregates
+    # never goes back to the LibraryItem objects.
+    #
+    # With background=True the constructor only subscribes: build() then
+    # runs over a copy of the library in a worker thread, while changes only
+    # note the tracks they touch, and finish(), back on the thread that
+    # changes the library, regroups those tracks from their current values.
+
+    def __init__(self, background=False):
+        self._artists = {}  # Normalized artist -> ArtistEntry
+        self._names = SortedList()  # Normalized artists in order
+        self._touched = {}  # Track ID -> artists it had, for changes made before finish()
+        track_library.subscribe(self._on_change)
+        self._subscribed = True
+        if not background:
+            self.build(track_library.library)
+            self.finish()
+
+    def build(self, tracks):
+        # Group a dict of tracks, e.g. a copy of track_library.library
+        artists = {}
+        keys = {}  # Artist as spelled -> normalized, most tracks share a spelling
+        for track_id, track in tracks.items():
+            artist = track.artist
+            key = keys.get(artist)
+            if key is None:
+                key = keys[artist] = normalize("artist", artist)
+            entry = artists.get(key)
+            if entry is None:
+                entry = artists[key] = ArtistEntry((artist or "").strip())
+            entry.track_ids[track_id] = None
+            entry.plays += track.play_count
+            entry.rating_total += track.rating
+        self._artists = artists
+        self._names = SortedList(artists)
+
+    def finish(self):
+        # Regroup the tracks changed since the copy build() read, from their current values
+        touched, self._touched = self._touched, None
+        library = track_library.library
+        keys = set()
+        for track_id, spellings in touched.items():
+            track = library.get(track_id)
+            if track is not None:
+                spellings.add(track.artist)
+            for artist in spellings:
+                key = normalize("artist", artist)
+                entry = self._artists.get(key)
+                if entry is not None:
+                    entry.track_ids.pop(track_id, None)
+                    keys.add(key)
+            if track is not None:
+                key = normalize("artist", track.artist)
+                entry = self._artists.get(key)
+                if entry is None:
+                    entry = self._artists[key] = ArtistEntry((track.artist or "").strip())
+                    self._names.add(key)
+                entry.track_ids[track_id] = None
+                keys.add(key)
+        for key in keys:
+            entry = self._artists[key]
+            if not entry.track_ids:
+                del self._artists[key]
+                self._names.discard(key)
+                continue
+            tracks = [library[track_id] for track_id in entry.track_ids]
+            entry.plays = sum(track.play_count for track in tracks)
+            entry.rating_total = sum(track.rating for track in tracks)
+
+    def __len__(self):
+        return len(self._artists)
+
+    def __contains__(self, artist):
+        return normalize("artist", artist) in self._artists
+
+    def get(self, artist):
+        # The ArtistEntry for an artist in any spelling, or None
+        return self._artists.get(normalize("artist", artist))
+
+    def entries(self, start=0, stop=None):
+        # ArtistEntry objects ordered by artist, positions start..stop of that order
+        artists = self._artists
+        return [artists[artist] for artist in self._names.slice(start, stop)]
+
+    def close(self):
+        if self._subscribed:
+            track_library.unsubscribe(self._on_change)
+            self._subscribed = False
+
+    def _add(self, track_id, artist, plays, rating):
+        key = normalize("artist", artist)
+        entry = self._artists.get(key)
+        if entry is None:
+            entry = self._artists[key] = ArtistEntry((artist or "").strip())
+            self._names.add(key)
+        entry.track_ids[track_id] = None
+        entry.plays += plays
+        entry.rating_total += rating
+
+    def _remove(self, track_id, artist, plays, rating):
+        key = normalize("artist", artist)
+        entry = self._artists.get(key)
+        if entry is None or entry.track_ids.pop(track_id, False) is False:
+            return
+        if not entry.track_ids:
+            del self._artists[key]
+            self._names.discard(key)
+            return
+        entry.plays -= plays
+        entry.rating_total -= rating
+
+    def _on_change(self, change):
+        if self._touched is not None:
+            self._touch(change)
+            return
+        if change.kind == "add":
+            item = change.new
+            self._add(change.key, item.artist, item.play_count, item.rating)
+        elif change.kind == "remove":
+            item = change.old
+            self._remove(change.key, item.artist, item.play_count, item.rating)
+        elif change.field in ("play_count", "rating", "artist"):
+            track = track_library.library[change.key]
+            entry = self.get(track.artist if change.field != "artist" else change.old)
+            if entry is None:
+                return
+            if change.field == "play_count":
+                entry.plays += change.new - change.old
+            elif change.field == "rating":
+                entry.rating_total += change.new - change.old
+            else:
+                self._remove(change.key, change.old, track.play_count, track.rating)
+                self._add(change.key, change.new, track.play_count, track.rating)
+
+    def _touch(self, change):
+        # Note a track changed before finish(), with the artists it had
+        spellings = self._touched.setdefault(change.key, set())
+        if change.kind == "add":
+            spellings.add(change.new.artist)
+        elif change.kind == "remove":
+            spellings.add(change.old.artist)
+        elif change.field == "artist":
+            spellings.update((change.old, change.new))
@@ -1,17 +1,65 @@
+# Star strings for each rating, ratings are clamped to 0-5
+STAR_TABLE = tuple("*" * rating for rating in range(6))
+
+# Fields that info() and details() format
+FORMATTED_FIELDS = frozenset(["name", "artist", "rating", "play_count"])
+
+# Fields that smart playlists and the library indexes compare, and their types.
+# Text fields compare case-insensitively and ignore surrounding spaces.
+FIELDS = {"name": str, "artist": str, "rating": int, "play_count": int}
+
+
+def normalize(field, value):
+    # The comparable form of a field value
+    if FIELDS[field] is str:
+        return (value or "").strip().lower()
+    return int(value)
+
+
 class LibraryItem:
+    # Bumped whenever a formatted field is set, however it is set, so strings
+    # formatted for an older version are rebuilt. Items with nothing cached
+    # have nothing to rebuild and keep sharing the class value.
+    version = 0
+    _info = None  # (version, info) formatted for that version
+    _details = None  # (version, details) formatted for that version
+
     def __init__(self, name, artist, rating=0, play_count=0, image_path=None):
-        self.name = name
-        self.artist = artist
-        self.rating = min(max(0, int(rating)), 5) 
-        self.play_count = max(0, int(play_count))  
-        self.image_path = str(image_path) if image_path else None
+        # Straight into __dict__: a new item has nothing cached, and loading
+        # a catalog creates millions of these
+        self.__dict__.update(
+            name=name,
+            artist=artist,
+            rating=min(max(0, int(rating)), 5),
+            play_count=max(0, int(play_count)),
+            image_path=str(image_path) if image_path else None,
+        )
+
+    def __setattr__(self, field, value):
+        object.__setattr__(self, field, value)
+        if field in FORMATTED_FIELDS and (self._info is not None or self._details is not None):
+            self.__dict__["version"] = self.version + 1
 
-        
     def info(self):
-        return f"{self.name} - {self.artist} {self.stars()}"
+        info = self._info
+        if info is None or info[0] != self.version:
+            info = self._info = (self.version, f"{self.name} - {self.artist} {self.stars()}")
+        return info[1]
+
+    def label(self):
+        # "Name - Artist" as shown in track lists; joining two strings costs
+        # no more than a cache lookup, so it is not cached
+        return f"{self.name} - {self.artist}"
+
+    def details(self):
+        # "Play count: N | Rating: N" as shown under a track
+        details = self._details
+        if details is None or details[0] != self.version:
+            details = self._details = (self.version, f"Play count: {self.play_count} | Rating: {self.rating}")
+        return details[1]
 
     def stars(self):
-        stars = ""
-        for i in range(self.rating):
-            stars += "*"
-        return stars
\ No newline at end of file
+        rating = self.rating
+        if 0 <= rating < len(STAR_TABLE):
+            return STAR_TABLE[rating]
+        return "*" * rating
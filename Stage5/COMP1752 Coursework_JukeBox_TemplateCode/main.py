@@ -1,61 +1,427 @@
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
 import tkinter as tk
-from tkinter import ttk, messagebox
-from PIL import Image, ImageTk
+from tkinter import ttk, messagebox, simpledialog, filedialog
 import os
-import csv
-from library_item import LibraryItem
+import itertools
+from instrumentation import timed
+from image_registry import ImageRegistry, THUMBNAIL_SIZE
+from jukebox_model import JukeboxModel, SEARCH_TYPES
+from play_queue import REPEAT_MODES
+from play_stats import WINDOWS
+from playlist_store import PlaylistStore, PlaylistStoreError
+import instrumentation
 import track_library
 
+_IMPORT_FINISHED = time.perf_counter()
+
+# PIL is imported on first use, see _import_pil()
+Image = None
+ImageTk = None
+
+SEARCH_PAGE_SIZE = 25  # Search results rendered per page
+SEARCH_CHUNK_SIZE = 5  # Search results rendered per after() callback
+PLAYLIST_PAGE_SIZE = 50  # Playlist rows rendered per page
+PLAYLISTS_FILE = "playlists.jbpl"
+SMART_PLAYLISTS_FILE = "smart_playlists.json"  # Defined through the API, see api_server.py
+TRACKS_FILE = "tracks_data.csv"
+CATALOG_POLL_MS = 2000  # How often the catalog file is checked for outside changes
+PLAYBACK_POLL_MS = 200  # How often the UI collects playback events
+BACKGROUND_POLL_MS = 100  # How often the UI checks on work started in a worker thread
+PLAY_LOG_FILE = "plays.log"
+CHART_SIZE = 10
+CHARTS_REFRESH_MS = 5000
+RECOMMENDATIONS = 3  # Suggestions shown under a search result
+ARTIST_PAGE_SIZE = 200  # Artist rows shown per page of the artist browser
+# Sortable columns of the all-tracks list: (track field, header text)
+TRACK_COLUMNS = [("name", "Title"), ("artist", "Artist"), ("rating", "Rating"), ("play_count", "Plays")]
+
+# Set JUKEBOX_STARTUP_REPORT=1 to print startup phase timings, and album art sharing on exit
+STARTUP_REPORT = bool(os.environ.get("JUKEBOX_STARTUP_REPORT"))
+
+
+def _import_pil():
+    # Import PIL the first time an image is needed
+    global Image, ImageTk
+    if Image is None:
+        started = time.perf_counter()
+        from PIL import Image as pil_image, ImageTk as pil_image_tk
+        Image, ImageTk = pil_image, pil_image_tk
+        if STARTUP_REPORT:
+            print(f"Deferred import of PIL took {(time.perf_counter() - started) * 1000:.1f} ms")
+    return Image, ImageTk
+
 
 class JukeBoxApp:
     def __init__(self, window):
         self.window = window
-        self.playlist_items = []  # List to store tracks added to playlist
-
+        # Headless library, search and playlist logic
+        self.model = JukeboxModel(
+            PlaylistStore(PLAYLISTS_FILE), play_log=PLAY_LOG_FILE, smart_playlist_file=SMART_PLAYLISTS_FILE)
+        self.model.playlist.subscribe(self._on_playlist_change)
+        self._playlist_rows = {}  # Track ID -> row frame, for the first _playlist_limit tracks
+        self._playlist_limit = PLAYLIST_PAGE_SIZE
+        self._playback_after_id = None
+        self._playback_subscribed = False
+        self._track_sort = None  # (field, descending) of the all-tracks list, None for library order
+        self._track_rows = {}  # Track ID -> row frame of the all-tracks list
+        self._all_tracks_list = None
+        # Album art thumbnails shared by every row showing the same image
+        self.images = ImageRegistry(self._decode_thumbnail, lambda photo: photo.width() * photo.height() * 4)
+
+        # State of the streamed search currently being rendered
+        self._search_stream = None
+        self._search_token = 0
+        self._search_after_id = None
+        self._search_loading = False
+        self._search_shown = 0
+        self._search_list_frame = None
+        self._load_more_button = None
+
+        # Phase name -> seconds, reported once the first tab is built
+        self.startup_timings = {}
+        self._record_startup_phase("import", _IMPORT_FINISHED - _IMPORT_STARTED)
+        self._library_loaded = False
+        self._built_tabs = set()
+
+        started = time.perf_counter()
         self._configure_window()
         self._setup_tabs()
-        self._load_tracks_from_csv("tracks_data.csv")
-        self._initialize_ui_components()
+        self._record_startup_phase("window", time.perf_counter() - started)
+
+        # Let the window appear before loading the library and building tabs
+        self.window.after(1, self._finish_startup)
 
     def _configure_window(self):
         # Set up the main window properties
         self.window.title("JukeBox")
         self.window.geometry("1200x600")
         self.window.configure(bg="gray")
+        self.window.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.window.bind_all("<Control-z>", lambda e: self._undo())
+        self.window.bind_all("<Control-y>", lambda e: self._redo())
+
+    def _on_close(self):
+        # Keep the open playlist before the window goes away
+        try:
+            self.model.save_playlist()
+        except (OSError, PlaylistStoreError) as e:
+            print(f"Error saving playlist: {e}")
+        try:
+            self.model.close()
+        except OSError as e:
+            print(f"Error saving tracks: {e}")
+        if STARTUP_REPORT:
+            self._report_image_sharing()
+        self.window.destroy()
 
     def _setup_tabs(self):
-        # Create main and playlist tabs
+        # Create main and playlist tabs, their contents are built on first selection
         self.tab_control = ttk.Notebook(self.window)
         self.main_tab = ttk.Frame(self.tab_control)
         self.playlist_tab = ttk.Frame(self.tab_control)
+        self.charts_tab = ttk.Frame(self.tab_control)
+        self.artists_tab = ttk.Frame(self.tab_control)
         self.tab_control.add(self.main_tab, text="Main")
         self.tab_control.add(self.playlist_tab, text="Playlists")
+        self.tab_control.add(self.artists_tab, text="Artists")
+        self.tab_control.add(self.charts_tab, text="Charts")
         self.tab_control.pack(expand=1, fill="both")
 
-    def _initialize_ui_components(self):
-        # Initialize all UI components
+        self._tab_builders = {
+            str(self.main_tab): self._build_main_tab,
+            str(self.playlist_tab): self._setup_playlist_ui,
+            str(self.charts_tab): self._setup_charts_ui,
+            str(self.artists_tab): self._setup_artists_ui,
+        }
+        self.tab_control.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+
+        self._loading_label = ttk.Label(self.main_tab, text="Loading library...", font=("Arial", 12))
+        self._loading_label.pack(pady=20)
+
+    def _finish_startup(self):
+        # Load the library and build the visible tab once the window is shown
+        started = time.perf_counter()
+        loaded = self._load_tracks_from_csv(TRACKS_FILE)
+        self._record_startup_phase("load", time.perf_counter() - started)
+
+        # Edits and play counts are written back to the catalog once they settle,
+        # unless it failed to load and saving would replace it with a partial library
+        if loaded:
+            self.model.start_autosave(TRACKS_FILE)
+            self.model.watch_catalog(TRACKS_FILE)
+            self.window.after(CATALOG_POLL_MS, self._poll_catalog)
+
+        # Start logging plays, reading back the recent ones for the charts in a worker thread
+        self.model.load_play_charts(background=True)
+        self.window.after(BACKGROUND_POLL_MS, self._check_play_log, time.perf_counter())
+
+        if self.model.playlist_error is not None:
+            messagebox.showwarning(
+                "Playlists",
+                f"Could not read the saved playlists: {self.model.playlist_error}\n"
+                "Starting with an empty playlist."
+            )
+
+        self._loading_label.destroy()
+        self._library_loaded = True
+        self._build_selected_tab()
+
+        if STARTUP_REPORT:
+            self._report_startup_timings()
+
+        # Group tracks by artist and build the recommender in worker threads, so the
+        # artist browser opens at once and the first track shown does not wait for them
+        self.model.build_in_background("artist_index")
+        try:
+            self.model.build_in_background("recommender")
+        except PlaylistStoreError as e:
+            print(f"Error building recommendations: {e}")
+        self.window.after(BACKGROUND_POLL_MS, self._install_builds, time.perf_counter())
+
+    def _check_play_log(self, started):
+        charts = self.model.play_charts
+        if not charts.loaded():
+            self.window.after(BACKGROUND_POLL_MS, self._check_play_log, started)
+            return
+        self._record_startup_phase("play log", time.perf_counter() - started)
+        if charts.load_error is not None:
+            print(f"Error opening play log: {charts.load_error}")
+
+    def _install_builds(self, started):
+        # Put the structures built in worker threads in place as they finish
+        try:
+            for name in self.model.poll_builds():
+                self._record_startup_phase(name.replace("_", " "), time.perf_counter() - started)
+        except (OSError, PlaylistStoreError) as e:
+            print(f"Error building recommendations: {e}")
+        if self.model.pending_builds():
+            self.window.after(BACKGROUND_POLL_MS, self._install_builds, started)
+
+    def _on_tab_changed(self, event):
+        # Build a tab the first time it is selected
+        if self._library_loaded:
+            self._build_selected_tab()
+            selected = str(self.tab_control.select())
+            if self._tab_is_built(self.charts_tab) and selected == str(self.charts_tab):
+                self._draw_charts()
+            elif self._tab_is_built(self.artists_tab) and selected == str(self.artists_tab):
+                self._refresh_artist_rows()
+
+    def _build_selected_tab(self):
+        # Run the builder of the selected tab unless it has already been built
+        tab = str(self.tab_control.select())
+        if tab in self._built_tabs or tab not in self._tab_builders:
+            return
+
+        started = time.perf_counter()
+        self._built_tabs.add(tab)
+        self._tab_builders[tab]()
+        tab_name = self.tab_control.tab(tab, "text")
+        self._record_startup_phase(f"build {tab_name}", time.perf_counter() - started)
+
+    def _poll_catalog(self):
+        # Apply changes made to the catalog file by other programs
+        diff = self.model.poll_catalog()
+        if diff is not None:
+            self._show_catalog_diff(diff)
+        self.window.after(CATALOG_POLL_MS, self._poll_catalog)
+
+    def _show_catalog_diff(self, diff):
+        # Redraw only the rows of the tracks a reload touched
+        touched = [*diff.removed, *diff.changed, *diff.added]
+        if not touched:
+            return
+        if self._tab_is_built(self.main_tab):
+            if self._track_sort is not None:
+                # Changed values can move rows anywhere in a sorted list
+                self._display_all_tracks()
+            else:
+                for track_id in diff.removed:
+                    row = self._track_rows.pop(track_id, None)
+                    if row is not None:
+                        row.destroy()
+                for track_id in diff.changed:
+                    row = self._track_rows.get(track_id)
+                    if row is not None:
+                        self._create_track_display(
+                            self._all_tracks_list, track_id, self.model.get_track(track_id), before=row
+                        )
+                        row.destroy()
+                for track_id, track in diff.added.items():
+                    self._create_track_display(self._all_tracks_list, track_id, track)
+        for track_id in touched:
+            self._refresh_playlist_row(track_id)
+        if self._tab_is_built(self.artists_tab):
+            self._refresh_artist_rows()
+
+    def _record_startup_phase(self, phase, seconds):
+        # Keep a startup phase for the report and the metrics registry
+        self.startup_timings[phase] = seconds
+        if instrumentation.ENABLED:
+            instrumentation.registry.timer(f"startup.{phase}").record(seconds)
+
+    def _tab_is_built(self, tab):
+        # Whether the contents of a tab have been created yet
+        return str(tab) in self._built_tabs
+
+    def _build_main_tab(self):
+        # Create the search interface and track displays
         self._setup_search_ui()
         self._setup_track_display()
-        self._setup_playlist_ui()
 
+    def _setup_charts_ui(self):
+        # Most played tracks per window, refreshed while the tab is open
+        self._chart_labels = {}
+        for window in WINDOWS:
+            frame = ttk.LabelFrame(self.charts_tab, text=f"Most played this {window}")
+            frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
+            label = ttk.Label(frame, text="", font=("Courier", 11), justify=tk.LEFT)
+            label.pack(anchor="nw", padx=10, pady=10)
+            self._chart_labels[window] = label
+        self._refresh_charts()
+
+    def _refresh_charts(self):
+        if str(self.tab_control.select()) == str(self.charts_tab):
+            self._draw_charts()
+        self.window.after(CHARTS_REFRESH_MS, self._refresh_charts)
+
+    def _draw_charts(self):
+        for window, label in self._chart_labels.items():
+            lines = []
+            for rank, (track_id, plays) in enumerate(self.model.play_charts.top(window, CHART_SIZE), 1):
+                track = self.model.get_track(track_id)
+                lines.append(f"{rank:>2}. {track.label() if track else track_id} ({plays})")
+            label.configure(text="\n".join(lines) or "No plays yet")
+
+    def _setup_artists_ui(self):
+        # Artists with their track count, plays and average rating, and the tracks of the selected one
+        artists_frame = ttk.LabelFrame(self.artists_tab, text="Artists")
+        artists_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        columns = ("tracks", "plays", "rating")
+        self.artist_tree = ttk.Treeview(artists_frame, columns=columns, selectmode="browse")
+        self.artist_tree.heading("#0", text="Artist")
+        for column, title in zip(columns, ("Tracks", "Plays", "Avg. Rating")):
+            self.artist_tree.heading(column, text=title)
+            self.artist_tree.column(column, width=90, anchor="e")
+        self.artist_tree.bind("<<TreeviewSelect>>", self._on_artist_selected)
+
+        footer = ttk.Frame(artists_frame)
+        footer.pack(side="bottom", fill="x", pady=5)
+        self.artist_count_label = ttk.Label(footer, font=("Arial", 10))
+        self.artist_count_label.pack(side=tk.LEFT, padx=10)
+        self.artist_more_button = ttk.Button(footer, text="Show more", command=self._show_more_artist_rows)
+        self.artist_more_button.pack(side=tk.LEFT)
+
+        scrollbar = ttk.Scrollbar(artists_frame, orient="vertical", command=self.artist_tree.yview)
+        self.artist_tree.configure(yscrollcommand=scrollbar.set)
+        self.artist_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill="y")
+
+        self.artist_tracks_frame = ttk.LabelFrame(self.artists_tab, text="Tracks")
+        self.artist_tracks_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=5, pady=5)
+        ttk.Button(
+            self.artist_tracks_frame,
+            text="Add Artist to Playlist",
+            command=self._add_artist_to_playlist
+        ).pack(anchor="w", padx=10, pady=5)
+        self.artist_track_tree = ttk.Treeview(self.artist_tracks_frame, columns=("rating", "plays"), show="tree headings")
+        self.artist_track_tree.heading("#0", text="Title")
+        self.artist_track_tree.heading("rating", text="Rating")
+        self.artist_track_tree.heading("plays", text="Plays")
+        for column in ("rating", "plays"):
+            self.artist_track_tree.column(column, width=70, anchor="e")
+        self.artist_track_tree.pack(fill=tk.BOTH, expand=True)
+
+        self._artist_rows = []  # ArtistEntry per shown row, in order
+        self._show_more_artist_rows()
+
+    def _show_more_artist_rows(self):
+        # Add the next page of artists; only the shown rows are ever read
+        entries = self.model.artist_index.entries(len(self._artist_rows), len(self._artist_rows) + ARTIST_PAGE_SIZE)
+        for entry in entries:
+            self.artist_tree.insert("", "end", iid=str(len(self._artist_rows)), text=entry.name,
+                                    values=self._artist_values(entry))
+            self._artist_rows.append(entry)
+        self._update_artist_footer()
+
+    def _refresh_artist_rows(self):
+        # Redraw the shown rows from the index, which plays and edits keep current
+        self.artist_tree.delete(*self.artist_tree.get_children())
+        shown = len(self._artist_rows)
+        self._artist_rows = []
+        for entry in self.model.artist_index.entries(0, max(shown, ARTIST_PAGE_SIZE)):
+            self.artist_tree.insert("", "end", iid=str(len(self._artist_rows)), text=entry.name,
+                                    values=self._artist_values(entry))
+            self._artist_rows.append(entry)
+        self._update_artist_footer()
+
+    def _artist_values(self, entry):
+        return entry.track_count, entry.plays, f"{entry.average_rating:.1f}"
+
+    def _update_artist_footer(self):
+        total = len(self.model.artist_index)
+        self.artist_count_label.configure(text=f"Showing {len(self._artist_rows)} of {total} artists")
+        if len(self._artist_rows) < total:
+            self.artist_more_button.pack(side=tk.LEFT)
+        else:
+            self.artist_more_button.pack_forget()
+
+    def _selected_artist(self):
+        selection = self.artist_tree.selection()
+        return self._artist_rows[int(selection[0])] if selection else None
+
+    def _on_artist_selected(self, event):
+        # List the tracks of the selected artist
+        entry = self._selected_artist()
+        self.artist_track_tree.delete(*self.artist_track_tree.get_children())
+        if entry is None:
+            return
+        self.artist_tracks_frame.configure(text=f"Tracks by {entry.name}")
+        for track_id, track in self.model.artist_tracks(entry.name):
+            self.artist_track_tree.insert("", "end", text=track.name, values=(track.stars(), track.play_count))
+
+    def _add_artist_to_playlist(self):
+        entry = self._selected_artist()
+        if entry is None:
+            return
+        added = self.model.add_tracks_to_playlist(list(entry.track_ids))
+        messagebox.showinfo("Playlist", f"Added {added} tracks to {self.model.playlist_name}")
+
+    def _report_image_sharing(self):
+        # Print how much album art was shared instead of decoded per row
+        stats = self.images.stats()
+        print(f"Album art: {stats['paths']} files, {stats['contents']} distinct "
+              f"(dedup ratio {stats['dedup_ratio']:.2f}), {stats['thumbnails']} thumbnails decoded "
+              f"for {stats['thumbnail_uses']} rows, {stats['memory_saved'] / 1024:.0f} KiB saved")
+
+    def _report_startup_timings(self):
+        # Print a breakdown of the startup phases
+        total = 0.0
+        print("Startup timings:")
+        for phase, seconds in self.startup_timings.items():
+            total += seconds
+            print(f"  {phase:<16}{seconds * 1000:>10.1f} ms")
+        print(f"  {'total':<16}{total * 1000:>10.1f} ms")
+
+    @property
+    def playlist_items(self):
+        # Tracks added to the playlist, owned by the model
+        return self.model.playlist_items
+
+    @timed("main.load_tracks_from_csv")
     def _load_tracks_from_csv(self, filename):
-        # Load tracks from CSV file into the track_library
+        # Load tracks from CSV file into the track_library, returning whether it loaded
         try:
-            with open(filename, 'r') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    item = LibraryItem(
-                        name=row.get('Title'),
-                        artist=row.get('Artist'),
-                        rating=(row.get('Rating', 0)),
-                        play_count=row.get('Play Count', 0),
-                        image_path=row.get('Image Path')
-                    )
-                    if 'ID' in row:
-                        track_library.library[row['ID']] = item
-
+            # Large catalogs are parsed on every core, small ones in this process
+            self.model.load_csv(filename, jobs=os.cpu_count() or 1)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load tracks: {str(e)}")
+            return False
+        return True
 
     def _setup_search_ui(self):
         # Create search interface with search field and filter options
@@ -83,6 +449,12 @@ class JukeBoxApp:
             command=self._clear_search
         ).pack(side=tk.LEFT, padx=5)
 
+        ttk.Button(
+            search_frame,
+            text="Add Results to Playlist",
+            command=self._add_search_results_to_playlist
+        ).pack(side=tk.LEFT, padx=5)
+
         # Search filter options
         search_options_frame = ttk.Frame(search_frame)
         search_options_frame.pack(side=tk.LEFT, padx=10)
@@ -93,7 +465,7 @@ class JukeBoxApp:
         ttk.Combobox(
             search_options_frame,
             textvariable=self.search_option,
-            values=["ALL", "Tracks", "Artists"],
+            values=SEARCH_TYPES,
             state="readonly",
             width=10
         ).pack(side=tk.LEFT, padx=5)
@@ -121,11 +493,48 @@ class JukeBoxApp:
         playlist_container = ttk.Frame(self.playlist_tab)
         playlist_container.pack(fill="both", expand=True, padx=10, pady=10)
 
-        playlist_frame = ttk.LabelFrame(playlist_container, text="Current Playlist")
-        playlist_frame.pack(fill="both", expand=True, padx=5, pady=5)
+        # Named playlist selection and management
+        manage_frame = ttk.Frame(playlist_container)
+        manage_frame.pack(fill="x", padx=5, pady=(0, 5))
+
+        ttk.Label(manage_frame, text="Playlist:").pack(side=tk.LEFT)
+        self.playlist_name_var = tk.StringVar(value=self.model.playlist_name)
+        self.playlist_chooser = ttk.Combobox(
+            manage_frame,
+            textvariable=self.playlist_name_var,
+            state="readonly",
+            width=30
+        )
+        self.playlist_chooser.pack(side=tk.LEFT, padx=5)
+        self.playlist_chooser.bind("<<ComboboxSelected>>", self._on_playlist_selected)
+
+        for text, command in [
+            ("New", self._new_playlist),
+            ("Delete", self._delete_playlist),
+            ("Import...", self._import_playlists),
+            ("Export...", self._export_playlists),
+        ]:
+            ttk.Button(manage_frame, text=text, command=command).pack(side=tk.LEFT, padx=2)
+
+        # Saved smart playlists, added to the open playlist on request
+        smart_frame = ttk.Frame(playlist_container)
+        smart_frame.pack(fill="x", padx=5, pady=(0, 5))
+
+        ttk.Label(smart_frame, text="Smart playlist:").pack(side=tk.LEFT)
+        self.smart_name_var = tk.StringVar()
+        self.smart_chooser = ttk.Combobox(smart_frame, textvariable=self.smart_name_var, state="readonly", width=30)
+        self.smart_chooser.pack(side=tk.LEFT, padx=5)
+        self.smart_chooser.bind("<<ComboboxSelected>>", lambda e: self._show_smart_playlist())
+        ttk.Button(smart_frame, text="Add to Playlist", command=self._add_smart_playlist).pack(side=tk.LEFT, padx=2)
+        ttk.Button(smart_frame, text="Delete", command=self._delete_smart_playlist).pack(side=tk.LEFT, padx=2)
+        self.smart_count_label = ttk.Label(smart_frame, font=("Arial", 10))
+        self.smart_count_label.pack(side=tk.LEFT, padx=10)
+
+        self.playlist_frame = ttk.LabelFrame(playlist_container, text=self.model.playlist_name)
+        self.playlist_frame.pack(fill="both", expand=True, padx=5, pady=5)
 
         # Play All button
-        play_button_frame = ttk.Frame(playlist_frame)
+        play_button_frame = ttk.Frame(self.playlist_frame)
         play_button_frame.pack(fill="x", pady=(5, 10))
 
         ttk.Button(
@@ -135,59 +544,230 @@ class JukeBoxApp:
             width=15
         ).pack(side=tk.LEFT, padx=10)
 
+        ttk.Button(play_button_frame, text="Skip", command=self._skip_track).pack(side=tk.LEFT, padx=2)
+        ttk.Button(play_button_frame, text="Stop", command=self._stop_playback).pack(side=tk.LEFT, padx=2)
+
+        ttk.Label(play_button_frame, text="Repeat:").pack(side=tk.LEFT, padx=(10, 0))
+        self.repeat_var = tk.StringVar(value="off")
+        repeat_chooser = ttk.Combobox(
+            play_button_frame,
+            textvariable=self.repeat_var,
+            values=REPEAT_MODES,
+            state="readonly",
+            width=5
+        )
+        repeat_chooser.pack(side=tk.LEFT, padx=5)
+        repeat_chooser.bind("<<ComboboxSelected>>", lambda e: self.model.scheduler.set_repeat(self.repeat_var.get()))
+
+        self.shuffle_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            play_button_frame,
+            text="Shuffle",
+            variable=self.shuffle_var,
+            command=lambda: self.model.scheduler.set_shuffle(self.shuffle_var.get())
+        ).pack(side=tk.LEFT, padx=5)
+
+        self.now_playing_label = ttk.Label(play_button_frame, text="", font=("Arial", 11, "bold"))
+        self.now_playing_label.pack(side=tk.LEFT, padx=10)
+
+        # Paging footer, only the first _playlist_limit tracks are drawn
+        footer = ttk.Frame(self.playlist_frame)
+        footer.pack(side="bottom", fill="x", pady=5)
+        self.playlist_count_label = ttk.Label(footer, font=("Arial", 10))
+        self.playlist_count_label.pack(side=tk.LEFT, padx=10)
+        self.playlist_more_button = ttk.Button(footer, text="Show more", command=self._show_more_playlist_rows)
+        self.playlist_more_button.pack(side=tk.LEFT)
+
         # Scrollable playlist container
-        scroll_container = ttk.Frame(playlist_frame)
-        scroll_container.pack(fill="both", expand=True)
+        self.playlist_scrollable_frame = self._create_scrollable_frame(self.playlist_frame)
 
-        playlist_canvas = tk.Canvas(scroll_container)
-        playlist_scrollbar = ttk.Scrollbar(scroll_container, orient="vertical", command=playlist_canvas.yview)
+        self._refresh_playlist_chooser()
+        self._refresh_smart_chooser()
+        self._update_playlist_display()
 
-        self.playlist_scrollable_frame = ttk.Frame(playlist_canvas)
-        self.playlist_scrollable_frame.bind(
-            "<Configure>",
-            lambda e: playlist_canvas.configure(
-                scrollregion=playlist_canvas.bbox("all")
+        if self.model.smart_playlist_error is not None:
+            messagebox.showwarning(
+                "Smart Playlists",
+                f"Could not read the saved smart playlists: {self.model.smart_playlist_error}\n"
+                "Smart playlists defined now will not be saved."
             )
-        )
 
-        playlist_canvas.create_window((0, 0), window=self.playlist_scrollable_frame, anchor="nw")
-        playlist_canvas.configure(yscrollcommand=playlist_scrollbar.set)
+    def _refresh_playlist_chooser(self):
+        # Show the stored playlist names and the open playlist
+        self.playlist_chooser.configure(values=self.model.playlist_names())
+        self.playlist_name_var.set(self.model.playlist_name)
+        self.playlist_frame.configure(text=self.model.playlist_name)
+
+    def _refresh_smart_chooser(self):
+        names = self.model.smart_playlists.names()
+        self.smart_chooser.configure(values=names)
+        if self.smart_name_var.get() not in names:
+            self.smart_name_var.set(names[0] if names else "")
+        self._show_smart_playlist()
+
+    def _show_smart_playlist(self):
+        # Show the size of the selected smart playlist, which follows library changes
+        name = self.smart_name_var.get()
+        if name in self.model.smart_playlists:
+            count = len(self.model.smart_playlists.get(name))
+            self.smart_count_label.configure(text=f"{count} track{'s' if count != 1 else ''}")
+        else:
+            self.smart_count_label.configure(text="None defined" if not name else "")
+
+    def _add_smart_playlist(self):
+        name = self.smart_name_var.get()
+        if name not in self.model.smart_playlists:
+            return
+        added = self.model.add_tracks_to_playlist(track_id for track_id, _ in self.model.smart_playlist_tracks(name))
+        messagebox.showinfo("Playlist", f"Added {added} tracks to {self.model.playlist_name}")
 
-        playlist_canvas.pack(side="left", fill="both", expand=True)
-        playlist_scrollbar.pack(side="right", fill="y")
+    def _delete_smart_playlist(self):
+        name = self.smart_name_var.get()
+        if name and messagebox.askyesno("Delete Smart Playlist", f"Delete the smart playlist \"{name}\"?"):
+            try:
+                self.model.delete_smart_playlist(name)
+            except OSError as e:
+                messagebox.showerror("Error", f"Could not save the smart playlists: {e}")
+            self._refresh_smart_chooser()
+
+    def _on_playlist_selected(self, event):
+        self._run_playlist_action(self.model.open_playlist, self.playlist_name_var.get())
+
+    def _new_playlist(self):
+        name = simpledialog.askstring("New Playlist", "Playlist name:", parent=self.window)
+        if name and name.strip():
+            self._run_playlist_action(self.model.open_playlist, name.strip())
+
+    def _delete_playlist(self):
+        name = self.model.playlist_name
+        if messagebox.askyesno("Delete Playlist", f"Delete the playlist \"{name}\"?"):
+            self._run_playlist_action(self.model.delete_playlist, name)
+
+    def _import_playlists(self):
+        path = filedialog.askopenfilename(
+            title="Import Playlists",
+            filetypes=[("Playlists", "*.json *.txt"), ("All files", "*.*")]
+        )
+        if path:
+            names = self._run_playlist_action(self.model.import_playlists, path)
+            if names:
+                messagebox.showinfo("Import", f"Imported {len(names)} playlist(s)")
+
+    def _export_playlists(self):
+        path = filedialog.asksaveasfilename(
+            title="Export Playlists",
+            defaultextension=".json",
+            filetypes=[("All playlists (JSON)", "*.json"), ("Open playlist (track IDs)", "*.txt")]
+        )
+        if path:
+            self._run_playlist_action(self.model.export_playlists, path)
 
-        self._update_playlist_display()
+    def _run_playlist_action(self, action, *args):
+        # Run a playlist store operation and report failures
+        try:
+            result = action(*args)
+        except (OSError, ValueError, PlaylistStoreError) as e:
+            messagebox.showerror("Error", f"Playlist operation failed: {e}")
+            result = None
+        self._refresh_playlist_chooser()
+        return result
 
     def _play_all_tracks(self):
-        # Play all tracks in playlist and update play counts
+        # Queue the playlist; the scheduler plays it over time
         if not self.playlist_items:
             messagebox.showinfo("Empty Playlist", "There are no tracks in the playlist to play.")
             return
 
-        track_names = []
+        if not self._playback_subscribed:
+            self.model.scheduler.subscribe(self._on_playback_event)
+            self._playback_subscribed = True
+        self.model.start_playback()
+        self._poll_playback()
+
+    def _skip_track(self):
+        if self._playback_subscribed:
+            self.model.scheduler.skip()
+            self._poll_playback()
+
+    def _stop_playback(self):
+        if self._playback_subscribed:
+            self.model.scheduler.stop()
+            self._poll_playback()
+
+    def _poll_playback(self):
+        # Collect playback events while something is playing
+        if self._playback_after_id is not None:
+            self.window.after_cancel(self._playback_after_id)
+            self._playback_after_id = None
+
+        scheduler = self.model.scheduler
+        scheduler.poll()
+        if scheduler.is_playing:
+            self._playback_after_id = self.window.after(PLAYBACK_POLL_MS, self._poll_playback)
+        else:
+            # Pick up a "finished" event posted after the first poll
+            scheduler.poll()
+
+    def _on_playback_event(self, event):
+        # Update the now playing line and the row of the track that advanced
+        if event.kind == "playing":
+            track_name = track_library.get_name(event.track_id)
+            track_artist = track_library.get_artist(event.track_id)
+            self.now_playing_label.configure(
+                text=f"Now playing: {track_name} - {track_artist} ({event.position + 1}/{event.total})"
+            )
+            self._refresh_playlist_row(event.track_id)
+        elif event.kind == "finished":
+            self.now_playing_label.configure(text=f"Finished playing {event.total} tracks")
+        elif event.kind == "stopped":
+            self.now_playing_label.configure(text="Stopped")
 
-        for track_id, _ in self.playlist_items:
-            # Increment play count
-            track_library.increment_play_count(track_id)
+    @timed("main.display_all_tracks")
+    def _display_all_tracks(self):
+        # Show all tracks in library with scrollbar
+        if not self._tab_is_built(self.main_tab):
+            return
 
-            # Get track info for display
-            track_name = track_library.get_name(track_id)
-            track_artist = track_library.get_artist(track_id)
-            track_names.append(f"{track_name} - {track_artist}")
+        self._clear_frame(self.all_tracks_frame)
 
-        # Update UI
-        self._update_playlist_display()
-        self._display_all_tracks()
+        # Column headers, clicking one sorts by it and clicking again reverses the order
+        header_frame = ttk.Frame(self.all_tracks_frame)
+        header_frame.pack(fill="x", padx=10, pady=(5, 0))
+        ttk.Label(header_frame, text="Sort by:").pack(side=tk.LEFT)
+        for field, title in TRACK_COLUMNS:
+            if self._track_sort is not None and self._track_sort[0] == field:
+                title += " \u25bc" if self._track_sort[1] else " \u25b2"
+            ttk.Button(
+                header_frame,
+                text=title,
+                command=lambda f=field: self._sort_tracks(f)
+            ).pack(side=tk.LEFT, padx=2)
+
+        scrollable_frame = self._create_scrollable_frame(self.all_tracks_frame)
+        self._all_tracks_list = scrollable_frame
+        self._track_rows = {}
+
+        # Sorted orders are read from the model's indexes, not sorted here
+        if self._track_sort is None:
+            tracks = self.model.tracks()
+        else:
+            tracks = self.model.sorted_tracks(*self._track_sort)
 
-        messagebox.showinfo(
-            "Playing All",
-            f"Now playing {len(self.playlist_items)} tracks")
+        # Add each track to display
+        for track_id, track in tracks:
+            self._create_track_display(scrollable_frame, track_id, track, show_buttons=False)
 
-    def _display_all_tracks(self):
-        # Show all tracks in library with scrollbar
-        self._clear_frame(self.all_tracks_frame)
+    def _sort_tracks(self, field):
+        # Sort the all-tracks list by a column; numbers start highest first
+        if self._track_sort is not None and self._track_sort[0] == field:
+            self._track_sort = (field, not self._track_sort[1])
+        else:
+            self._track_sort = (field, field in ("rating", "play_count"))
+        self._display_all_tracks()
 
-        container = ttk.Frame(self.all_tracks_frame)
+    def _create_scrollable_frame(self, parent, on_scroll_end=None):
+        # Build a canvas with a vertical scrollbar and return the inner frame
+        container = ttk.Frame(parent)
         container.pack(fill="both", expand=True)
 
         canvas = tk.Canvas(container)
@@ -201,15 +781,19 @@ class JukeBoxApp:
             )
         )
 
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            # Notify when the bottom of the list becomes visible
+            if on_scroll_end and float(last) >= 1.0:
+                on_scroll_end()
+
         canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+        canvas.configure(yscrollcommand=on_scroll)
 
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
-        # Add each track to display
-        for track_id, track in track_library.library.items():
-            self._create_track_display(scrollable_frame, track_id, track, show_buttons=False)
+        return scrollable_frame
 
     def _display_default_track(self):
         # Show default message in search results area
@@ -220,93 +804,163 @@ class JukeBoxApp:
         ).pack(pady=20)
 
     def _perform_search(self):
-        # Execute search and display results
+        # Start a streamed search, cancelling any stream that is still running
         search_term = self.search_var.get().strip().lower()
         search_type = self.search_option.get()
 
+        self._cancel_search_stream()
         self._clear_frame(self.search_results_frame)
 
-        results = self._filter_tracks(search_term, search_type)
+        self._search_stream = iter(self._filter_tracks(search_term, search_type))
+        self._search_shown = 0
+        self._search_list_frame = self._create_scrollable_frame(
+            self.search_results_frame,
+            on_scroll_end=self._load_more_results
+        )
 
-        if not results:
-            ttk.Label(
-                self.search_results_frame,
-                text="No matching tracks found",
-                font=("Arial", 12)
-            ).pack(pady=20)
+        # The first page is rendered straight away
+        self._load_more_results()
+
+    def _cancel_search_stream(self):
+        # Stop rendering the current search and drop its pending callback
+        self._search_token += 1
+        if self._search_after_id is not None:
+            self.window.after_cancel(self._search_after_id)
+            self._search_after_id = None
+        self._search_stream = None
+        self._search_loading = False
+        self._load_more_button = None
+
+    def _load_more_results(self):
+        # Render the next page of search results in chunks
+        if self._search_loading or self._search_stream is None:
             return
 
-        for track_id, track in results.items():
+        self._search_loading = True
+        if self._load_more_button is not None:
+            self._load_more_button.destroy()
+            self._load_more_button = None
+
+        self._render_search_chunk(self._search_token, SEARCH_PAGE_SIZE)
+
+    def _render_search_chunk(self, token, remaining):
+        # Render one chunk of results, then yield to the event loop
+        self._search_after_id = None
+        if token != self._search_token:
+            return
+
+        requested = min(SEARCH_CHUNK_SIZE, remaining)
+        chunk = list(itertools.islice(self._search_stream, requested))
+        for track_id, track in chunk:
             self._create_track_display(
-                self.search_results_frame,
+                self._search_list_frame,
                 track_id,
                 track,
                 show_buttons=True
             )
+        self._search_shown += len(chunk)
+        remaining -= len(chunk)
+
+        if len(chunk) < requested:
+            self._finish_search_stream()
+        elif remaining > 0:
+            self._search_after_id = self.window.after(
+                1, self._render_search_chunk, token, remaining
+            )
+        else:
+            self._finish_search_page()
 
-    def _filter_tracks(self, search_term, search_type):
-        # Filter tracks based on search criteria
-        results = {}
-
-        for track_id, track in track_library.library.items():
-            match = False
+    def _finish_search_page(self):
+        # Offer another page if the stream still has results
+        next_result = next(self._search_stream, None)
+        if next_result is None:
+            self._finish_search_stream()
+            return
 
-            if search_type in ["ALL", "Tracks"] and search_term in track.name.lower():
-                match = True
+        self._search_stream = itertools.chain([next_result], self._search_stream)
+        self._search_loading = False
+        self._load_more_button = ttk.Button(
+            self._search_list_frame,
+            text="Load more",
+            command=self._load_more_results
+        )
+        self._load_more_button.pack(pady=10)
 
-            if not match and search_type in ["ALL", "Artists"] and search_term in track.artist.lower():
-                match = True
+    def _finish_search_stream(self):
+        # All results have been rendered
+        self._search_stream = None
+        self._search_loading = False
 
-            if match:
-                results[track_id] = track
+        if not self._search_shown:
+            ttk.Label(
+                self._search_list_frame,
+                text="No matching tracks found",
+                font=("Arial", 12)
+            ).pack(pady=20)
 
-        return results
+    @timed("main.filter_tracks")
+    def _filter_tracks(self, search_term, search_type):
+        # Lazily yield (track_id, track) pairs matching the search criteria. A
+        # generator, so @timed measures the matching as the results are drawn
+        yield from self.model.search(search_term, search_type)
 
-    def _create_track_display(self, parent_frame, track_id, track, show_buttons=False):
-        # Create visual display for a track
+    def _create_track_display(self, parent_frame, track_id, track, show_buttons=False, before=None):
+        # Create visual display for a track, in front of another row if given
         track_frame = ttk.Frame(parent_frame)
-        track_frame.pack(fill="x", padx=10, pady=5)
+        track_frame.pack(fill="x", padx=10, pady=5, before=before)
+        if parent_frame is self._all_tracks_list:
+            self._track_rows[track_id] = track_frame
 
         self._display_track_image(track_frame, track)
 
-        track_name = track_library.get_name(track_id) or track.name
-        track_artist = track_library.get_artist(track_id) or track.artist
-
         if show_buttons:
-            self._create_detailed_track_display(track_frame, track_id, track_name, track_artist)
+            self._create_detailed_track_display(track_frame, track_id, track)
         else:
-            self._create_basic_track_display(track_frame, track_name, track_artist)
+            self._create_basic_track_display(track_frame, track)
 
+    @timed("main.display_track_image")
     def _display_track_image(self, parent_frame, track):
-        # Show track album art or placeholder
-        if hasattr(track, 'image_path') and track.image_path and os.path.exists(track.image_path):
+        # Show track album art or placeholder, one shared thumbnail per distinct image
+        img_tk = None
+        if hasattr(track, 'image_path') and track.image_path:
             try:
-                img = Image.open(track.image_path).resize((80, 80), Image.Resampling.LANCZOS)
-                img_tk = ImageTk.PhotoImage(img)
-                image_label = ttk.Label(parent_frame, image=img_tk)
-                image_label.image = img_tk
-                image_label.pack(side="left", padx=10)
+                img_tk = self.images.thumbnail(track.image_path)
             except Exception as e:
                 print(f"Error loading image {track.image_path}: {e}")
-                ttk.Label(parent_frame, text="No Image", font=("Arial", 10)).pack(side="left", padx=10)
+        if img_tk is not None:
+            label = ttk.Label(parent_frame, image=img_tk)
+            label.image = img_tk  # Keeps it shown after the registry drops it from its cache
+            label.pack(side="left", padx=10)
         else:
             ttk.Label(parent_frame, text="No Image", font=("Arial", 10)).pack(side="left", padx=10)
 
-    def _create_basic_track_display(self, parent_frame, track_name, track_artist):
-        # Simple track display with name and artist
-        info = f"{track_name} - {track_artist}"
-        ttk.Label(parent_frame, text=info, font=("Arial", 12)).pack(side="left", padx=10)
+    def _decode_thumbnail(self, path):
+        # Decode an art file for ImageRegistry, which shares the result between the labels using it
+        _import_pil()
+        img = Image.open(path).resize(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+        return ImageTk.PhotoImage(img)
 
-    def _create_detailed_track_display(self, parent_frame, track_id, track_name, track_artist):
-        # Detailed track display with play count, rating and buttons
-        info = f"{track_name} - {track_artist}"
-        ttk.Label(parent_frame, text=info, font=("Arial", 12, "bold")).pack(side="top", anchor="w", padx=10)
+    def _create_basic_track_display(self, parent_frame, track):
+        # Simple track display with name, artist, rating and play count
+        ttk.Label(parent_frame, text=track.label(), font=("Arial", 12)).pack(side="left", padx=10)
+        details = f"{track.stars()}  {track.play_count} plays"
+        ttk.Label(parent_frame, text=details, font=("Arial", 10)).pack(side="right", padx=10)
 
-        track_play_count = track_library.get_play_count(track_id)
-        track_rating = track_library.get_rating(track_id)
-
-        play_info = f"Play count: {track_play_count} | Rating: {track_rating}"
-        ttk.Label(parent_frame, text=play_info, font=("Arial", 10)).pack(side="top", anchor="w", padx=10)
+    def _create_detailed_track_display(self, parent_frame, track_id, track):
+        # Detailed track display with play count, rating and buttons
+        ttk.Label(parent_frame, text=track.label(), font=("Arial", 12, "bold")).pack(side="top", anchor="w", padx=10)
+        ttk.Label(parent_frame, text=track.details(), font=("Arial", 10)).pack(side="top", anchor="w", padx=10)
+
+        suggestions = [
+            self.model.get_track(other_id).label()
+            for other_id in self.model.recommend(track_id, RECOMMENDATIONS)
+        ]
+        if suggestions:
+            ttk.Label(
+                parent_frame,
+                text="You might also like: " + ", ".join(suggestions),
+                font=("Arial", 9, "italic")
+            ).pack(side="top", anchor="w", padx=10)
 
         buttons_frame = ttk.Frame(parent_frame)
         buttons_frame.pack(side="top", anchor="w", padx=10, pady=5)
@@ -335,10 +989,8 @@ class JukeBoxApp:
         track_name = track_library.get_name(track_id)
         track_artist = track_library.get_artist(track_id)
 
-        if track_name and track_artist:
-            track_library.increment_play_count(track_id)
-            updated_play_count = track_library.get_play_count(track_id)
-
+        updated_play_count = self.model.play_track(track_id)
+        if updated_play_count is not None:
             messagebox.showinfo(
                 "Playing",
                 f"Now playing: {track_name} by {track_artist}\nPlay count: {updated_play_count}"
@@ -348,55 +1000,165 @@ class JukeBoxApp:
 
     def _add_to_playlist(self, track_id):
         # Add track to playlist if not already present
-        track = track_library.library.get(track_id)
-        if not track:
+        self.model.add_to_playlist(track_id)
+
+    def _add_search_results_to_playlist(self):
+        # Add every match for the current search as one undo step
+        search_term = self.search_var.get()
+        if not search_term.strip():
             return
+        matches = self._filter_tracks(search_term, self.search_option.get())
+        added = self.model.add_tracks_to_playlist(track_id for track_id, _ in matches)
+        messagebox.showinfo("Playlist", f"Added {added} tracks to {self.model.playlist_name}")
 
-        # Check if track already exists in playlist
-        if track_id not in [item[0] for item in self.playlist_items]:
-            self.playlist_items.append((track_id, track))
-            self._update_playlist_display()
+    def _undo(self):
+        self._show_history_step(self.model.undo())
+
+    def _redo(self):
+        self._show_history_step(self.model.redo())
 
+    def _show_history_step(self, entry):
+        # Playlist rows follow the playlist by themselves; track edits need the views redrawn
+        if entry is None:
+            return
+        edited = [track_id for delta in entry.deltas if delta.kind == "edit" for track_id in delta.track_ids]
+        if edited:
+            self._display_all_tracks()
+            for track_id in edited:
+                self._refresh_playlist_row(track_id)
+
+    @timed("main.update_playlist_display")
     def _update_playlist_display(self):
         # Refresh playlist UI with current tracks
+        if not self._tab_is_built(self.playlist_tab):
+            return
+
         self._clear_frame(self.playlist_scrollable_frame)
+        self._playlist_rows = {}
+        self._playlist_limit = PLAYLIST_PAGE_SIZE
+        self._render_playlist_rows()
+
+    def _render_playlist_rows(self):
+        # Draw the tracks after the rendered ones, up to the page limit.
+        # Track objects are only looked up for the rows being drawn.
+        playlist = self.model.playlist
+        new_ids = itertools.islice(playlist.iter_ids(), len(self._playlist_rows), self._playlist_limit)
+        for track_id in list(new_ids):
+            self._create_playlist_item_display(track_id, playlist.get(track_id))
+        self._update_playlist_footer()
+
+    def _show_more_playlist_rows(self):
+        self._playlist_limit += PLAYLIST_PAGE_SIZE
+        self._render_playlist_rows()
+
+    def _update_playlist_footer(self):
+        total = len(self.model.playlist)
+        shown = len(self._playlist_rows)
+        self.playlist_count_label.configure(text=f"Showing {shown} of {total} tracks")
+        self.playlist_more_button.configure(state="normal" if shown < total else "disabled")
+
+    def _on_playlist_change(self, change):
+        # Apply a single playlist change to the playlist tab.
+        # The rendered rows always cover a prefix of the playlist.
+        if not self._tab_is_built(self.playlist_tab):
+            return
+
+        if change.kind in ("clear", "reset"):
+            self._update_playlist_display()
+            self._refresh_playlist_chooser()
+            return
 
-        for track_id, track in self.playlist_items:
-            self._create_playlist_item_display(track_id, track)
+        row = self._playlist_rows.get(change.track_id)
+        if change.kind == "remove":
+            if row is not None:
+                del self._playlist_rows[change.track_id]
+                row.destroy()
+        elif change.kind in ("insert", "move"):
+            others = len(self._playlist_rows) - (row is not None)
+            # The new position is inside the rendered prefix when the track now
+            # following it is rendered, or when it is at the end and every
+            # other track is rendered
+            in_prefix = change.before_id in self._playlist_rows or (
+                change.before_id is None and others == len(self.model.playlist) - 1
+                and others < self._playlist_limit
+            )
+            if row is not None and in_prefix:
+                row.pack_forget()
+                self._pack_playlist_row(row, change.before_id)
+            elif row is not None:
+                del self._playlist_rows[change.track_id]
+                row.destroy()
+            elif in_prefix:
+                track = self.model.playlist.get(change.track_id)
+                self._create_playlist_item_display(change.track_id, track, change.before_id)
+        self._update_playlist_footer()
+
+    def _refresh_playlist_row(self, track_id):
+        # Redraw one playlist row after its track changed
+        row = self._playlist_rows.get(track_id)
+        if row is None:
+            return
+        self._create_playlist_item_display(track_id, self.model.playlist.get(track_id), before_row=row)
+        row.destroy()
+
+    def _pack_playlist_row(self, row, before_id=None, before_row=None):
+        # Pack a row in front of another row, or at the end
+        if before_row is None:
+            before_row = self._playlist_rows.get(before_id)
+        if before_row is not None:
+            row.pack(fill="x", padx=10, pady=5, ipady=5, before=before_row)
+        else:
+            row.pack(fill="x", padx=10, pady=5, ipady=5)
 
-    def _create_playlist_item_display(self, track_id, track):
+    def _create_playlist_item_display(self, track_id, track, before_id=None, before_row=None):
         # Create UI for a single playlist item
         item_frame = ttk.Frame(self.playlist_scrollable_frame)
-        item_frame.pack(fill="x", padx=10, pady=5, ipady=5)
+        self._pack_playlist_row(item_frame, before_id, before_row)
+        self._playlist_rows[track_id] = item_frame
+
+        if track is None:
+            # The track is no longer in the library
+            ttk.Label(item_frame, text=f"Unknown track {track_id}", font=("Arial", 12)).pack(side="left", padx=10)
+            ttk.Button(
+                item_frame,
+                text="Remove",
+                command=lambda id=track_id: self._remove_from_playlist(id)
+            ).pack(side="right", padx=5)
+            return
 
         self._display_track_image(item_frame, track)
 
-        track_name = track_library.get_name(track_id) or track.name
-        track_artist = track_library.get_artist(track_id) or track.artist
-
-        track_play_count = track_library.get_play_count(track_id)
-        track_rating = track_library.get_rating(track_id)
+        ttk.Label(item_frame, text=track.label(), font=("Arial", 12)).pack(side="left", padx=10)
+        ttk.Label(item_frame, text=track.details(), font=("Arial", 12)).pack(side="left", padx=10)
 
-        info = f"{track_name} - {track_artist}"
-        ttk.Label(item_frame, text=info, font=("Arial", 12)).pack(side="left", padx=10)
-        play_info = f"Play count: {track_play_count} | Rating: {track_rating}"
-        ttk.Label(item_frame, text=play_info, font=("Arial", 12)).pack(side="left", padx=10)
-
-        # Remove button
+        # Remove and reorder buttons
         ttk.Button(
             item_frame,
             text="Remove",
             command=lambda id=track_id: self._remove_from_playlist(id)
         ).pack(side="right", padx=5)
 
+        ttk.Button(
+            item_frame,
+            text="Down",
+            width=6,
+            command=lambda id=track_id: self.model.move_in_playlist(id, 1)
+        ).pack(side="right", padx=2)
+
+        ttk.Button(
+            item_frame,
+            text="Up",
+            width=6,
+            command=lambda id=track_id: self.model.move_in_playlist(id, -1)
+        ).pack(side="right", padx=2)
+
     def _remove_from_playlist(self, track_id):
-        # Remove track from playlist using list comprehension
-        self.playlist_items = [item for item in self.playlist_items if item[0] != track_id]
-        self._update_playlist_display()
+        # Remove track from playlist, the change listener updates the tab
+        self.model.remove_from_playlist(track_id)
 
     def _edit_track(self, track_id):
         # Open dialog to edit track details
-        track = track_library.library.get(track_id)
+        track = self.model.get_track(track_id)
         if not track:
             return
 
@@ -434,16 +1196,10 @@ class JukeBoxApp:
     def _save_track_changes(self, track_id, track, name_var, artist_var, rating_var, window):
         # Save edited track data
         try:
-            track.name = name_var.get()
-            track.artist = artist_var.get()
-            track.rating = min(max(0, int(rating_var.get())), 5)
-
-            # Update the track in library
-            if track_id in track_library.library:
-                track_library.library[track_id] = track
+            self.model.update_track(track_id, name_var.get(), artist_var.get(), rating_var.get())
 
             self._display_all_tracks()
-            self._update_playlist_display()
+            self._refresh_playlist_row(track_id)
 
             window.destroy()
             messagebox.showinfo("Success", "Track updated successfully")
@@ -452,6 +1208,7 @@ class JukeBoxApp:
 
     def _clear_search(self):
         # Clear search field and results
+        self._cancel_search_stream()
         self.search_var.set("")
         self._clear_frame(self.search_results_frame)
         self._display_default_track()
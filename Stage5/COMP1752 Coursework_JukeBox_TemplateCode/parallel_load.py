@@ -0,0 +1,136 @@
+import concurrent.futures
+import csv
+import io
+import os
+
+from library_item import LibraryItem
+
+# Parallel loading of one large tracks_data.csv-format file.
+#
+# The file is cut into byte ranges that each start on a record boundary,
+# worker processes parse one range each into plain columns (lists of
+# strings and ints pickle far faster than objects), and the parent turns
+# the columns into (track_id, LibraryItem) pairs in file order, so the
+# result is the same as reading the file serially.
+
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024  # Smaller files load faster in one process
+RANGES_PER_JOB = 4  # Ranges per worker, so a slow range does not hold up the rest
+SCAN_BLOCK = 1024 * 1024
+
+
+def record_starts(file, targets):
+    # For each ascending byte offset in targets, the offset just after the
+    # first newline at or after it that ends a record. A newline inside a
+    # quoted field follows an odd number of quote characters counted from
+    # the start of the file (an escaped "" adds two), so counting quotes in
+    # one sequential pass finds the real record ends. Offsets past the last
+    # record give the file size.
+    starts = []
+    pending = iter(targets)
+    target = next(pending, None)
+    quotes = 0  # Quote characters before offset + index
+    offset = 0  # File offset of the current block
+    file.seek(0)
+    while target is not None:
+        block = file.read(SCAN_BLOCK)
+        if not block:
+            starts.append(offset)
+            starts.extend(offset for _ in pending)
+            break
+        index = 0
+        while target is not None and index < len(block):
+            if offset + index < target:
+                stop = min(len(block), target - offset)
+                quotes += block.count(b'"', index, stop)
+                index = stop
+                continue
+            newline = block.find(b"\n", index)
+            if newline < 0:
+                quotes += block.count(b'"', index)
+                index = len(block)
+                continue
+            quotes += block.count(b'"', index, newline)
+            index = newline + 1
+            if quotes % 2 == 0:
+                starts.append(offset + index)
+                target = next(pending, None)
+        offset += len(block)
+    return starts
+
+
+def split_ranges(path, parts):
+    # (header end, [(start, end), ...]): the header record and up to `parts`
+    # byte ranges of whole records covering the rest of the file
+    size = os.path.getsize(path)
+    with open(path, "rb") as file:
+        targets = [0] + [size * part // parts for part in range(1, parts)]
+        starts = record_starts(file, targets)
+    header_end = starts[0]
+    cuts = [header_end] + [max(start, header_end) for start in starts[1:]] + [size]
+    return header_end, [(start, end) for start, end in zip(cuts, cuts[1:]) if end > start]
+
+
+def read_header(path, header_end, encoding=None):
+    with open(path, "rb") as file:
+        data = file.read(header_end)
+    return next(csv.reader(io.TextIOWrapper(io.BytesIO(data), encoding=encoding, newline="")), [])
+
+
+def parse_range(path, start, end, header, encoding=None):
+    # Columns (ids, names, artists, ratings, play counts, image paths) of the
+    # records in one byte range, read the way read_tracks_csv reads them
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    reader = csv.reader(io.TextIOWrapper(io.BytesIO(data), encoding=encoding, newline=""))
+
+    position = {column: index for index, column in enumerate(header)}
+    id_index = position["ID"]
+    columns = [position.get(column) for column in ("Title", "Artist", "Rating", "Play Count", "Image Path")]
+    defaults = [None, None, 0, 0, None]  # Used when the header has no such column
+    ids, names, artists, ratings, play_counts, image_paths = result = ([], [], [], [], [], [])
+    for row in reader:
+        if len(row) <= id_index:
+            continue  # Blank line or a row with no ID
+        name, artist, rating, play_count, image_path = (
+            default if index is None else (row[index] if index < len(row) else None)
+            for index, default in zip(columns, defaults)
+        )
+        try:
+            rating, play_count = min(max(0, int(rating)), 5), max(0, int(play_count))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"line {line_number(path, start, reader.line_num)}: {e}") from e
+        ids.append(row[id_index])
+        names.append(name)
+        artists.append(artist)
+        ratings.append(rating)
+        play_counts.append(play_count)
+        image_paths.append(image_path)
+    return result
+
+
+def line_number(path, start, line_in_range):
+    # File line number of a line counted from the byte offset start, for error messages only
+    with open(path, "rb") as file:
+        return file.read(start).count(b"\n") + line_in_range
+
+
+def _parse_range_args(args):
+    return parse_range(*args)
+
+
+def iter_tracks_parallel(path, jobs, encoding=None):
+    # Yield (track_id, LibraryItem) pairs of a catalog file in file order,
+    # parsing it in `jobs` worker processes
+    header_end, ranges = split_ranges(path, jobs * RANGES_PER_JOB)
+    header = read_header(path, header_end, encoding)
+    if "ID" not in header:
+        return
+    work = [(path, start, end, header, encoding) for start, end in ranges]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        # map() hands the results back in range order, whichever worker finishes first
+        for ids, names, artists, ratings, play_counts, image_paths in pool.map(_parse_range_args, work):
+            for track_id, name, artist, rating, play_count, image_path in zip(
+                ids, names, artists, ratings, play_counts, image_paths
+            ):
+                yield track_id, LibraryItem(name, artist, rating, play_count, image_path)
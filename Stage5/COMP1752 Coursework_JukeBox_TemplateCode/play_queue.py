@@ -0,0 +1,217 @@
+import collections
+import queue
+import random
+import threading
+import time
+
+from shuffle import ShuffleEngine
+
+# Event sent to subscribers as playback moves along.
+#   kind       "playing", "finished" or "stopped"
+#   track_id   the track now playing (None otherwise)
+#   position   index of the track in the play order
+#   total      number of tracks in the play order
+#   play_count the track's play count after this play was recorded
+PlaybackEvent = collections.namedtuple("PlaybackEvent", ["kind", "track_id", "position", "total", "play_count"])
+
+REPEAT_MODES = ["off", "one", "all"]
+DEFAULT_TRACK_SECONDS = 5.0
+SHUFFLE_NO_REPEAT = 50  # Tracks before a shuffled track may come back
+SHUFFLE_ARTIST_GAP = 3  # Tracks before a shuffled artist may come back
+
+
+class PlaybackScheduler:
+    # Plays a queue of track IDs over time.
+    #
+    # A background thread keeps the timeline: it sleeps until the current
+    # track ends, then moves to the next one. It never changes the library;
+    # at most it looks up artists through artist_of to spread them in shuffle.
+    # The owner (the Tk event loop, or a headless loop) calls poll(), which
+    # records each play as the queue advances and passes a PlaybackEvent to
+    # subscribers, so library changes and UI updates stay on one thread.
+
+    def __init__(self, record_play, track_seconds=DEFAULT_TRACK_SECONDS, seed=None, artist_of=None):
+        self._record_play = record_play  # record_play(track_id) -> new play count or None
+        self._artist_of = artist_of  # artist_of(track_id) -> artist, for shuffle
+        self.track_seconds = track_seconds
+        self._random = random.Random(seed)
+        self._condition = threading.Condition()
+        self._outbox = queue.Queue()
+        self._listeners = []
+
+        self._order = []
+        self._position = -1
+        self._current = None
+        self._engine = None  # ShuffleEngine while shuffle is on
+        self._deadline = None
+        self._repeat = "off"
+        self._shuffle = False
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="playback-scheduler", daemon=True)
+        self._thread.start()
+
+    # Commands, safe to call from any thread
+
+    def play(self, track_ids, start_index=0):
+        # Replace the queue and start playing from start_index
+        with self._condition:
+            self._order = list(track_ids)
+            self._position = start_index - 1
+            self._current = None
+            self._engine = self._new_engine(start_index) if self._shuffle else None
+            self._advance()
+
+    def skip(self):
+        with self._condition:
+            if self._deadline is not None:
+                self._advance(skipping=True)
+
+    def stop(self):
+        with self._condition:
+            if self._deadline is not None:
+                self._deadline = None
+                self._outbox.put(("stopped", None, self._position))
+                self._condition.notify()
+
+    def set_repeat(self, mode):
+        if mode not in REPEAT_MODES:
+            raise ValueError(f"repeat mode must be one of {', '.join(REPEAT_MODES)}")
+        with self._condition:
+            self._repeat = mode
+
+    def set_shuffle(self, enabled):
+        # Shuffle the tracks after the current one, or carry on in order from it
+        with self._condition:
+            if enabled == self._shuffle:
+                return
+            self._shuffle = enabled
+            if enabled:
+                self._engine = self._new_engine(self._position + 1)
+            else:
+                self._engine = None
+                if self._current is not None:
+                    self._position = self._order.index(self._current)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._deadline = None
+            self._condition.notify()
+        self._thread.join(timeout=1)
+
+    @property
+    def repeat(self):
+        return self._repeat
+
+    @property
+    def shuffle(self):
+        return self._shuffle
+
+    @property
+    def is_playing(self):
+        return self._deadline is not None
+
+    def now_playing(self):
+        with self._condition:
+            if self._deadline is None:
+                return None
+            return self._current
+
+    def upcoming(self, count=10):
+        # The next few track IDs in play order
+        with self._condition:
+            if self._engine is not None:
+                return self._engine.peek(count)
+            start = self._position + 1
+            return self._order[start:start + count]
+
+    # Owner thread
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def poll(self):
+        # Record plays and notify subscribers for everything since the last poll
+        events = []
+        while True:
+            try:
+                kind, track_id, position = self._outbox.get_nowait()
+            except queue.Empty:
+                break
+            play_count = self._record_play(track_id) if kind == "playing" else None
+            event = PlaybackEvent(kind, track_id, position, len(self._order), play_count)
+            events.append(event)
+            for callback in list(self._listeners):
+                callback(event)
+        return events
+
+    def run_until_finished(self, timeout=None):
+        # Headless use: poll until the queue finishes or stops
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while deadline is None or time.monotonic() < deadline:
+            for event in self.poll():
+                if event.kind in ("finished", "stopped"):
+                    return True
+            time.sleep(min(0.05, self.track_seconds / 4 or 0.001))
+        return False
+
+    # Internals, called with the condition held
+
+    def _advance(self, skipping=False):
+        # Move to the next track, honouring repeat and shuffle
+        if self._repeat == "one" and not skipping and self._current is not None:
+            track_id = self._current
+        else:
+            track_id = self._next_track()
+
+        if track_id is None:
+            self._current = None
+            self._deadline = None
+            self._outbox.put(("finished", None, self._position))
+            self._condition.notify()
+            return
+
+        self._current = track_id
+        self._deadline = time.monotonic() + self.track_seconds
+        self._outbox.put(("playing", track_id, self._position))
+        self._condition.notify()
+
+    def _next_track(self):
+        if self._engine is not None:
+            self._engine.repeat = self._repeat != "off"
+            track_id = self._engine.next()
+            if track_id is not None:
+                self._position = (self._position + 1) % len(self._order)
+            return track_id
+
+        if self._position + 1 < len(self._order):
+            self._position += 1
+        elif self._repeat != "off" and self._order:
+            self._position = 0
+        else:
+            return None
+        return self._order[self._position]
+
+    def _new_engine(self, start):
+        return ShuffleEngine(
+            self._order,
+            artist_of=self._artist_of,
+            seed=self._random.getrandbits(64),
+            no_repeat=SHUFFLE_NO_REPEAT,
+            artist_gap=SHUFFLE_ARTIST_GAP,
+            repeat=self._repeat != "off",
+            start=start,
+        )
+
+    def _run(self):
+        with self._condition:
+            while not self._closed:
+                if self._deadline is None:
+                    self._condition.wait()
+                    continue
+                remaining = self._deadline - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                self._advance()
@@ -0,0 +1,282 @@
+import collections
+import heapq
+import os
+import tempfile
+import threading
+import time
+
+import track_library
+
+# Chart windows: name -> (bucket length in seconds, number of buckets)
+WINDOWS = {
+    "hour": (60, 60),
+    "day": (3600, 24),
+    "week": (86400, 7),
+}
+BUCKET_CAPACITY = 1000  # Tracks counted per bucket before the least played are merged
+LOG_BUFFER = 64 * 1024
+COMPACT_MIN_LINES = 10_000  # Stale log lines that make loading rewrite the log without them
+
+
+class SpaceSaving:
+    # Space-Saving heavy-hitters summary holding at most `capacity` counters.
+    # A new item arriving when full takes over the smallest counter and
+    # inherits its count, which is recorded as that item's possible error.
+    # Any item played more than total / capacity times is always present.
+    # The smallest counter is found through a lazy heap: increments leave
+    # stale heap entries that are corrected when they reach the top.
+
+    def __init__(self, capacity=BUCKET_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self._heap = []  # (count when pushed, item), one entry per item
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, item, amount=1):
+        # Count an item, returning (evicted item, its count) if one was displaced
+        counts = self.counts
+        if item in counts:
+            counts[item] += amount
+            return None
+        if len(counts) < self.capacity:
+            counts[item] = amount
+            self.errors[item] = 0
+            heapq.heappush(self._heap, (amount, item))
+            return None
+
+        heap = self._heap
+        while True:
+            count, smallest = heap[0]
+            if counts[smallest] == count:
+                break
+            heapq.heapreplace(heap, (counts[smallest], smallest))
+        heapq.heapreplace(heap, (count + amount, item))
+        del counts[smallest]
+        del self.errors[smallest]
+        counts[item] = count + amount
+        self.errors[item] = count
+        return smallest, count
+
+    def top(self, count):
+        # (item, estimated count) pairs, most played first
+        return heapq.nlargest(count, self.counts.items(), key=lambda pair: pair[1])
+
+
+class WindowedTopN:
+    # Play counts over a sliding window made of fixed time buckets.
+    #
+    # Each bucket is a SpaceSaving summary, so memory is bounded by
+    # buckets * capacity however many plays arrive. The window total of
+    # every counted track is kept alongside: plays add to it and a bucket
+    # leaving the window subtracts its counts, so a chart is a top-N pick
+    # over the totals with no merging of buckets.
+
+    def __init__(self, bucket_seconds, buckets, capacity=BUCKET_CAPACITY):
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets
+        self.capacity = capacity
+        self._buckets = collections.deque()  # (bucket number, SpaceSaving), oldest first
+        self._totals = {}
+
+    def add(self, item, timestamp, amount=1):
+        number = int(timestamp // self.bucket_seconds)
+        self._expire(number)
+        if self._buckets and number <= self._buckets[-1][0] - self.buckets:
+            return  # Older than the window
+        summary = self._bucket(number)
+        before = summary.counts.get(item, 0)
+        evicted = summary.add(item, amount)
+        if evicted is not None:
+            self._subtract(*evicted)
+        self._totals[item] = self._totals.get(item, 0) + summary.counts[item] - before
+
+    def top(self, count, now=None):
+        # (item, plays in the window) pairs, most played first
+        if now is not None:
+            self._expire(int(now // self.bucket_seconds))
+        return heapq.nlargest(count, self._totals.items(), key=lambda pair: pair[1])
+
+    def _bucket(self, number):
+        buckets = self._buckets
+        if not buckets or number > buckets[-1][0]:
+            buckets.append((number, SpaceSaving(self.capacity)))
+            return buckets[-1][1]
+        for bucket_number, summary in reversed(buckets):
+            if bucket_number == number:
+                return summary
+            if bucket_number < number:
+                break
+        # A late play for a bucket that had no plays: keep the deque in order
+        summary = SpaceSaving(self.capacity)
+        position = next(index for index, (bucket_number, _) in enumerate(buckets) if bucket_number > number)
+        buckets.insert(position, (number, summary))
+        return summary
+
+    def _expire(self, number):
+        buckets = self._buckets
+        while buckets and buckets[0][0] <= number - self.buckets:
+            _, summary = buckets.popleft()
+            for item, count in summary.counts.items():
+                self._subtract(item, count)
+
+    def _subtract(self, item, count):
+        remaining = self._totals[item] - count
+        if remaining > 0:
+            self._totals[item] = remaining
+        else:
+            del self._totals[item]
+
+
+class PlayCharts:
+    # Timestamped play log and "most played" charts per window.
+    #
+    # Every play recorded through track_library.increment_play_count is
+    # appended to the log file, one "track ID<TAB>unix time<TAB>plays" line
+    # each, and counted in every window. Loading reads back the plays that
+    # still fall inside the longest window, so charts survive a restart, and
+    # once COMPACT_MIN_LINES older lines have built up rewrites the log
+    # without them, so it stays about one window long.
+    #
+    # With background=True the log is read in a worker thread. The charts
+    # count plays from the start; plays recorded during the load are kept
+    # aside and written after the lines already in the log.
+
+    def __init__(self, log_path=None, windows=None, capacity=BUCKET_CAPACITY, clock=time.time, background=False):
+        self.log_path = log_path
+        self.clock = clock
+        self.load_error = None  # OSError from reading or opening the log in the background
+        self._window_sizes = windows or WINDOWS
+        self._capacity = capacity
+        self.windows = self._new_windows()
+        self._lock = threading.Lock()  # Guards windows, _log and _early against the loading thread
+        self._log = None
+        self._early = None  # (track_id, timestamp, amount) of plays recorded while the log loads
+        self._thread = None
+        if log_path is not None:
+            self._early = []
+            if background:
+                self._thread = threading.Thread(target=self._open_log_in_background, name="play-log", daemon=True)
+                self._thread.start()
+            else:
+                self._open_log()
+        track_library.subscribe(self._on_change)
+        self._subscribed = True
+
+    def record(self, track_id, amount=1, timestamp=None):
+        timestamp = self.clock() if timestamp is None else timestamp
+        with self._lock:
+            if self._early is not None:
+                self._early.append((track_id, timestamp, amount))
+            elif self._log is not None:
+                self._log.write(f"{track_id}\t{timestamp:.3f}\t{amount}\n")
+            for window in self.windows.values():
+                window.add(track_id, timestamp, amount)
+
+    def top(self, window, count=10):
+        # (track_id, plays) pairs for a window name, most played first
+        with self._lock:
+            return self.windows[window].top(count, self.clock())
+
+    def loaded(self):
+        # Whether the log has been read back
+        return self._thread is None or not self._thread.is_alive()
+
+    def flush(self):
+        # Write buffered plays to the log, waiting for a background load first
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            if self._log is not None:
+                self._log.flush()
+
+    def close(self):
+        if self._subscribed:
+            track_library.unsubscribe(self._on_change)
+            self._subscribed = False
+        if self._thread is not None:
+            self._thread.join()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def _on_change(self, change):
+        # Counts set by edits or catalog reloads are not plays
+        if change.played and change.new > change.old:
+            self.record(change.key, change.new - change.old)
+
+    def _new_windows(self):
+        return {
+            name: WindowedTopN(bucket_seconds, buckets, self._capacity)
+            for name, (bucket_seconds, buckets) in self._window_sizes.items()
+        }
+
+    def _open_log(self):
+        # Read the log into new windows, then swap them in with the plays recorded meanwhile
+        windows = self._new_windows()
+        self._load_log(windows)
+        log = open(self.log_path, "a", buffering=LOG_BUFFER)
+        with self._lock:
+            self._log = log
+            for track_id, timestamp, amount in self._early:
+                log.write(f"{track_id}\t{timestamp:.3f}\t{amount}\n")
+                for window in windows.values():
+                    window.add(track_id, timestamp, amount)
+            self._early = None
+            self.windows = windows
+
+    def _open_log_in_background(self):
+        try:
+            self._open_log()
+        except OSError as e:
+            # Keep charting this session's plays, without a log
+            with self._lock:
+                self._early = None
+            self.load_error = e
+
+    def _load_log(self, windows):
+        # The log is in time order, so the stale lines come first. If enough
+        # of them have built up by the first line still inside the window,
+        # that line and the rest are streamed into a new log as they are
+        # counted, and the new log replaces the old one.
+        if not os.path.exists(self.log_path):
+            return
+        oldest = self.clock() - max(window.bucket_seconds * window.buckets for window in windows.values())
+        dropped = 0
+        compacted = None  # (file, temp path) of the new log
+        try:
+            with open(self.log_path, "r", buffering=LOG_BUFFER) as file:
+                for line in file:
+                    parts = line.rstrip("\n").split("\t")
+                    try:
+                        timestamp, amount = float(parts[1]), int(parts[2])
+                    except (IndexError, ValueError):
+                        dropped += 1
+                        continue
+                    if timestamp < oldest:
+                        dropped += 1
+                        continue
+                    if compacted is None and dropped >= COMPACT_MIN_LINES:
+                        compacted = self._start_compacted_log()
+                    if compacted is not None:
+                        compacted[0].write(line if line.endswith("\n") else line + "\n")
+                    for window in windows.values():
+                        window.add(parts[0], timestamp, amount)
+            if compacted is None and dropped >= COMPACT_MIN_LINES:
+                compacted = self._start_compacted_log()  # Every line was stale
+            if compacted is not None:
+                compacted[0].close()
+                os.replace(compacted[1], self.log_path)
+        except BaseException:
+            if compacted is not None:
+                compacted[0].close()
+                os.unlink(compacted[1])
+            raise
+
+    def _start_compacted_log(self):
+        # A temporary file next to the log, renamed over it once written
+        directory = os.path.dirname(os.path.abspath(self.log_path))
+        handle, temp_path = tempfile.mkstemp(prefix=".plays-", dir=directory)
+        return os.fdopen(handle, "w", buffering=LOG_BUFFER), temp_path
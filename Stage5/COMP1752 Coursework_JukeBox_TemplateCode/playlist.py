@@ -0,0 +1,201 @@
+import collections
+
+# A change to a playlist, passed to subscribers so views can update in place.
+#   kind       "insert", "remove", "move", "clear" or "reset" (whole contents replaced)
+#   track_id   the track affected (None for "clear" and "reset")
+#   before_id  for "insert" and "move", the track now following it, or None at the end
+PlaylistChange = collections.namedtuple("PlaylistChange", ["kind", "track_id", "before_id"])
+
+
+class Playlist:
+    # Ordered set of tracks keyed by track ID.
+    # A doubly linked list threaded through dicts gives O(1) add, remove,
+    # contains and move next to another track; positional operations walk
+    # from the nearer end of the list.
+    # Entries may be added by ID alone; their track objects are then looked
+    # up through `resolve` only when they are read.
+
+    def __init__(self, items=(), resolve=None):
+        self._resolve = resolve
+        self._tracks = {}
+        self._prev = {}
+        self._next = {}
+        self._head = None
+        self._tail = None
+        self._listeners = []
+        for track_id, track in items:
+            self.add(track_id, track)
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def __contains__(self, track_id):
+        return track_id in self._tracks
+
+    def __iter__(self):
+        # (track_id, track) pairs in playlist order
+        for track_id in self.iter_ids():
+            yield track_id, self.get(track_id)
+
+    def iter_ids(self, start_id=None):
+        # Track IDs in playlist order, from start_id (default: the first)
+        track_id = self._head if start_id is None else start_id
+        while track_id is not None:
+            yield track_id
+            track_id = self._next[track_id]
+
+    def __bool__(self):
+        return bool(self._tracks)
+
+    def ids(self):
+        return list(self.iter_ids())
+
+    def get(self, track_id):
+        # The track for an entry, resolved on demand for ID-only entries
+        track = self._tracks.get(track_id)
+        if track is None and self._resolve is not None and track_id in self._tracks:
+            track = self._resolve(track_id)
+        return track
+
+    def first(self):
+        return self._head
+
+    def next_id(self, track_id):
+        return self._next.get(track_id)
+
+    def previous_id(self, track_id):
+        return self._prev.get(track_id)
+
+    def subscribe(self, callback):
+        # Call callback(change) after every modification
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        self._listeners.remove(callback)
+
+    def _notify(self, kind, track_id=None, before_id=None):
+        if self._listeners:
+            change = PlaylistChange(kind, track_id, before_id)
+            for callback in list(self._listeners):
+                callback(change)
+
+    def add(self, track_id, track=None, before_id=None):
+        # Insert before before_id (or at the end); returns False for duplicates
+        if track_id in self._tracks:
+            return False
+        if before_id is not None and before_id not in self._tracks:
+            raise KeyError(before_id)
+
+        self._tracks[track_id] = track
+        self._link(track_id, before_id)
+        self._notify("insert", track_id, before_id)
+        return True
+
+    def insert_at(self, index, track_id, track=None):
+        # Insert at a position, counting from 0; past the end appends
+        return self.add(track_id, track, self._id_at(index))
+
+    def remove(self, track_id):
+        # Remove a track, returning False if it was not in the playlist
+        if track_id not in self._tracks:
+            return False
+        self._unlink(track_id)
+        del self._tracks[track_id]
+        self._notify("remove", track_id)
+        return True
+
+    def move(self, track_id, before_id=None):
+        # Move a track in front of before_id, or to the end
+        if track_id not in self._tracks:
+            raise KeyError(track_id)
+        if before_id is not None and before_id not in self._tracks:
+            raise KeyError(before_id)
+        if track_id == before_id or self._next[track_id] == before_id:
+            return
+
+        self._unlink(track_id)
+        self._link(track_id, before_id)
+        self._notify("move", track_id, before_id)
+
+    def move_to(self, track_id, index):
+        # Move a track to a position, counting from 0 as the list is after the move
+        if track_id not in self._tracks:
+            raise KeyError(track_id)
+        if index >= len(self._tracks) - 1:
+            self.move(track_id, None)
+            return
+        current = self.index(track_id)
+        self.move(track_id, self._id_at(index + 1 if index >= current else index))
+
+    def index(self, track_id):
+        # Position of a track, walking the list
+        for position, current in enumerate(self.iter_ids()):
+            if current == track_id:
+                return position
+        raise ValueError(f"{track_id} is not in the playlist")
+
+    def clear(self):
+        self._tracks.clear()
+        self._prev.clear()
+        self._next.clear()
+        self._head = self._tail = None
+        self._notify("clear")
+
+    def replace_ids(self, track_ids):
+        # Replace the contents with ID-only entries, skipping duplicates
+        self._tracks.clear()
+        self._prev.clear()
+        self._next.clear()
+        self._head = self._tail = None
+        for track_id in track_ids:
+            if track_id not in self._tracks:
+                self._tracks[track_id] = None
+                self._link(track_id, None)
+        self._notify("reset")
+
+    def _id_at(self, index):
+        # Track ID at a position, or None past the end
+        size = len(self._tracks)
+        if index < 0:
+            index += size
+        if index >= size:
+            return None
+        if index <= 0:
+            return self._head
+
+        if index < size // 2:
+            track_id = self._head
+            for _ in range(index):
+                track_id = self._next[track_id]
+        else:
+            track_id = self._tail
+            for _ in range(size - 1 - index):
+                track_id = self._prev[track_id]
+        return track_id
+
+    def _link(self, track_id, before_id):
+        if before_id is None:
+            previous = self._tail
+            self._tail = track_id
+        else:
+            previous = self._prev[before_id]
+            self._prev[before_id] = track_id
+
+        self._prev[track_id] = previous
+        self._next[track_id] = before_id
+        if previous is None:
+            self._head = track_id
+        else:
+            self._next[previous] = track_id
+
+    def _unlink(self, track_id):
+        previous = self._prev.pop(track_id)
+        following = self._next.pop(track_id)
+        if previous is None:
+            self._head = following
+        else:
+            self._next[previous] = following
+        if following is None:
+            self._tail = previous
+        else:
+            self._prev[following] = previous
@@ -0,0 +1,171 @@
+import json
+import os
+import struct
+import tempfile
+
+# Named playlists stored as arrays of track IDs in a single file.
+#
+#   preamble  b"JBPL", u16 version, u32 playlist count, u32 index size
+#   index     per playlist: u16 name length, name (UTF-8), u64 offset, u32 track count, u32 byte length
+#   data      per playlist: track IDs (UTF-8) separated by b"\n"
+#
+# The index sits at the front, so loading one playlist reads the index and
+# then a single slice of the data; the other playlists are never parsed.
+# All integers are little-endian.
+
+MAGIC = b"JBPL"
+VERSION = 1
+_PREAMBLE = struct.Struct("<4sHII")
+_ENTRY = struct.Struct("<QII")
+_NAME_LENGTH = struct.Struct("<H")
+
+
+class PlaylistStoreError(Exception):
+    pass
+
+
+class PlaylistStore:
+    def __init__(self, path):
+        self.path = path
+        self._index = None  # Name -> (offset, track count, byte length)
+        self._index_mtime = None
+
+    def names(self):
+        return list(self._read_index())
+
+    def __contains__(self, name):
+        return name in self._read_index()
+
+    def track_count(self, name):
+        return self._read_index()[name][1]
+
+    def load(self, name):
+        # Track IDs of one playlist, reading only that playlist's data
+        offset, count, length = self._read_index()[name]
+        if not count:
+            return []
+        with open(self.path, "rb") as file:
+            file.seek(offset)
+            data = file.read(length)
+        if len(data) < length:
+            raise PlaylistStoreError(f"{self.path} is truncated")
+        try:
+            return data.decode("utf-8").split("\n")
+        except UnicodeDecodeError as e:
+            raise PlaylistStoreError(f"{self.path} has a damaged playlist {name}: {e}") from e
+
+    def save(self, name, track_ids):
+        self.save_many({name: track_ids})
+
+    def save_many(self, playlists):
+        # Add or replace playlists; the others are copied across unparsed
+        self._rewrite(replace={name: list(track_ids) for name, track_ids in playlists.items()})
+
+    def delete(self, name):
+        if name in self._read_index():
+            self._rewrite(delete={name})
+
+    def rename(self, old_name, new_name):
+        if new_name in self._read_index():
+            raise PlaylistStoreError(f"A playlist called {new_name} already exists")
+        self._rewrite(rename={old_name: new_name})
+
+    def export_json(self, stream, names=None):
+        # Write {name: [track IDs]} for the chosen (default: all) playlists
+        names = self.names() if names is None else names
+        json.dump({name: self.load(name) for name in names}, stream, indent=1)
+
+    def import_json(self, stream):
+        # Add or replace every playlist in a {name: [track IDs]} document
+        playlists = json.load(stream)
+        if not isinstance(playlists, dict) or not all(isinstance(ids, list) for ids in playlists.values()):
+            raise PlaylistStoreError("Expected a JSON object mapping playlist names to lists of track IDs")
+        self.save_many({str(name): [str(track_id) for track_id in ids] for name, ids in playlists.items()})
+        return list(playlists)
+
+    def _read_index(self):
+        # Parse the index, cached until the file changes
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self._index, self._index_mtime = {}, None
+            return self._index
+        if self._index is not None and mtime == self._index_mtime:
+            return self._index
+
+        with open(self.path, "rb") as file:
+            preamble = file.read(_PREAMBLE.size)
+            if len(preamble) < _PREAMBLE.size:
+                raise PlaylistStoreError(f"{self.path} is not a playlist file")
+            magic, version, count, index_size = _PREAMBLE.unpack(preamble)
+            if magic != MAGIC or version != VERSION:
+                raise PlaylistStoreError(f"{self.path} is not a version {VERSION} playlist file")
+            raw_index = file.read(index_size)
+        if len(raw_index) < index_size:
+            raise PlaylistStoreError(f"{self.path} is truncated")
+
+        index = {}
+        position = 0
+        try:
+            for _ in range(count):
+                (name_length,) = _NAME_LENGTH.unpack_from(raw_index, position)
+                position += _NAME_LENGTH.size
+                name = raw_index[position:position + name_length].decode("utf-8")
+                position += name_length
+                index[name] = _ENTRY.unpack_from(raw_index, position)
+                position += _ENTRY.size
+        except (struct.error, UnicodeDecodeError) as e:
+            raise PlaylistStoreError(f"{self.path} has a damaged index: {e}") from e
+
+        self._index, self._index_mtime = index, mtime
+        return index
+
+    def _rewrite(self, replace=None, delete=(), rename=None):
+        # Write a new file next to the old one and swap it in atomically
+        replace = replace or {}
+        rename = rename or {}
+        old_index = self._read_index()
+
+        # Each entry is (name, encoded data or None to copy the old bytes, old name, count)
+        entries = []
+        for name, (offset, count, length) in old_index.items():
+            if name in delete or name in replace:
+                continue
+            entries.append((rename.get(name, name), None, name, count))
+        for name, track_ids in replace.items():
+            for track_id in track_ids:
+                if "\n" in track_id:
+                    raise PlaylistStoreError(f"Track ID {track_id!r} contains a newline")
+            entries.append((name, "\n".join(track_ids).encode("utf-8"), None, len(track_ids)))
+
+        index_size = sum(_NAME_LENGTH.size + len(name.encode("utf-8")) + _ENTRY.size for name, *_ in entries)
+        offset = _PREAMBLE.size + index_size
+        layout = []
+        for name, data, old_name, count in entries:
+            length = len(data) if data is not None else old_index[old_name][2]
+            layout.append((name, data, old_name, count, offset, length))
+            offset += length
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        handle, temp_path = tempfile.mkstemp(prefix=".playlists-", dir=directory)
+        try:
+            with os.fdopen(handle, "wb") as out, self._open_old() as old:
+                out.write(_PREAMBLE.pack(MAGIC, VERSION, len(layout), index_size))
+                for name, _, _, count, start, length in layout:
+                    encoded = name.encode("utf-8")
+                    out.write(_NAME_LENGTH.pack(len(encoded)) + encoded + _ENTRY.pack(start, count, length))
+                for name, data, old_name, _, _, length in layout:
+                    if data is None:
+                        old.seek(old_index[old_name][0])
+                        data = old.read(length)
+                    out.write(data)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self._index = None
+
+    def _open_old(self):
+        if os.path.exists(self.path):
+            return open(self.path, "rb")
+        return open(os.devnull, "rb")
@@ -0,0 +1,246 @@
+import array
+import collections
+import os
+import time
+
+import track_library
+
+NEIGHBOURS = 10  # Neighbour slots kept per track
+PLAYLIST_WINDOW = 3  # Playlist tracks this many places apart or closer co-occur
+SESSION_GAP = 30 * 60  # Seconds between two plays that still count as consecutive
+BATCH_SIZE = 1000  # Pending pairs merged into the matrix at once
+_LOW_BITS = 32
+_LOW_MASK = (1 << _LOW_BITS) - 1
+
+
+class Recommender:
+    # "You might also like" from a sparse track-to-track co-occurrence matrix.
+    #
+    # Tracks are numbered densely as they are first seen. The matrix keeps
+    # each unordered pair once, in a dict keyed by the two numbers packed
+    # into one int, with the number of times the pair co-occurred. Next to
+    # it sits the neighbour index: two flat arrays with `neighbours` slots
+    # per track, holding neighbour numbers and weights, each row sorted by
+    # weight. Weights only grow, so merging a pair just offers it to the
+    # rows of its two tracks (O(neighbours) each), and a query reads one
+    # row instead of scanning the matrix.
+    #
+    # Co-occurrences gather in a pending batch and are merged once
+    # BATCH_SIZE distinct pairs are waiting, or before a query.
+    # Memory is 12 bytes per neighbour slot plus one dict entry per
+    # distinct pair; nothing holds per-track Python objects.
+
+    def __init__(self, neighbours=NEIGHBOURS, batch_size=BATCH_SIZE):
+        self.neighbours = neighbours
+        self.batch_size = batch_size
+        self._ids = []
+        self._numbers = {}
+        self._weights = {}  # Packed pair -> co-occurrences
+        self._rows = array.array("i")  # Neighbour numbers, -1 for an empty slot
+        self._row_weights = array.array("q")
+        self._pending = collections.Counter()
+        self._last_play = None  # (track number, timestamp) of the previous play
+
+    def __len__(self):
+        # Distinct co-occurring pairs merged so far
+        return len(self._weights)
+
+    def add_sequence(self, track_ids, window=PLAYLIST_WINDOW):
+        # Count tracks within `window` places of each other, e.g. a playlist
+        pending = self._pending
+        recent = collections.deque(maxlen=window)
+        for track_id in track_ids:
+            number = self._number(track_id)
+            for other in recent:
+                if other != number:
+                    pending[_pack(number, other)] += 1
+            recent.append(number)
+        self._apply_if_full()
+
+    def add_play(self, track_id, timestamp):
+        # Count a play together with the previous one when they are in one session
+        number = self._number(track_id)
+        if self._last_play is not None:
+            previous, previous_time = self._last_play
+            if previous != number and 0 <= timestamp - previous_time <= SESSION_GAP:
+                self._pending[_pack(number, previous)] += 1
+                self._apply_if_full()
+        self._last_play = (number, timestamp)
+
+    def apply_batch(self):
+        # Merge the pending pairs into the matrix and the neighbour index
+        pending = self._pending
+        if not pending:
+            return 0
+        self._pending = collections.Counter()
+        weights = self._weights
+        offer = self._offer
+        for key, amount in pending.items():
+            weight = weights.get(key, 0) + amount
+            weights[key] = weight
+            low, high = key >> _LOW_BITS, key & _LOW_MASK
+            offer(low, high, weight)
+            offer(high, low, weight)
+        return len(pending)
+
+    def recommend(self, track_id, count=5):
+        # Up to `count` track IDs that most often go with track_id, best first
+        number = self._numbers.get(track_id)
+        if number is None:
+            return []
+        self.apply_batch()
+        start = number * self.neighbours
+        library = track_library.library
+        result = []
+        for slot in range(start, start + self.neighbours):
+            other = self._rows[slot]
+            if other < 0:
+                break
+            other_id = self._ids[other]
+            if other_id in library:
+                result.append(other_id)
+                if len(result) == count:
+                    break
+        return result
+
+    def weight(self, track_id, other_id):
+        # Merged co-occurrences of two tracks
+        number, other = self._numbers.get(track_id), self._numbers.get(other_id)
+        if number is None or other is None:
+            return 0
+        return self._weights.get(_pack(number, other), 0)
+
+    def _number(self, track_id):
+        number = self._numbers.get(track_id)
+        if number is None:
+            number = len(self._ids)
+            self._ids.append(track_id)
+            self._numbers[track_id] = number
+            self._rows.extend([-1] * self.neighbours)
+            self._row_weights.extend([0] * self.neighbours)
+        return number
+
+    def _apply_if_full(self):
+        if len(self._pending) >= self.batch_size:
+            self.apply_batch()
+
+    def _offer(self, number, other, weight):
+        # Put other into number's row if it is among its best neighbours
+        rows, row_weights = self._rows, self._row_weights
+        start = number * self.neighbours
+        last = start + self.neighbours - 1
+        row = rows[start:last + 1]
+        if other in row:
+            position = start + row.index(other)
+        else:
+            if row[-1] < 0:
+                position = start + row.index(-1)  # First empty slot
+            elif row_weights[last] < weight:
+                position = last
+            else:
+                return
+            rows[position] = other
+        row_weights[position] = weight
+        while position > start and row_weights[position - 1] < weight:
+            rows[position], rows[position - 1] = rows[position - 1], rows[position]
+            row_weights[position], row_weights[position - 1] = row_weights[position - 1], weight
+            position -= 1
+
+
+class LiveRecommender(Recommender):
+    # A Recommender built from stored playlists and the play log, then kept
+    # current from the plays recorded through track_library and, when given
+    # the open Playlist, from the tracks added to or moved within it.
+    #
+    # With background=True the constructor only subscribes: build() then
+    # runs in a worker thread while new plays and playlist neighbours are
+    # kept aside, and finish(), back on the thread making them, counts them.
+
+    def __init__(self, playlists=(), play_log=None, clock=time.time, playlist=None, background=False, **kwargs):
+        super().__init__(**kwargs)
+        self._clock = clock
+        self._early = []  # (count, args) noticed before finish()
+        track_library.subscribe(self._on_change)
+        self._subscribed = True
+        self._playlist = playlist
+        if playlist is not None:
+            playlist.subscribe(self._on_playlist_change)
+        if not background:
+            self.build(playlists, play_log)
+            self.finish()
+
+    def build(self, playlists, play_log=None):
+        # Count sequences of track IDs, e.g. the stored playlists, and a play log
+        for track_ids in playlists:
+            self.add_sequence(track_ids)
+        if play_log is not None and os.path.exists(play_log):
+            self._read_play_log(play_log)
+
+    def finish(self):
+        # Count what was noticed during build() and merge everything
+        early, self._early = self._early, None
+        for count, args in early:
+            count(*args)
+        self.apply_batch()
+
+    def close(self):
+        if self._subscribed:
+            track_library.unsubscribe(self._on_change)
+            self._subscribed = False
+        if self._playlist is not None:
+            self._playlist.unsubscribe(self._on_playlist_change)
+            self._playlist = None
+
+    def _count(self, count, *args):
+        if self._early is not None:
+            self._early.append((count, args))
+        else:
+            count(*args)
+
+    def _on_change(self, change):
+        if change.played and change.new > change.old:
+            self._count(self.add_play, change.key, self._clock())
+
+    def _on_playlist_change(self, change):
+        # A track inserted or moved co-occurs with the tracks now within
+        # PLAYLIST_WINDOW places of it. Removals take nothing back, as
+        # weights only grow, and a reset loads contents already counted.
+        if change.kind not in ("insert", "move"):
+            return
+        playlist = self._playlist
+        other_ids = []
+        for step in (playlist.previous_id, playlist.next_id):
+            other_id = step(change.track_id)
+            for _ in range(PLAYLIST_WINDOW):
+                if other_id is None:
+                    break
+                other_ids.append(other_id)
+                other_id = step(other_id)
+        self._count(self._add_neighbours, change.track_id, other_ids)
+
+    def _add_neighbours(self, track_id, other_ids):
+        number = self._number(track_id)
+        pending = self._pending
+        for other_id in other_ids:
+            pending[_pack(number, self._number(other_id))] += 1
+        self._apply_if_full()
+
+    def _read_play_log(self, path):
+        # "track ID<TAB>unix time<TAB>plays" lines, as written by play_stats
+        with open(path, "r", buffering=64 * 1024) as file:
+            for line in file:
+                parts = line.split("\t")
+                if len(parts) < 3:
+                    continue
+                try:
+                    timestamp = float(parts[1])
+                except ValueError:
+                    continue
+                self.add_play(parts[0], timestamp)
+
+
+def _pack(number, other):
+    # One key per unordered pair
+    if number > other:
+        number, other = other, number
+    return (number << _LOW_BITS) | other
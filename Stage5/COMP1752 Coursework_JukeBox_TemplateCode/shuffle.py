@@ -0,0 +1,151 @@
+import collections
+import random
+
+HOLD_LIMIT = 64  # Tracks deferred by a constraint before the constraint is relaxed
+_ROUNDS = 4
+_MASK_64 = (1 << 64) - 1
+
+
+class _Permutation:
+    # A keyed bijection on range(size) that needs no table: a Feistel network
+    # over the smallest even number of bits covering size, with cycle walking
+    # to map the few values that land outside the range back into it.
+
+    def __init__(self, size, rng):
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        bits += bits % 2
+        self._half = bits // 2
+        self._mask = (1 << self._half) - 1
+        self._keys = [rng.getrandbits(64) for _ in range(_ROUNDS)]
+
+    def __call__(self, index):
+        half, mask = self._half, self._mask
+        while True:
+            left, right = index >> half, index & mask
+            for key in self._keys:
+                mixed = ((right ^ key) * 0x9E3779B97F4A7C15) & _MASK_64
+                left, right = right, left ^ ((mixed ^ (mixed >> 29)) & mask)
+            index = (left << half) | right
+            if index < self.size:
+                return index
+
+
+class ShuffleEngine:
+    # Streams a shuffled order of a sequence of track IDs without copying it.
+    #
+    # Each pass walks a keyed permutation of the indexes, so the next track
+    # costs O(1) and memory does not grow with the sequence. Two constraints
+    # are applied over a sliding window of what has been produced:
+    #   no_repeat   a track does not come back within this many tracks
+    #   artist_gap  an artist does not come back within this many tracks
+    # A track that breaks a constraint is held back and produced once the
+    # window has moved on. If HOLD_LIMIT tracks are waiting (e.g. a playlist
+    # that is mostly one artist) the oldest is produced anyway, so memory
+    # stays bounded and the stream never stalls.
+    #
+    # The same seed always gives the same order.
+
+    def __init__(self, track_ids, artist_of=None, seed=None, no_repeat=0, artist_gap=0, repeat=False, start=0):
+        self._track_ids = track_ids
+        self._artist_of = artist_of
+        self._random = random.Random(seed)
+        # A window as long as the sequence could never be satisfied
+        self.no_repeat = min(no_repeat, max(0, len(track_ids) - 1))
+        self.artist_gap = artist_gap if artist_of is not None else 0
+        self.repeat = repeat
+
+        self._recent_ids = collections.deque()
+        self._recent_id_counts = collections.Counter()
+        self._recent_artists = collections.deque()
+        self._recent_artist_counts = collections.Counter()
+        self._held = collections.deque()  # (track ID, artist) waiting for a constraint to lapse
+        self._lookahead = collections.deque()  # Produced by peek() but not yet returned
+        self._start_pass(start)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        track_id = self.next()
+        if track_id is None:
+            raise StopIteration
+        return track_id
+
+    def next(self):
+        # The next track ID, or None once every track has been produced
+        if self._lookahead:
+            return self._lookahead.popleft()
+        return self._produce()
+
+    def peek(self, count):
+        # The next `count` track IDs without consuming them
+        while len(self._lookahead) < count:
+            track_id = self._produce()
+            if track_id is None:
+                break
+            self._lookahead.append(track_id)
+        return list(self._lookahead)[:count]
+
+    def _start_pass(self, start):
+        self._offset = start
+        self._permutation = _Permutation(max(0, len(self._track_ids) - start), self._random)
+        self._drawn = 0
+
+    def _draw(self):
+        # The next track ID of the current pass, starting a new pass when repeating
+        if self._drawn >= self._permutation.size:
+            if not self.repeat or not self._track_ids:
+                return None
+            self._start_pass(0)
+        index = self._offset + self._permutation(self._drawn)
+        self._drawn += 1
+        return self._track_ids[index]
+
+    def _allowed(self, track_id, artist):
+        if self._recent_id_counts[track_id]:
+            return False
+        return artist is None or not self._recent_artist_counts[artist]
+
+    def _produce(self):
+        # Held tracks whose constraint has lapsed go first, oldest first
+        for position, (track_id, artist) in enumerate(self._held):
+            if self._allowed(track_id, artist):
+                del self._held[position]
+                return self._emit(track_id, artist)
+
+        while len(self._held) < HOLD_LIMIT:
+            track_id = self._draw()
+            if track_id is None:
+                break
+            artist = self._artist_of(track_id) if self.artist_gap else None
+            if self._allowed(track_id, artist):
+                return self._emit(track_id, artist)
+            self._held.append((track_id, artist))
+
+        # Nothing left that satisfies the constraints: relax them for the oldest held track
+        if self._held:
+            return self._emit(*self._held.popleft())
+        return None
+
+    def _emit(self, track_id, artist):
+        if self.no_repeat:
+            self._recent_ids.append(track_id)
+            self._recent_id_counts[track_id] += 1
+            if len(self._recent_ids) > self.no_repeat:
+                _forget(self._recent_id_counts, self._recent_ids.popleft())
+        if self.artist_gap:
+            self._recent_artists.append(artist)
+            if artist is not None:
+                self._recent_artist_counts[artist] += 1
+            if len(self._recent_artists) > self.artist_gap:
+                expired = self._recent_artists.popleft()
+                if expired is not None:
+                    _forget(self._recent_artist_counts, expired)
+        return track_id
+
+
+def _forget(counts, key):
+    counts[key] -= 1
+    if not counts[key]:
+        del counts[key]
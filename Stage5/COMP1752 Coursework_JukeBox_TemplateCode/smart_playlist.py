@@ -0,0 +1,282 @@
+import bisect
+import collections
+import heapq
+import json
+import operator
+import os
+import tempfile
+
+import track_library
+from library_item import FIELDS, normalize
+
+# A condition on a LibraryItem field, e.g. Rule("rating", ">=", 4).
+# Text fields compare case-insensitively and ignore surrounding spaces.
+Rule = collections.namedtuple("Rule", ["field", "op", "value"])
+
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">=": operator.ge,
+    "<=": operator.le,
+    ">": operator.gt,
+    "<": operator.lt,
+    "contains": lambda value, wanted: wanted in value,
+}
+
+# Saved definitions: {"version": 1, "playlists": [SmartPlaylist.to_dict(), ...]}
+FILE_VERSION = 1
+
+
+class SmartPlaylist:
+    # Tracks matching every rule, optionally ordered by a field and cut to a limit.
+    #
+    # Without a limit the members are kept in a dict used as an ordered set.
+    # With a limit ("top 50 most played") only the best `limit` entries are
+    # kept, in a sorted list of (sort value, track ID); a track that beats the
+    # worst entry displaces it. Only when a member drops out, or falls below
+    # the worst entry of a full list, is the library scanned to refill it,
+    # since the next best track could then be anywhere.
+
+    def __init__(self, name, rules=(), order_by=None, descending=True, limit=None):
+        rules = [Rule(*rule) for rule in rules]
+        for rule in rules:
+            if rule.field not in FIELDS:
+                raise ValueError(f"Unknown field {rule.field!r}")
+            if rule.op not in OPERATORS:
+                raise ValueError(f"Unknown operator {rule.op!r}")
+            if rule.op == "contains" and FIELDS[rule.field] is not str:
+                raise ValueError(f"{rule.field} is not a text field")
+        if order_by is not None and order_by not in FIELDS:
+            raise ValueError(f"Unknown field {order_by!r}")
+        if limit is not None and order_by is None:
+            raise ValueError("A limit needs an order_by field")
+        if limit is not None and (not isinstance(limit, int) or limit < 1):
+            raise ValueError("A limit must be a positive integer")
+
+        self.name = name
+        self.rules = [Rule(rule.field, rule.op, normalize(rule.field, rule.value)) for rule in rules]
+        self.order_by = order_by
+        self.descending = descending
+        self.limit = limit
+
+        # Fields whose changes can affect the playlist
+        self.fields = {rule.field for rule in self.rules}
+        if order_by is not None:
+            self.fields.add(order_by)
+        # Normalized artist when a rule pins the playlist to one artist
+        self.artist = next((rule.value for rule in self.rules if rule.field == "artist" and rule.op == "=="), None)
+
+        self._members = {}  # Track ID -> None, unlimited playlists
+        self._ranked = []  # Sorted (sort value, track ID), limited playlists
+        self._ranked_values = {}  # Track ID -> sort value, limited playlists
+        self._worst = 0 if descending else -1  # Index of the worst ranked entry
+
+    @classmethod
+    def from_dict(cls, data):
+        # A playlist from its to_dict() form, raising ValueError for a bad definition
+        if not isinstance(data, dict) or not isinstance(data.get("name"), str) or not data["name"].strip():
+            raise ValueError("A smart playlist needs a name")
+        descending = data.get("descending", True)
+        if not isinstance(descending, bool):
+            raise ValueError("descending must be true or false")
+        try:
+            return cls(data["name"].strip(), data.get("rules", ()), data.get("order_by"), descending, data.get("limit"))
+        except (TypeError, AttributeError) as e:
+            raise ValueError(f"Bad smart playlist definition: {e}") from e
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "rules": [list(rule) for rule in self.rules],
+            "order_by": self.order_by,
+            "descending": self.descending,
+            "limit": self.limit,
+        }
+
+    def __len__(self):
+        return len(self._ranked) if self.limit is not None else len(self._members)
+
+    def __contains__(self, track_id):
+        if self.limit is not None:
+            return track_id in self._ranked_values
+        return track_id in self._members
+
+    def ids(self):
+        # Member track IDs, best first when the playlist is ordered
+        if self.limit is not None:
+            ranked = reversed(self._ranked) if self.descending else self._ranked
+            return [track_id for _, track_id in ranked]
+        if self.order_by is None:
+            return list(self._members)
+        library = track_library.library
+        return sorted(
+            self._members,
+            key=lambda track_id: (normalize(self.order_by, getattr(library[track_id], self.order_by)), track_id),
+            reverse=self.descending,
+        )
+
+    def matches(self, track):
+        for field, op, value in self.rules:
+            if not OPERATORS[op](normalize(field, getattr(track, field)), value):
+                return False
+        return True
+
+    def rebuild(self, pairs):
+        # Evaluate the rules over (track_id, track) pairs from scratch
+        matching = ((track_id, track) for track_id, track in pairs if self.matches(track))
+        if self.limit is None:
+            self._members = dict.fromkeys(track_id for track_id, _ in matching)
+            return
+
+        entries = ((self._sort_value(track), track_id) for track_id, track in matching)
+        best = heapq.nlargest if self.descending else heapq.nsmallest
+        self._ranked = sorted(best(self.limit, entries))
+        self._ranked_values = {track_id: value for value, track_id in self._ranked}
+
+    def apply(self, track_id, track):
+        # Re-evaluate one track after it changed; track is None once removed
+        matches = track is not None and self.matches(track)
+        if self.limit is None:
+            if matches:
+                self._members.setdefault(track_id)
+            else:
+                self._members.pop(track_id, None)
+            return
+
+        ranked = self._ranked
+        was_full = len(ranked) >= self.limit
+        old_value = self._ranked_values.get(track_id)
+        entry = (self._sort_value(track), track_id) if matches else None
+
+        if old_value is None:
+            # Not a member: it joins only by beating the worst entry of a full list
+            if entry is None or (was_full and not self._better(entry, ranked[self._worst])):
+                return
+            self._insert(entry)
+            if len(ranked) > self.limit:
+                _, evicted = ranked.pop(self._worst)
+                del self._ranked_values[evicted]
+            return
+
+        boundary = ranked[self._worst]
+        del ranked[bisect.bisect_left(ranked, (old_value, track_id))]
+        del self._ranked_values[track_id]
+        if entry is not None and (not was_full or not self._better(boundary, entry)):
+            # Still beats every track outside the list
+            self._insert(entry)
+        elif was_full:
+            # A place opened up that any track outside the list could fill
+            self.rebuild(track_library.library.items())
+
+    def _better(self, entry, other):
+        return entry > other if self.descending else entry < other
+
+    def _insert(self, entry):
+        bisect.insort(self._ranked, entry)
+        self._ranked_values[entry[1]] = entry[0]
+
+    def _sort_value(self, track):
+        return normalize(self.order_by, getattr(track, self.order_by))
+
+
+class SmartPlaylists:
+    # The active smart playlists, kept current from track_library changes.
+    # A change reaches only the playlists that read the changed field, and a
+    # playlist pinned to one artist only sees changes to that artist's tracks,
+    # so an update costs a few rule checks rather than a pass over the library.
+
+    def __init__(self, path=None):
+        self.path = path  # JSON file the definitions are saved to, if any
+        self._playlists = {}
+        self._routes = {}  # Field -> normalized artist or None -> [SmartPlaylist]
+        self._by_artist = {}  # Normalized artist or None -> [SmartPlaylist]
+        track_library.subscribe(self._on_change)
+
+    def __len__(self):
+        return len(self._playlists)
+
+    def __contains__(self, name):
+        return name in self._playlists
+
+    def __iter__(self):
+        return iter(self._playlists.values())
+
+    def names(self):
+        return list(self._playlists)
+
+    def get(self, name):
+        return self._playlists[name]
+
+    def add(self, playlist):
+        # Evaluate a playlist over the library and keep it current, replacing any of the same name
+        self.remove(playlist.name)
+        playlist.rebuild(track_library.library.items())
+        self._playlists[playlist.name] = playlist
+        self._by_artist.setdefault(playlist.artist, []).append(playlist)
+        for field in playlist.fields:
+            self._routes.setdefault(field, {}).setdefault(playlist.artist, []).append(playlist)
+        return playlist
+
+    def remove(self, name):
+        playlist = self._playlists.pop(name, None)
+        if playlist is None:
+            return False
+        self._by_artist[playlist.artist].remove(playlist)
+        for field in playlist.fields:
+            self._routes[field][playlist.artist].remove(playlist)
+        return True
+
+    def load(self):
+        # Add the playlists saved in path, raising ValueError for a damaged file
+        if self.path is None or not os.path.exists(self.path):
+            return 0
+        with open(self.path, "r", encoding="utf-8") as file:
+            saved = json.load(file)
+        if not isinstance(saved, dict) or saved.get("version") != FILE_VERSION:
+            raise ValueError(f"{self.path} is not a version {FILE_VERSION} smart playlist file")
+        playlists = saved.get("playlists")
+        if not isinstance(playlists, list):
+            raise ValueError(f"{self.path} has no playlist list")
+        for data in playlists:
+            self.add(SmartPlaylist.from_dict(data))
+        return len(playlists)
+
+    def save(self):
+        # Replace the definitions file in one rename, like track_library.save_csv()
+        if self.path is None:
+            return
+        saved = {"version": FILE_VERSION, "playlists": [playlist.to_dict() for playlist in self]}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        handle, temp_path = tempfile.mkstemp(prefix=".smart-", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as file:
+                json.dump(saved, file, indent=2)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def close(self):
+        track_library.unsubscribe(self._on_change)
+
+    def _on_change(self, change):
+        if change.kind == "update":
+            routes = self._routes.get(change.field)
+            if not routes:
+                return
+            track = track_library.library.get(change.key)
+            artists = {normalize("artist", track.artist)}
+            if change.field == "artist":
+                artists.add(normalize("artist", change.old))
+            targets = list(routes.get(None, ()))
+            for artist in artists:
+                targets.extend(routes.get(artist, ()))
+        else:
+            track = change.new
+            item = change.new if change.kind == "add" else change.old
+            targets = list(self._by_artist.get(None, ()))
+            targets.extend(self._by_artist.get(normalize("artist", item.artist), ()))
+
+        for playlist in targets:
+            playlist.apply(change.key, track)
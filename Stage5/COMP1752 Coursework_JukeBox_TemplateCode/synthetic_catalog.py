@@ -0,0 +1,121 @@
+import argparse
+import csv
+import os
+import random
+import struct
+import zlib
+
+from track_library import CSV_HEADER
+
+# Writes deterministic tracks_data.csv-compatible catalogs for benchmarks and tests.
+# The same seed and size always produce byte-identical files.
+
+_WORDS = [
+    "Love", "Night", "Fire", "Heart", "Dream", "Road", "Rain", "Light", "Shadow", "River",
+    "Wild", "Golden", "Broken", "Electric", "Blue", "Midnight", "Summer", "Stone", "Angel", "City",
+    "Highway", "Thunder", "Silver", "Hotel", "Paradise", "Spirit", "Alive", "Wall", "Ocean", "Star",
+]
+_ARTIST_WORDS = [
+    "The", "Black", "Velvet", "Queens", "Rolling", "Eagles", "Sons", "Echo", "Neon", "Lions",
+    "Crystal", "Arctic", "Foxes", "Royal", "Ghost", "Kings", "Violet", "Iron", "Tigers", "Young",
+]
+
+
+def make_track_id(index, total):
+    # Zero padded IDs in the style of tracks_data.csv ("01", "02", ...)
+    return str(index + 1).zfill(max(2, len(str(total))))
+
+
+def iter_rows(total, seed=0, image_count=100, image_dir="images"):
+    # Yield catalog rows in CSV_HEADER order without holding them in memory
+    rng = random.Random(seed)
+    artist_count = max(10, total // 20)
+    artists = [_make_artist(rng, i) for i in range(min(artist_count, 100_000))]
+
+    for index in range(total):
+        title_length = rng.randint(1, 4)
+        title = " ".join(rng.choice(_WORDS) for _ in range(title_length))
+        if rng.random() < 0.02:
+            # Exercise CSV quoting with the occasional comma or quote
+            title = f'{title}, "Live"'
+        artist = artists[rng.randrange(len(artists))]
+        image_path = f"{image_dir}/cover_{rng.randrange(image_count):05d}.png" if image_count else ""
+        yield [
+            make_track_id(index, total),
+            title,
+            artist,
+            rng.randint(0, 500),
+            image_path,
+            rng.randint(0, 5),
+        ]
+
+
+def _make_artist(rng, index):
+    words = " ".join(rng.choice(_ARTIST_WORDS) for _ in range(rng.randint(1, 3)))
+    return f"{words} {index}"
+
+
+def write_catalog(path, total, seed=0, image_count=100, image_dir="images"):
+    # Write a catalog of `total` tracks to `path` and return the path
+    with open(path, "w", newline="", buffering=1024 * 1024) as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_HEADER)
+        writer.writerows(iter_rows(total, seed, image_count, image_dir))
+    return path
+
+
+def write_album_art(directory, image_count, seed=0, size=300):
+    # Write `image_count` distinct PNG covers named cover_00000.png, ...
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for index in range(image_count):
+        colour = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        accent = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        path = os.path.join(directory, f"cover_{index:05d}.png")
+        with open(path, "wb") as file:
+            file.write(encode_png(size, size, _cover_pixels(size, colour, accent, index)))
+        paths.append(path)
+    return paths
+
+
+def _cover_pixels(size, colour, accent, index):
+    # Raw RGB scanlines: a solid background with a diagonal accent stripe
+    stripe = 8 + index % 24
+    rows = []
+    for y in range(size):
+        row = bytearray()
+        for x in range(size):
+            row += bytes(accent if (x + y) // stripe % 4 == 0 else colour)
+        rows.append(bytes(row))
+    return rows
+
+
+def encode_png(width, height, rows):
+    # Encode RGB scanlines as a PNG using only the standard library
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+
+    raw = b"".join(b"\x00" + row for row in rows)
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b"")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic JukeBox catalog")
+    parser.add_argument("tracks", type=int, help="number of tracks to generate")
+    parser.add_argument("--output", default="synthetic_tracks.csv", help="CSV file to write")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--images", type=int, default=100, help="number of distinct covers")
+    parser.add_argument("--image-dir", default=None, help="write covers here (default: skip)")
+    args = parser.parse_args()
+
+    image_dir = args.image_dir or "images"
+    write_catalog(args.output, args.tracks, args.seed, args.images, image_dir)
+    if args.image_dir:
+        write_album_art(args.image_dir, args.images, args.seed)
+
+
+if __name__ == "__main__":
+    main()
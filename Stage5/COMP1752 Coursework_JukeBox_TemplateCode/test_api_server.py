@@ -0,0 +1,131 @@
+import asyncio
+import json
+
+import pytest
+
+import track_library
+from api_server import ApiServer, JukeboxApi
+from jukebox_model import JukeboxModel
+from library_item import LibraryItem
+
+
+@pytest.fixture
+def api(empty_library):
+    empty_library["01"] = LibraryItem("Hello", "Adele", 4, 10)
+    empty_library["02"] = LibraryItem("Skyfall", "Adele", 2, 7)
+    empty_library["03"] = LibraryItem("Yesterday", "The Beatles", 5, 3)
+    api = JukeboxApi(JukeboxModel())
+    yield api
+    api.model.close()
+    track_library.mark_clean()
+
+
+def exchange(api, data):
+    # Send raw bytes to a server on a free port and return everything it answers
+    async def run():
+        server = await ApiServer(api, port=0).start()
+        try:
+            reader, writer = await asyncio.open_connection(server.host, server.port)
+            writer.write(data)
+            await writer.drain()
+            replies = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return replies.decode()
+        finally:
+            await server.close()
+
+    return asyncio.run(run())
+
+
+def test_routes(api):
+    status, payload = api.handle("GET", "/tracks?offset=1&limit=1", None)
+    assert status == 200 and payload["total"] == 3 and [track["id"] for track in payload["tracks"]] == ["02"]
+    assert [track["id"] for track in api.handle("GET", "/search?q=adele&type=Artists", None)[1]["tracks"]] == [
+        "01", "02"]
+    assert api.handle("GET", "/tracks/03", None)[1]["name"] == "Yesterday"
+    assert api.handle("POST", "/tracks/01/rating", {"rating": 1})[1]["rating"] == 1
+    assert api.handle("POST", "/tracks/02/play", None)[1]["play_count"] == 8
+    assert api.handle("POST", "/playlist", {"id": "03"}) == (200, {"added": True})
+    assert [track["id"] for track in api.handle("GET", "/playlist", None)[1]["tracks"]] == ["03"]
+    assert api.handle("DELETE", "/playlist/03", None) == (200, {"removed": True})
+
+    assert api.handle("GET", "/tracks/99", None)[0] == 404
+    assert api.handle("GET", "/nowhere", None)[0] == 404
+    assert api.handle("GET", "/search?type=Albums", None)[0] == 400
+    assert api.handle("GET", "/tracks?limit=many", None)[0] == 400
+
+
+def test_smart_playlist_routes(api):
+    definition = {"name": "Adele", "rules": [["artist", "==", "Adele"]], "order_by": "play_count"}
+    status, payload = api.handle("POST", "/smart-playlists", definition)
+    assert status == 200 and payload["total"] == 2 and payload["rules"] == [["artist", "==", "adele"]]
+    assert [playlist["name"] for playlist in api.handle("GET", "/smart-playlists", None)[1]["smart_playlists"]] == [
+        "Adele"]
+    assert [track["id"] for track in api.handle("GET", "/smart-playlists/Adele?limit=1", None)[1]["tracks"]] == [
+        "01"]
+    assert api.handle("POST", "/smart-playlists", {"name": "Bad", "rules": [["colour", "==", "red"]]})[0] == 400
+    assert api.handle("DELETE", "/smart-playlists/Adele", None) == (200, {"removed": True})
+    assert api.handle("GET", "/smart-playlists/Adele", None)[0] == 404
+
+
+def test_malformed_bodies_are_bad_requests(api):
+    for path, body in [
+        ("/tracks/01/rating", None),
+        ("/tracks/01/rating", ["rating", 4]),
+        ("/tracks/01/rating", {"rating": "five"}),
+        ("/playlist", {"track": "01"}),
+        ("/batch", {"requests": "GET /tracks"}),
+        ("/batch", {"requests": [{}] * 1001}),
+    ]:
+        status, payload = api.handle("POST", path, body)
+        assert status == 400 and payload["error"], (path, body)
+
+
+def test_batch_answers_each_item(api):
+    status, payload = api.handle("POST", "/batch", {"requests": [
+        {"path": "/tracks/01"},
+        {"method": "post", "path": "/tracks/02/rating", "body": {"rating": 5}},
+        {"path": "/tracks/99"},
+        {"method": "POST", "path": "/batch", "body": {"requests": []}},
+        {"method": "POST", "path": "batch", "body": {"requests": []}},
+        {"path": 42},
+        {"method": ["GET"], "path": "/tracks"},
+        "GET /tracks",
+    ]})
+    assert status == 200
+    assert [response["status"] for response in payload["responses"]] == [200, 200, 404, 400, 400, 400, 400, 400]
+    assert track_library.library["02"].rating == 5
+
+
+def test_unexpected_errors_are_500(api, monkeypatch):
+    def broken(*args):
+        raise RuntimeError("bug")
+
+    monkeypatch.setattr(api.model, "tracks", broken)
+    assert api.handle("GET", "/tracks", None)[0] == 500
+    assert api.handle("POST", "/batch", {"requests": [{"path": "/tracks"}]})[1]["responses"][0]["status"] == 500
+
+
+def test_server_answers_pipelined_and_bad_requests(api):
+    batch = json.dumps({"requests": [{"path": 42}]}).encode()
+    replies = exchange(api, (
+        b"GET /tracks/01 HTTP/1.1\r\n\r\n"
+        b"POST /batch HTTP/1.1\r\nContent-Length: " + str(len(batch)).encode() + b"\r\n\r\n" + batch
+        + b"POST /playlist HTTP/1.1\r\nContent-Length: 5\r\nConnection: close\r\n\r\n{oops"
+    ))
+    assert replies.count("HTTP/1.1 200 OK") == 2
+    assert '"name":"Hello"' in replies and '"status":400' in replies
+    assert replies.endswith('{"error":"request body is not valid JSON"}')
+
+
+def test_server_refuses_long_lines_and_chunked_bodies(api):
+    replies = exchange(api, b"GET /tracks/01 HTTP/1.1\r\nX-Padding: " + b"a" * 100_000 + b"\r\n\r\n")
+    assert replies.startswith("HTTP/1.1 431 ") and "Connection: close" in replies
+    replies = exchange(api, b"GET /" + b"a" * 100_000 + b" HTTP/1.1\r\n\r\n")
+    assert replies.startswith("HTTP/1.1 414 ")
+    replies = exchange(api, (
+        b"POST /playlist HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n9\r\n{\"id\":\"03\"}\r\n0\r\n\r\n"
+        b"GET /tracks/01 HTTP/1.1\r\n\r\n"
+    ))
+    assert replies.startswith("HTTP/1.1 501 ") and replies.count("HTTP/1.1") == 1
+    assert api.model.playlist.ids() == []
@@ -0,0 +1,204 @@
+import os
+import struct
+
+import pytest
+
+import audio_scan
+import jukebox_cli
+import track_library
+from jukebox_model import JukeboxModel, read_tracks_csv
+from library_item import LibraryItem
+
+COVER = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4
+AUDIO = b"\xff\xfb\x90\x00" + bytes(1000)  # Stands in for the audio frames
+
+
+def synchsafe(size):
+    return bytes([size >> 21 & 0x7F, size >> 14 & 0x7F, size >> 7 & 0x7F, size & 0x7F])
+
+
+def id3v2(frames, major=3):
+    # An ID3v2.3 or 2.4 tag from (frame ID, body) pairs
+    body = b""
+    for frame_id, data in frames:
+        size = synchsafe(len(data)) if major == 4 else struct.pack(">I", len(data))
+        body += frame_id.encode() + size + b"\x00\x00" + data
+    body += bytes(32)  # Padding
+    return b"ID3" + bytes([major, 0, 0]) + synchsafe(len(body)) + body
+
+
+def apic(data, picture_type=3):
+    return b"\x00image/png\x00" + bytes([picture_type]) + b"Cover\x00" + data
+
+
+def mp3(title, artist, cover=None, major=3):
+    if major == 4:
+        frames = [("TIT2", b"\x03" + title.encode()), ("TPE1", b"\x03" + artist.encode())]
+    else:
+        frames = [("TIT2", b"\x01" + title.encode("utf-16")), ("TPE1", b"\x00" + artist.encode("latin-1"))]
+    if cover is not None:
+        frames += [("APIC", apic(b"back cover", picture_type=4)), ("APIC", apic(cover))]
+    return id3v2(frames, major) + AUDIO
+
+
+def flac(title, artist, cover=None):
+    vendor = b"test"
+    comments = [f"TITLE={title}".encode(), f"artist={artist}".encode()]
+    vorbis = struct.pack("<I", len(vendor)) + vendor + struct.pack("<I", len(comments))
+    vorbis += b"".join(struct.pack("<I", len(comment)) + comment for comment in comments)
+    blocks = [(0, bytes(34)), (4, vorbis)]
+    if cover is not None:
+        blocks.append((6, struct.pack(">II", 3, 9) + b"image/png" + struct.pack(">I", 0) + bytes(16)
+                       + struct.pack(">I", len(cover)) + cover))
+    data = b"fLaC"
+    for index, (block_type, block) in enumerate(blocks):
+        last = 0x80 if index == len(blocks) - 1 else 0
+        data += bytes([last | block_type]) + len(block).to_bytes(3, "big") + block
+    return data + AUDIO
+
+
+def wav(title, artist):
+    info = b"INFO"
+    for key, value in ((b"INAM", title), (b"IART", artist)):
+        text = value.encode("latin-1") + b"\x00"
+        info += key + struct.pack("<I", len(text)) + text + b"\x00" * (len(text) % 2)
+    chunks = b"fmt " + struct.pack("<I", 16) + bytes(16)
+    chunks += b"data" + struct.pack("<I", 3) + b"abc\x00"
+    chunks += b"LIST" + struct.pack("<I", len(info)) + info
+    return b"RIFF" + struct.pack("<I", 4 + len(chunks)) + b"WAVE" + chunks
+
+
+@pytest.fixture
+def music(empty_library, tmp_path):
+    folder = tmp_path / "music"
+    (folder / "Adele").mkdir(parents=True)
+    (folder / "Adele" / "hello.mp3").write_bytes(mp3("Hello", "Adele", COVER))
+    (folder / "Adele" / "skyfall.flac").write_bytes(flac("Skyfall", "Adele", COVER))
+    (folder / "beatles.wav").write_bytes(wav("Yesterday", "The Beatles"))
+    (folder / "notes.txt").write_text("not audio")
+    yield folder
+    track_library.mark_clean()
+
+
+def scanner(music, tmp_path, jobs=1):
+    return audio_scan.FolderScanner(str(music), str(tmp_path / "state.json"), str(tmp_path / "images"), jobs)
+
+
+def tracks():
+    return {track_id: (track.name, track.artist) for track_id, track in track_library.library.items()}
+
+
+def test_tags_are_read_from_each_format(tmp_path):
+    for name, data, expected in [
+        ("v23.mp3", mp3("Déjà Vu", "Beyoncé", COVER), ("Déjà Vu", "Beyoncé")),
+        ("v24.mp3", mp3("Ünïcode", "Björk", COVER, major=4), ("Ünïcode", "Björk")),
+        ("tagged.flac", flac("Skyfall", "Adele", COVER), ("Skyfall", "Adele")),
+        ("info.wav", wav("Yesterday", "The Beatles"), ("Yesterday", "The Beatles")),
+    ]:
+        path = tmp_path / name
+        path.write_bytes(data)
+        tags = audio_scan.read_tags(str(path))
+        assert (tags.title, tags.artist) == expected
+        if not name.endswith(".wav"):
+            assert tags.picture == (COVER, "image/png")  # The front cover, not the back
+
+
+def test_id3v1_fallback_and_damaged_tags(tmp_path):
+    path = tmp_path / "old.mp3"
+    path.write_bytes(AUDIO + b"TAG" + b"Old Song".ljust(30, b"\x00") + b"Old Band".ljust(30, b"\x00") + bytes(65))
+    assert audio_scan.read_tags(str(path))[:2] == ("Old Song", "Old Band")
+
+    path = tmp_path / "broken song.flac"
+    path.write_bytes(b"fLaC\x04\x00\x00\x50" + b"short")
+    with pytest.raises(audio_scan.TagError):
+        audio_scan.read_tags(str(path))
+    title, artist, image_path, error = audio_scan.scan_file(str(path), str(tmp_path / "images"))
+    assert (title, artist, image_path) == ("broken song", audio_scan.UNKNOWN_ARTIST, None) and error
+
+
+def test_damaged_picture_frame_does_not_stop_the_scan(music, tmp_path):
+    frames = [("TIT2", b"\x00Broken"), ("APIC", b"\x00image/png with no terminator")]
+    (music / "broken.mp3").write_bytes(id3v2(frames) + AUDIO)
+    with pytest.raises(audio_scan.TagError):
+        audio_scan.read_tags(str(music / "broken.mp3"))
+    result = scanner(music, tmp_path).scan()
+    assert len(result.added) == 4 and list(result.errors) == ["broken.mp3"]
+    assert ("broken", audio_scan.UNKNOWN_ARTIST) in tracks().values()  # Named after the file
+
+
+def test_missing_or_empty_folder_removes_nothing(music, tmp_path):
+    added = scanner(music, tmp_path).scan().added
+    moved = tmp_path / "moved"
+    music.rename(moved)
+    with pytest.raises(NotADirectoryError):
+        scanner(music, tmp_path).scan()
+    music.mkdir()  # The mount point is back, but empty
+    assert scanner(music, tmp_path).scan().removed == []
+    assert sorted(track_library.library) == added
+
+    moved.rename(tmp_path / "gone")
+    music.rmdir()
+    (tmp_path / "gone").rename(music)
+    assert scanner(music, tmp_path).scan().unchanged == 3
+
+
+def test_scan_adds_tracks_and_one_cover_per_image(music, tmp_path):
+    track_library.add("07", LibraryItem("Existing", "Band"))
+    result = scanner(music, tmp_path).scan()
+    assert result.added == ["08", "09", "10"] and result.errors == {}
+    assert tracks() == {"07": ("Existing", "Band"), "08": ("Yesterday", "The Beatles"), "09": ("Hello", "Adele"),
+                        "10": ("Skyfall", "Adele")}
+    covers = os.listdir(tmp_path / "images")
+    assert len(covers) == 1 and covers[0].endswith(".png")
+    assert track_library.library["09"].image_path == track_library.library["10"].image_path
+    assert (tmp_path / "images" / covers[0]).read_bytes() == COVER
+    assert track_library.library["08"].image_path is None
+
+
+def test_rescan_reads_only_changed_files(music, tmp_path, monkeypatch):
+    scanner(music, tmp_path).scan()
+    track_library.set_rating("02", 5)
+    read = []
+    scan_file = audio_scan.scan_file
+
+    def counting_scan_file(path, cover_dir):
+        read.append(path)
+        return scan_file(path, cover_dir)
+
+    monkeypatch.setattr(audio_scan, "scan_file", counting_scan_file)
+
+    assert scanner(music, tmp_path).scan() == audio_scan.ScanResult([], [], [], 3, {})
+    assert read == []
+
+    hello = music / "Adele" / "hello.mp3"
+    hello.write_bytes(mp3("Hello (Live)", "Adele"))
+    os.utime(hello, ns=(1, 1))
+    (music / "beatles.wav").unlink()
+    (music / "new.flac").write_bytes(flac("Help!", "The Beatles"))
+    result = scanner(music, tmp_path).scan()
+    assert result == audio_scan.ScanResult(["04"], ["02"], ["01"], 1, {})
+    assert sorted(os.path.basename(path) for path in read) == ["hello.mp3", "new.flac"]
+    assert track_library.library["02"].name == "Hello (Live)"
+    assert track_library.library["02"].image_path is None
+    assert track_library.library["02"].rating == 5  # Kept across rescans
+
+
+def test_parallel_scan_matches_serial_scan(music, tmp_path):
+    serial = scanner(music, tmp_path / "serial").scan(), tracks()
+    track_library.library.clear()
+    parallel = scanner(music, tmp_path / "parallel", jobs=2).scan(), tracks()
+    assert parallel == serial
+
+
+def test_cli_scan_writes_the_catalog(music, tmp_path):
+    output = tmp_path / "tracks.csv"
+    state = tmp_path / "state.json"
+    arguments = ["scan", str(music), "--catalog", str(tmp_path / "missing.csv"), "--state", str(state),
+                 "--covers", str(tmp_path / "images"), "-o", str(output)]
+    assert jukebox_cli.main(arguments) == 0
+    with open(output, newline="") as file:
+        assert [(track_id, track.name) for track_id, track in read_tracks_csv(file)] == [
+            ("01", "Yesterday"), ("02", "Hello"), ("03", "Skyfall")]
+
+    model = JukeboxModel()
+    assert model.scan_folder(str(music), str(state)).unchanged == 3
@@ -0,0 +1,92 @@
+import os
+import time
+
+import pytest
+
+import track_library
+from autosave import AutoSaver
+from jukebox_model import JukeboxModel, read_tracks_csv
+from library_item import LibraryItem
+
+
+@pytest.fixture
+def catalog(empty_library, tmp_path):
+    empty_library["01"] = LibraryItem("Hello", "Adele", 4, 10)
+    empty_library["02"] = LibraryItem("Skyfall", "Adele", 2, 7)
+    track_library.mark_clean()
+    yield tmp_path / "tracks.csv"
+    track_library.mark_clean()
+
+
+def read_back(path):
+    with open(path, newline="") as file:
+        return {track_id: (track.name, track.play_count, track.rating) for track_id, track in read_tracks_csv(file)}
+
+
+def test_changes_mark_tracks_dirty(catalog):
+    assert not track_library.is_dirty()
+    track_library.set_rating("01", 4)  # Unchanged
+    track_library.increment_play_count("01", 0)
+    assert not track_library.is_dirty()
+    track_library.set_rating("01", 5)
+    track_library.update("02", name="Skyfall (Live)")
+    track_library.remove("02")
+    track_library.add("03", LibraryItem("New", "Band"))
+    assert track_library.dirty_keys() == {"01", "02", "03"}
+
+
+def test_save_replaces_the_file_atomically(catalog):
+    catalog.write_text("old contents")
+    os.chmod(catalog, 0o644)
+    track_library.increment_play_count("01")
+    assert track_library.save_csv(str(catalog)) == 2
+    assert read_back(catalog) == {"01": ("Hello", 11, 4), "02": ("Skyfall", 7, 2)}
+    assert not track_library.is_dirty()
+    assert os.stat(catalog).st_mode & 0o777 == 0o644
+    assert os.listdir(catalog.parent) == ["tracks.csv"]
+
+
+def test_failed_save_keeps_changes_dirty(catalog):
+    track_library.increment_play_count("01")
+    with pytest.raises(OSError):
+        track_library.save_csv(str(catalog.parent / "missing" / "tracks.csv"))
+    assert track_library.dirty_keys() == {"01"}
+
+
+def test_burst_of_edits_costs_one_save(catalog):
+    saved = []
+    saver = AutoSaver(str(catalog), delay=0.05, max_delay=5, save=saved.append)
+    try:
+        for _ in range(1000):
+            track_library.increment_play_count("01")
+        deadline = time.monotonic() + 5
+        while not saved and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        assert saved == [str(catalog)]
+    finally:
+        saver.close()
+
+
+def test_steady_edits_save_every_max_delay(catalog):
+    saver = AutoSaver(str(catalog), delay=0.1, max_delay=0.2)
+    try:
+        started = time.monotonic()
+        while time.monotonic() - started < 0.5:
+            track_library.increment_play_count("01")
+            time.sleep(0.01)
+        assert 1 <= saver.saves <= 3
+    finally:
+        saver.close()
+    assert read_back(catalog)["01"][1] == track_library.get_play_count("01")
+
+
+def test_model_close_saves_pending_changes(catalog):
+    catalog.write_text("ID,Title,Artist,Play Count,Image Path,Rating\n01,Hello,Adele,10,,4\n")
+    model = JukeboxModel()
+    model.load_csv(str(catalog))
+    assert not track_library.is_dirty()
+    model.start_autosave(str(catalog), delay=60)
+    model.update_track("01", "Hello", "Adele", 1)
+    model.close()
+    assert read_back(catalog)["01"] == ("Hello", 10, 1)
@@ -0,0 +1,128 @@
+import io
+import os
+import time
+
+import pytest
+
+import track_library
+from catalog_watch import CatalogWatcher, diff_catalog
+from jukebox_model import JukeboxModel
+from library_item import LibraryItem
+
+HEADER = "ID,Title,Artist,Play Count,Image Path,Rating\n"
+
+
+@pytest.fixture
+def catalog(empty_library, tmp_path):
+    # A catalog file and a model that loaded it
+    path = tmp_path / "tracks.csv"
+    write(path, "01,Hello,Adele,10,,4\n02,Skyfall,Adele,7,images/skyfall.png,2\n03,Yesterday,The Beatles,3,,5\n")
+    model = JukeboxModel()
+    model.load_csv(str(path))
+    model.watch_catalog(str(path))
+    yield path, model
+    model.close()
+    track_library.mark_clean()
+
+
+def write(path, rows, mtime_ns=None):
+    path.write_text(HEADER + rows)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_diff_finds_added_removed_and_changed_rows(empty_library):
+    empty_library["01"] = LibraryItem("Hello", "Adele", 4, 10)
+    empty_library["02"] = LibraryItem("Skyfall", "Adele", 2, 7)
+    empty_library["03"] = LibraryItem("Yesterday", "The Beatles", 5, 3)
+    file = io.StringIO(HEADER + "01,Hello,Adele,010,,4\n02,Skyfall,Adele,8,,3\n04,Help!,The Beatles,0,,1\n")
+    diff = diff_catalog(file, empty_library)
+    assert list(diff.added) == ["04"]
+    assert diff.removed == ["03"]
+    assert diff.changed == {"02": {"play_count": 8, "rating": 3}}
+
+    with pytest.raises(ValueError):
+        diff_catalog(io.StringIO("Title,Artist\nHello,Adele\n"), empty_library)
+
+
+def test_reload_applies_only_the_difference(catalog):
+    path, model = catalog
+    model.library_indexes.index("rating")
+    skyfall = track_library.library["02"]
+    write(path, "01,Hello,Adele,10,,4\n02,Skyfall,Adele,7,images/skyfall.png,5\n04,Help!,The Beatles,0,,1\n",
+          mtime_ns=time.time_ns() + 10**9)
+
+    diff = model.apply_catalog_diff(model._catalog_watcher.check())
+    assert (list(diff.added), diff.removed, diff.changed) == (["04"], ["03"], {"02": {"rating": 5}})
+    assert track_library.library["02"] is skyfall and skyfall.rating == 5
+    assert "03" not in track_library.library
+    assert model.library_indexes.sorted_ids("rating", descending=True) == ["02", "01", "04"]
+    assert not track_library.is_dirty()
+    assert model._catalog_watcher.check() is None
+
+
+def test_unsaved_local_edits_win(catalog):
+    path, model = catalog
+    track_library.increment_play_count("01")
+    write(path, "01,Hello,Adele,99,,1\n02,Skyfall,Adele,7,images/skyfall.png,2\n03,Yesterday,The Beatles,3,,1\n",
+          mtime_ns=time.time_ns() + 10**9)
+    diff = model.apply_catalog_diff(model._catalog_watcher.check())
+    assert diff.changed == {"03": {"rating": 1}}
+    assert track_library.library["01"].play_count == 11
+    assert track_library.dirty_keys() == {"01"}
+
+
+def test_own_saves_are_not_read_back(catalog):
+    path, model = catalog
+    track_library.set_rating("01", 1)
+    track_library.save_csv(str(path))
+    watcher = model._catalog_watcher
+    assert not watcher.changed()
+    assert watcher.check() is None
+
+
+def test_poll_reads_in_the_background(catalog):
+    path, model = catalog
+    write(path, "01,Hello,Adele,10,,4\n02,Skyfall,Adele,7,images/skyfall.png,2\n",
+          mtime_ns=time.time_ns() + 10**9)
+    deadline = time.monotonic() + 5
+    diff = model.poll_catalog()
+    while diff is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+        diff = model.poll_catalog()
+    assert diff.removed == ["03"]
+    assert model.poll_catalog() is None
+
+
+def test_autosave_waits_for_an_outside_edit(catalog):
+    path, model = catalog
+    saver = model.start_autosave(str(path), delay=60)
+    with open(path, "a") as file:
+        file.write("09,Help!,The Beatles,0,,1\n")
+    os.utime(path, ns=(time.time_ns() + 10**9,) * 2)
+    track_library.increment_play_count("01")
+
+    assert not saver.flush() and saver.held  # Saving now would overwrite row 09
+    assert "09" in path.read_text()
+
+    deadline = time.monotonic() + 5
+    diff = model.poll_catalog()
+    while diff is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+        diff = model.poll_catalog()
+    assert list(diff.added) == ["09"]
+    assert saver.flush() and not saver.held
+    assert "09,Help!,The Beatles,0,,1" in path.read_text()
+    assert "01,Hello,Adele,11,,4" in path.read_text()
+
+
+def test_close_merges_an_outside_edit_before_the_last_save(catalog):
+    path, model = catalog
+    model.start_autosave(str(path), delay=60)
+    track_library.increment_play_count("01")
+    with open(path, "a") as file:
+        file.write("09,Help!,The Beatles,0,,1\n")
+    os.utime(path, ns=(time.time_ns() + 10**9,) * 2)
+    model.close()
+    assert "09" in track_library.library
+    assert "09,Help!,The Beatles,0,,1" in path.read_text() and "01,Hello,Adele,11,,4" in path.read_text()
@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+import track_library
+from history import History
+from jukebox_model import JukeboxModel
+from library_item import LibraryItem
+
+
+@pytest.fixture
+def model(empty_library):
+    for index in range(1, 6):
+        empty_library[f"0{index}"] = LibraryItem(f"Song {index}", "Band", index % 6)
+    return JukeboxModel()
+
+
+def test_undo_redo_playlist_changes(model):
+    for track_id in ["01", "02", "03"]:
+        model.add_to_playlist(track_id)
+    model.remove_from_playlist("02")
+    model.move_in_playlist("03", -1)
+    assert model.playlist.ids() == ["03", "01"]
+
+    assert model.undo().label == "Move in Playlist"
+    assert model.playlist.ids() == ["01", "03"]
+    model.undo()
+    assert model.playlist.ids() == ["01", "02", "03"]
+    model.undo()
+    assert model.playlist.ids() == ["01", "02"]
+
+    model.redo()
+    assert model.playlist.ids() == ["01", "02", "03"]
+    model.redo()
+    assert model.playlist.ids() == ["01", "03"]
+    model.redo()
+    assert model.playlist.ids() == ["03", "01"]
+    assert model.redo() is None
+
+
+def test_undo_track_edit(model):
+    model.update_track("01", "New Name", "Band", 5)
+    assert track_library.get_name("01") == "New Name"
+    model.undo()
+    assert track_library.get_name("01") == "Song 1"
+    assert track_library.get_rating("01") == 1
+    model.redo()
+    assert track_library.get_rating("01") == 5
+
+
+def test_new_change_clears_redo(model):
+    model.add_to_playlist("01")
+    model.undo()
+    model.add_to_playlist("02")
+    assert not model.history.can_redo()
+
+
+def test_bulk_edit_is_one_compact_step(empty_library):
+    for index in range(10_000):
+        empty_library[f"{index:05d}"] = LibraryItem(f"Song {index}", "Band", index % 5)
+    model = JukeboxModel()
+    track_ids = list(empty_library)
+
+    assert model.add_tracks_to_playlist(track_ids) == 10_000
+    changed = model.rate_tracks(track_ids, 5)
+    entry = model.history._undo[-1]
+    assert entry.label == "Rate Tracks"
+    assert len(entry.deltas) == 1
+    assert len(entry.deltas[0].track_ids) == changed
+
+    started = time.perf_counter()
+    model.undo()
+    assert time.perf_counter() - started < 1
+    assert [track.rating for track in empty_library.values()][:6] == [0, 1, 2, 3, 4, 0]
+    model.undo()
+    assert len(model.playlist) == 0
+    model.redo()
+    assert model.playlist.ids() == track_ids
+
+
+def test_memory_is_bounded(model):
+    history = History(model.playlist, max_entries=3, max_tracks=10)
+    for track_id in ["01", "02", "03", "04", "05"]:
+        model.playlist.add(track_id)
+        history.record("insert", track_id)
+    assert len(history._undo) == 3
+    with history.group("Bulk"):
+        for track_id in ["01", "02", "03", "04", "05"] * 3:
+            history.record("edit", track_id, old={"rating": 0}, new={"rating": 1})
+    assert [entry.label for entry in history._undo] == ["Bulk"]
+
+
+def test_switching_playlist_clears_history(model):
+    model.add_to_playlist("01")
+    model.open_playlist("Other")
+    assert not model.history.can_undo()
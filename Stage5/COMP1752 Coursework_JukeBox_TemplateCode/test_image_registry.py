@@ -0,0 +1,123 @@
+import json
+import os
+
+import pytest
+
+import image_registry
+import jukebox_cli
+from image_registry import THUMBNAIL_BYTES, ImageRegistry
+
+
+def write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_identical_files_share_one_thumbnail(tmp_path):
+    first = write(tmp_path / "a.png", b"cover one")
+    copy = write(tmp_path / "copy of a.png", b"cover one")
+    other = write(tmp_path / "b.png", b"cover two")
+    decoded = []
+    registry = ImageRegistry(lambda path: decoded.append(path) or object())
+
+    thumbnails = [registry.thumbnail(path) for path in (first, copy, other, first, copy)]
+    assert decoded == [first, other]
+    assert thumbnails[0] is thumbnails[1] is thumbnails[3] is thumbnails[4]
+    assert thumbnails[2] is not thumbnails[0]
+    assert registry.canonical(copy) == first
+    assert registry.thumbnail(str(tmp_path / "missing.png")) is None
+
+    stats = registry.stats()
+    assert (stats["paths"], stats["contents"], stats["dedup_ratio"]) == (3, 2, 1.5)
+    assert (stats["path_bytes"], stats["unique_bytes"]) == (27, 18)
+    assert (stats["thumbnails"], stats["thumbnail_uses"]) == (2, 5)
+    assert stats["memory_saved"] == THUMBNAIL_BYTES  # The copy, showing a path again saves nothing
+
+
+def test_only_recent_thumbnails_are_kept(tmp_path):
+    paths = [write(tmp_path / f"{index}.png", b"cover %d" % index) for index in range(4)]
+    copy = write(tmp_path / "copy.png", b"cover 0")
+    decoded = []
+    registry = ImageRegistry(lambda path: decoded.append(path) or object(), max_thumbnails=2)
+
+    for path in (paths[0], paths[1], paths[0], paths[2]):  # Evicts 1, the least recently used
+        registry.thumbnail(path)
+    assert decoded == paths[:3]
+    registry.thumbnail(copy)
+    registry.thumbnail(paths[1])
+    assert decoded == paths[:3] + [paths[1]]
+    stats = registry.stats()
+    assert (stats["thumbnails"], stats["thumbnails_evicted"]) == (2, 2)
+    assert stats["thumbnail_bytes"] == 2 * THUMBNAIL_BYTES
+    assert stats["memory_saved"] == THUMBNAIL_BYTES  # 0.png shown for two paths
+
+
+def test_files_are_hashed_once_until_they_change(tmp_path, monkeypatch):
+    path = write(tmp_path / "a.png", b"cover one")
+    copy = write(tmp_path / "b.png", b"cover one")
+    hashed = []
+    hash_file = image_registry.hash_file
+    monkeypatch.setattr(image_registry, "hash_file", lambda path: hashed.append(path) or hash_file(path))
+    registry = ImageRegistry(lambda path: path)
+
+    for _ in range(3):
+        registry.thumbnail(path)
+    registry.digest(copy)
+    assert hashed == [path, copy]
+
+    # The canonical file changes: its old content now lives only at the copy
+    write(tmp_path / "a.png", b"new cover!")
+    os.utime(path, ns=(1, 1))
+    assert registry.thumbnail(path) == path
+    assert hashed == [path, copy, path]
+    assert registry.canonical(copy) == copy
+    assert registry.thumbnail(copy) == path  # Decoded from the old bytes, which the copy still holds
+    assert len(registry) == 2
+
+
+def test_deleted_canonical_file_falls_back_to_a_copy(tmp_path):
+    def decode(path):
+        with open(path, "rb") as file:
+            return file.read()
+
+    first = write(tmp_path / "a.png", b"cover one")
+    copy = write(tmp_path / "b.png", b"cover one")
+    registry = ImageRegistry(decode)
+    assert registry.add_paths([first, copy]) == 2
+    assert registry.canonical(copy) == first
+
+    os.remove(first)
+    assert registry.thumbnail(copy) == b"cover one"
+    assert registry.canonical(copy) == copy
+    assert registry.stats()["paths"] == 1
+
+    def undecodable(path):
+        raise OSError(f"cannot identify image file {path!r}")
+
+    broken = write(tmp_path / "broken.png", b"not an image")
+    registry = ImageRegistry(undecodable)
+    with pytest.raises(OSError):
+        registry.thumbnail(broken)  # Still there, so there is nothing to fall back to
+    assert registry.canonical(broken) == broken
+
+
+def test_cli_reports_duplicate_art(tmp_path):
+    (tmp_path / "images").mkdir()
+    write(tmp_path / "images" / "a.png", b"cover one")
+    write(tmp_path / "images" / "a_copy.png", b"cover one")
+    catalog = tmp_path / "tracks.csv"
+    catalog.write_text(
+        "ID,Title,Artist,Play Count,Image Path,Rating\n"
+        "01,Hello,Adele,0,images/a.png,0\n"
+        "02,Skyfall,Adele,0,images/a_copy.png,0\n"
+        "03,Rolling,Adele,0,images/a.png,0\n"
+        "04,Missing,Adele,0,images/missing.png,0\n"
+        "05,No Art,Adele,0,,0\n"
+    )
+    output = tmp_path / "report.json"
+    assert jukebox_cli.main(["images", "--catalog", str(catalog), "--json", "-o", str(output)]) == 0
+    report = json.loads(output.read_text())
+    assert report["tracks"] == 5 and report["tracks_with_art"] == 3
+    assert (report["art_files"], report["distinct_images"], report["dedup_ratio"]) == (2, 1, 2.0)
+    assert report["duplicate_bytes"] == 9
+    assert report["thumbnail_memory_saved"] == 2 * THUMBNAIL_BYTES
@@ -0,0 +1,98 @@
+import io
+import json
+
+import pytest
+
+import instrumentation
+from instrumentation import MetricsRegistry
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    # Metrics switched on, recording into a registry of their own
+    registry = MetricsRegistry()
+    monkeypatch.setattr(instrumentation, "ENABLED", True)
+    monkeypatch.setattr(instrumentation, "registry", registry)
+    return registry
+
+
+def test_timed_is_a_no_op_when_metrics_are_off(monkeypatch):
+    monkeypatch.setattr(instrumentation, "ENABLED", False)
+
+    def add(a, b):
+        return a + b
+
+    assert instrumentation.timed("add")(add) is add
+    assert instrumentation.timer("block") is instrumentation.timer("other")
+    instrumentation.count("calls")
+    assert "calls" not in instrumentation.registry.snapshot()
+
+
+def test_timed_records_each_call(metrics):
+    @instrumentation.timed("add")
+    def add(a, b):
+        return a + b
+
+    @instrumentation.timed()
+    def fail():
+        raise RuntimeError("boom")
+
+    assert add(1, 2) == 3 and add.__name__ == "add"
+    add(3, 4)
+    with pytest.raises(RuntimeError):
+        fail()
+
+    snapshot = metrics.snapshot()
+    assert snapshot["add"]["type"] == "timer" and snapshot["add"]["count"] == 2
+    assert snapshot["add"]["min"] <= snapshot["add"]["mean"] <= snapshot["add"]["max"]
+    assert snapshot[f"{__name__}.test_timed_records_each_call.<locals>.fail"]["count"] == 1
+
+
+def test_timed_generators_count_what_they_yield(metrics):
+    @instrumentation.timed("numbers")
+    def numbers(limit):
+        yield from range(limit)
+
+    assert list(numbers(3)) == [0, 1, 2]
+    partial = numbers(10)
+    next(partial)
+    partial.close()  # An abandoned generator is recorded when it is closed
+
+    snapshot = metrics.snapshot()
+    assert snapshot["numbers"]["count"] == 2
+    assert (snapshot["numbers.yielded"]["count"], snapshot["numbers.yielded"]["total"]) == (2, 4)
+
+
+def test_registry_aggregates_and_resets(metrics):
+    for value in range(1, 101):
+        metrics.histogram("sizes").record(value)
+    instrumentation.count("calls")
+    instrumentation.count("calls", 4)
+    with instrumentation.timer("block"):
+        pass
+
+    sizes = metrics.snapshot()["sizes"]
+    assert (sizes["count"], sizes["total"], sizes["mean"], sizes["min"], sizes["max"]) == (100, 5050, 50.5, 1, 100)
+    assert (sizes["p50"], sizes["p95"]) == (51, 96)
+    assert metrics.counter("calls").value == 5
+    assert metrics.snapshot()["block"]["count"] == 1
+    with pytest.raises(TypeError):
+        metrics.timer("calls")
+
+    stream = io.StringIO()
+    instrumentation.dump(stream, "json")
+    assert sorted(json.loads(stream.getvalue())) == ["block", "calls", "sizes"]
+    assert metrics.format_table().splitlines()[0].startswith("metric")
+
+    metrics.reset()
+    assert metrics.snapshot() == {}
+    assert metrics.counter("calls").value == 0
+
+
+def test_histogram_keeps_a_bounded_sample(monkeypatch):
+    monkeypatch.setattr(instrumentation, "HISTOGRAM_SAMPLE_SIZE", 10)
+    histogram = instrumentation.Histogram("latency")
+    for value in range(1000):
+        histogram.record(value)
+    assert len(histogram._samples) == 10
+    assert (histogram.count, histogram.min, histogram.max) == (1000, 0, 999)
@@ -0,0 +1,119 @@
+import io
+import json
+
+import pytest
+
+import jukebox_cli
+import parallel_load
+import track_library
+from jukebox_model import read_tracks_csv
+
+CATALOG = (
+    "ID,Title,Artist,Play Count,Image Path,Rating\n"
+    "01,Hello,Adele,10,images/hello.png,4\n"
+    '02,"Hotel, California",Eagles,1,,5\n'
+    "03,Skyfall,Adele,7,,2\n"
+)
+
+
+@pytest.fixture
+def catalog(empty_library, tmp_path):
+    path = tmp_path / "tracks.csv"
+    path.write_text(CATALOG)
+    yield str(path)
+    track_library.mark_clean()
+
+
+def run(*argv):
+    return jukebox_cli.main([str(arg) for arg in argv])
+
+
+def read_catalog(path):
+    with open(path, newline="") as file:
+        return [(track_id, track.name, track.play_count, track.rating) for track_id, track in read_tracks_csv(file)]
+
+
+def test_export_lists_the_catalog_with_filters(catalog, tmp_path):
+    output = tmp_path / "out.txt"
+    assert run("export", "--catalog", catalog, "-o", output) == 0
+    assert output.read_text() == "01 Hello - Adele ****\n02 Hotel, California - Eagles *****\n03 Skyfall - Adele **\n"
+
+    assert run("export", "--catalog", catalog, "--artist", " adele ", "--min-rating", 3, "--format", "jsonl",
+               "-o", output) == 0
+    assert [json.loads(line)["id"] for line in output.read_text().splitlines()] == ["01"]
+
+    assert run("export", "--catalog", catalog, "--min-rating", 2, "--format", "csv", "-o", output) == 0
+    assert [row[0] for row in read_catalog(output)] == ["01", "02", "03"]
+
+
+def test_import_merges_later_files_over_earlier(catalog, tmp_path):
+    update = tmp_path / "update.csv"
+    update.write_text("ID,Title,Artist,Play Count,Image Path,Rating\n03,Skyfall (Live),Adele,8,,5\n04,Help!,The Beatles,0,,1\n")
+    output = tmp_path / "merged.csv"
+    for jobs in (1, 2):
+        assert run("import", catalog, update, "--jobs", jobs, "-o", output) == 0
+        assert read_catalog(output) == [
+            ("01", "Hello", 10, 4), ("02", "Hotel, California", 1, 5), ("03", "Skyfall (Live)", 8, 5),
+            ("04", "Help!", 0, 1)]
+
+
+def test_import_keeps_the_last_of_repeated_ids(catalog, tmp_path, monkeypatch):
+    update = tmp_path / "update.csv"
+    update.write_text("ID,Title,Artist,Play Count,Image Path,Rating\n"
+                      "04,Help!,The Beatles,0,,1\n01,Hello (Demo),Adele,0,,1\n04,Help! (Remaster),The Beatles,2,,3\n")
+    output = tmp_path / "merged.csv"
+    monkeypatch.setattr("sys.stdin", io.StringIO(update.read_text()))
+    assert run("import", catalog, "-", "-o", output) == 0
+    assert read_catalog(output) == [
+        ("02", "Hotel, California", 1, 5), ("03", "Skyfall", 7, 2), ("01", "Hello (Demo)", 0, 1),
+        ("04", "Help! (Remaster)", 2, 3)]
+
+
+def test_rate_many_and_replay_plays_stream_the_catalog(catalog, tmp_path, capsys):
+    ratings = tmp_path / "ratings.csv"
+    ratings.write_text("01,1\n99,5\n03,lots\n02,9\n01,2\n")
+    output = tmp_path / "rated.csv"
+    assert run("rate-many", "--catalog", catalog, "--input", ratings, "-o", output) == 0
+    assert read_catalog(output) == [("01", "Hello", 10, 2), ("02", "Hotel, California", 1, 5), ("03", "Skyfall", 7, 2)]
+    assert capsys.readouterr().err == "Applied 2 ratings, skipped 2 lines\n"
+    assert track_library.library == {}
+
+    log = tmp_path / "plays.log"
+    log.write_text("03\n03\t1700000000\t4\n99\n")
+    assert run("replay-plays", log, "--catalog", output, "-o", tmp_path / "played.csv") == 0
+    assert read_catalog(tmp_path / "played.csv")[2] == ("03", "Skyfall", 12, 2)
+    assert capsys.readouterr().err == "Replayed 5 plays, 1 for unknown tracks\n"
+
+    assert run("replay-plays", log, "--catalog", output, "-o", output) == 1
+    assert read_catalog(output)[2] == ("03", "Skyfall", 7, 2)
+
+
+def test_search_and_stats(catalog, tmp_path):
+    output = tmp_path / "out.txt"
+    assert run("search", "hotel", "--catalog", catalog, "--type", "Tracks", "-o", output) == 0
+    assert output.read_text() == "02 Hotel, California - Eagles *****\n"
+
+    assert run("stats", "--catalog", catalog, catalog, "--json", "-o", output) == 0
+    report = json.loads(output.read_text())
+    assert (report["tracks"], report["artists"], report["total_plays"]) == (6, 2, 36)
+    assert report["most_played"][0] == {"id": "01", "track": "Hello - Adele", "plays": 10}
+
+
+def test_scan_of_a_missing_folder_fails_without_writing(catalog, tmp_path, capsys):
+    output = tmp_path / "out.csv"
+    assert run("scan", tmp_path / "no music", "--catalog", catalog, "--state", tmp_path / "state.json",
+               "--covers", tmp_path / "images", "-o", output) == 1
+    assert not output.exists()
+    assert capsys.readouterr().err.startswith("Error: ")
+
+
+def test_bad_rows_are_reported_with_file_and_line(catalog, tmp_path, capsys, monkeypatch):
+    with open(catalog, "a") as file:
+        file.write("04,Broken,Band,lots,,3\n")
+    output = tmp_path / "out.csv"
+    assert run("export", "--catalog", catalog, "-o", output) == 1
+    assert capsys.readouterr().err.startswith(f"Error: {catalog}, line 5: invalid literal for int()")
+
+    monkeypatch.setattr(parallel_load, "PARALLEL_MIN_BYTES", 0)
+    assert run("rate-many", "--catalog", catalog, "--jobs", 2, "--input", catalog, "-o", output) == 1
+    assert capsys.readouterr().err.startswith(f"Error: {catalog}, line 5: invalid literal for int()")
@@ -0,0 +1,64 @@
+import pytest
+
+import track_library
+from jukebox_model import JukeboxModel
+from library_item import LibraryItem
+
+
+@pytest.fixture
+def model(empty_library):
+    empty_library["01"] = LibraryItem("Hello", "Adele", 3, 2)
+    empty_library["02"] = LibraryItem("Someone Like You", "Adele", 5)
+    empty_library["03"] = LibraryItem("Hotel California", "Eagles", 4)
+    return JukeboxModel()
+
+
+def test_search_by_type(model):
+    assert [track_id for track_id, _ in model.search("adele", "ALL")] == ["01", "02"]
+    assert [track_id for track_id, _ in model.search("adele", "Tracks")] == []
+    assert [track_id for track_id, _ in model.search(" HOTEL ", "Tracks")] == ["03"]
+
+
+def test_paused_search_survives_tracks_added_and_removed(model):
+    results = model.search("", "ALL")
+    assert next(results)[0] == "01"
+    track_library.remove("02")
+    track_library.add("04", LibraryItem("Skyfall", "Adele"))
+    assert [track_id for track_id, _ in results] == ["03"]
+    track_library.mark_clean()
+
+
+def test_play_track_counts_plays(model):
+    assert model.play_track("01") == 3
+    assert model.play_track("99") is None
+
+
+def test_playlist_rejects_duplicates_and_unknown_tracks(model):
+    assert model.add_to_playlist("01")
+    assert not model.add_to_playlist("01")
+    assert not model.add_to_playlist("99")
+    assert model.remove_from_playlist("01")
+    assert not model.remove_from_playlist("01")
+
+
+def test_update_track_clamps_rating(model):
+    track = model.update_track("02", "Skyfall", "Adele", "9")
+    assert (track.name, track.rating) == ("Skyfall", 5)
+    with pytest.raises(ValueError):
+        model.update_track("02", "Skyfall", "Adele", "five")
+
+
+def test_load_csv(empty_library, tmp_path):
+    path = tmp_path / "tracks.csv"
+    path.write_text("ID,Title,Artist,Play Count,Image Path,Rating\n01,Song,Band,4,images/a.png,3\n")
+    assert JukeboxModel().load_csv(str(path)) == 1
+    assert track_library.get_play_count("01") == 4
+
+
+def test_close_releases_library_subscriptions(empty_library, tmp_path):
+    model = JukeboxModel(play_log=str(tmp_path / "plays.log"))
+    model.scheduler
+    model.smart_playlists
+    model.play_charts
+    model.close()
+    assert track_library._listeners == []
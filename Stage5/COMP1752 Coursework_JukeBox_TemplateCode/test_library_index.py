@@ -0,0 +1,140 @@
+import random
+
+import pytest
+
+import track_library
+from jukebox_model import JukeboxModel
+from library_index import ArtistIndex, LibraryIndexes, SortedList
+from library_item import LibraryItem
+
+
+@pytest.fixture
+def indexes(empty_library):
+    empty_library["01"] = LibraryItem("Hello", "Adele", 4, 10)
+    empty_library["02"] = LibraryItem("yesterday", "The Beatles", 5, 3)
+    empty_library["03"] = LibraryItem("Skyfall", "adele", 2, 7)
+    empty_library["04"] = LibraryItem("Hotel California", "Eagles", 5, 1)
+    indexes = LibraryIndexes()
+    yield indexes
+    indexes.close()
+
+
+def test_sorted_list_matches_sorted():
+    rng = random.Random(3)
+    values = SortedList(chunk_size=4)
+    expected = []
+    for _ in range(500):
+        value = rng.randrange(100)
+        if expected and rng.random() < 0.4:
+            value = rng.choice(expected)
+            assert values.discard(value)
+            expected.remove(value)
+        else:
+            values.add(value)
+            expected.append(value)
+    expected.sort()
+    assert list(values) == expected
+    assert list(reversed(values)) == expected[::-1]
+    assert len(values) == len(expected)
+    assert values.slice(5, 17) == expected[5:17]
+    assert values.slice(3, 9, reverse=True) == expected[::-1][3:9]
+    assert not values.discard(1000)
+
+
+def test_sorted_ids_per_field(indexes):
+    assert indexes.sorted_ids("name") == ["01", "04", "03", "02"]
+    assert indexes.sorted_ids("play_count", descending=True) == ["01", "03", "02", "04"]
+    # Ties keep ID order, reversed when descending
+    assert indexes.sorted_ids("rating", descending=True) == ["04", "02", "01", "03"]
+    assert indexes.sorted_ids("artist", stop=2) == ["01", "03"]
+    with pytest.raises(ValueError):
+        indexes.index("image_path")
+
+
+def test_indexes_follow_library_changes(indexes):
+    indexes.index("rating")
+    indexes.index("play_count")
+    indexes.index("artist")
+    track_library.set_rating("03", 5)
+    track_library.increment_play_count("04", 20)
+    JukeboxModel().update_track("01", "Hello", "Zucchero", 4)
+    track_library.add("05", LibraryItem("New", "Band", 3, 8))
+    track_library.remove("02")
+
+    assert indexes.sorted_ids("rating", descending=True) == ["04", "03", "01", "05"]
+    assert indexes.sorted_ids("play_count", descending=True) == ["04", "01", "05", "03"]
+    assert indexes.sorted_ids("artist") == ["03", "05", "04", "01"]
+
+
+def test_model_sorted_tracks(empty_library):
+    empty_library["01"] = LibraryItem("B", "X", 1)
+    empty_library["02"] = LibraryItem("A", "Y", 3)
+    model = JukeboxModel()
+    try:
+        assert [track_id for track_id, _ in model.sorted_tracks("name")] == ["02", "01"]
+        track_library.set_rating("01", 5)
+        pairs = list(model.sorted_tracks("rating", descending=True))
+        assert pairs == [("01", empty_library["01"]), ("02", empty_library["02"])]
+    finally:
+        model.close()
+
+
+def test_artist_index_groups_and_totals(indexes):
+    artists = ArtistIndex()
+    try:
+        assert [entry.name for entry in artists.entries()] == ["Adele", "Eagles", "The Beatles"]
+        adele = artists.get(" ADELE")
+        assert list(adele.track_ids) == ["01", "03"]
+        assert (adele.track_count, adele.plays, adele.average_rating) == (2, 17, 3.0)
+
+        track_library.increment_play_count("03", 5)
+        track_library.set_rating("01", 2)
+        assert (adele.plays, adele.average_rating) == (22, 2.0)
+
+        JukeboxModel().update_track("03", "Skyfall", "Eagles", 2)
+        eagles = artists.get("eagles")
+        assert list(adele.track_ids) == ["01"]
+        assert (eagles.track_count, eagles.plays, eagles.average_rating) == (2, 13, 3.5)
+
+        track_library.remove("01")
+        track_library.add("05", LibraryItem("Help!", "The Beatles", 3, 2))
+        assert "Adele" not in artists
+        assert [entry.name for entry in artists.entries()] == ["Eagles", "The Beatles"]
+        assert artists.get("the beatles").plays == 5
+    finally:
+        artists.close()
+
+
+def test_background_artist_index_catches_up_with_changes(indexes):
+    def grouped(artists):
+        return [(entry.name, sorted(entry.track_ids), entry.plays, entry.rating_total) for entry in artists.entries()]
+
+    artists = ArtistIndex(background=True)
+    copy = dict(track_library.library)
+    # Made while build() reads the copy, whose items are the same objects
+    track_library.increment_play_count("03", 5)
+    JukeboxModel().update_track("01", "Hello", "Eagles", 4)
+    track_library.remove("02")
+    track_library.add("05", LibraryItem("Help!", "The Beatles", 3, 2))
+    artists.build(copy)
+    artists.finish()
+    fresh = ArtistIndex()
+    try:
+        assert grouped(artists) == grouped(fresh) == [
+            ("adele", ["03"], 12, 2), ("Eagles", ["01", "04"], 11, 9), ("The Beatles", ["05"], 2, 3)]
+        track_library.increment_play_count("05")  # Followed directly once finished
+        assert artists.get("the beatles").plays == 3
+    finally:
+        artists.close()
+        fresh.close()
+
+
+def test_model_artist_tracks(empty_library):
+    empty_library["01"] = LibraryItem("Hello", "Adele")
+    empty_library["02"] = LibraryItem("Hotel California", "Eagles")
+    model = JukeboxModel()
+    try:
+        assert [track_id for track_id, _ in model.artist_tracks("adele ")] == ["01"]
+        assert list(model.artist_tracks("Nobody")) == []
+    finally:
+        model.close()
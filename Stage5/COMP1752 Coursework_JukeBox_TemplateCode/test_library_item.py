@@ -0,0 +1,66 @@
+import pytest
+import track_library
+from library_item import LibraryItem, normalize
+
+def test_default_values():
+    item = LibraryItem("Song", "Artist")
+    assert item.rating == 0
+    assert item.play_count == 0
+
+def test_rating_clamping():
+    assert LibraryItem("Song", "Artist", rating=6).rating == 5
+    assert LibraryItem("Song", "Artist", rating=-1).rating == 0
+
+def test_play_count_non_negative():
+    assert LibraryItem("Song", "Artist", play_count=-5).play_count == 0
+
+def test_rating_type_cast():
+    assert LibraryItem("Song", "Artist", rating="3").rating == 3
+
+def test_play_count_type_cast():
+    assert LibraryItem("Song", "Artist", play_count="2").play_count == 2
+
+def test_info_formatting():
+    item = LibraryItem("Hello", "Adele", rating=3)
+    assert item.info() == "Hello - Adele ***"
+
+def test_star_generation():
+    assert LibraryItem("X", "Y", rating=4).stars() == "****"
+
+def test_star_table_covers_every_rating():
+    assert [LibraryItem("X", "Y", rating=r).stars() for r in range(6)] == ["", "*", "**", "***", "****", "*****"]
+
+def test_cached_strings_follow_library_changes(empty_library):
+    item = LibraryItem("Hello", "Adele", rating=3, play_count=1)
+    track_library.add("01", item)
+    assert item.info() == "Hello - Adele ***"
+    assert item.details() == "Play count: 1 | Rating: 3"
+    track_library.set_rating("01", 5)
+    track_library.increment_play_count("01")
+    track_library.update("01", name="Skyfall")
+    assert item.info() == "Skyfall - Adele *****"
+    assert item.details() == "Play count: 2 | Rating: 5"
+    assert item.label() == "Skyfall - Adele"
+
+def test_cached_strings_follow_direct_assignment():
+    item = LibraryItem("Hello", "Adele", rating=3, play_count=1)
+    assert item.info() == "Hello - Adele ***"
+    assert item.details() == "Play count: 1 | Rating: 3"
+    item.rating = 5
+    assert item.info() == "Hello - Adele *****"
+    item.play_count += 1
+    item.artist = "Lionel Richie"
+    assert item.info() == "Hello - Lionel Richie *****"
+    assert item.details() == "Play count: 2 | Rating: 5"
+
+def test_items_with_nothing_cached_keep_the_shared_version():
+    item = LibraryItem("Hello", "Adele")
+    item.rating = 4
+    assert "version" not in vars(item)
+
+def test_normalize_compares_text_loosely():
+    assert normalize("artist", " Adele ") == normalize("artist", "adele") == "adele"
+    assert normalize("name", None) == ""
+    assert normalize("rating", "4") == 4
+    with pytest.raises(KeyError):
+        normalize("colour", "red")
@@ -0,0 +1,67 @@
+import io
+
+import pytest
+
+import parallel_load
+import track_library
+from jukebox_model import JukeboxModel, read_tracks_csv
+
+CATALOG = (
+    'ID,Title,Artist,Play Count,Image Path,Rating\n'
+    '01,Hello,Adele,10,images/hello.png,4\n'
+    '02,"Hotel, California",Eagles,1,,5\n'
+    '03,"Line one\nline two",Band,0,,3\n'
+    '04,"Say ""Hi""\n, and\n""bye""",Quoted,2,,1\n'
+    '\n'
+    '05,Skyfall,Adele,7,,2\n'
+    '03,"Duplicate, later row wins",Band,9,,0\n'
+)
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = tmp_path / "tracks.csv"
+    path.write_bytes(CATALOG.encode())
+    return str(path)
+
+
+def serial(path):
+    with open(path, newline="") as file:
+        return [(track_id, vars(track)) for track_id, track in read_tracks_csv(file)]
+
+
+def test_ranges_start_on_record_boundaries(catalog, monkeypatch):
+    monkeypatch.setattr(parallel_load, "SCAN_BLOCK", 7)  # Quotes and newlines straddle blocks
+    data = CATALOG.encode()
+    starts = {0} | {index + 1 for index in range(len(data)) if data[index:index + 1] == b"\n"
+                    and data[:index].count(b'"') % 2 == 0}
+    for parts in range(1, 40):
+        header_end, ranges = parallel_load.split_ranges(catalog, parts)
+        assert header_end == data.index(b"\n") + 1
+        assert ranges[0][0] == header_end and ranges[-1][1] == len(data)
+        assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+        assert all(start in starts for start, _ in ranges)
+
+
+def test_parallel_load_matches_serial_load(catalog, monkeypatch):
+    monkeypatch.setattr(parallel_load, "RANGES_PER_JOB", 5)
+    pairs = [(track_id, vars(track)) for track_id, track in parallel_load.iter_tracks_parallel(catalog, 2)]
+    assert pairs == serial(catalog)
+    assert pairs[3][1]["name"] == 'Say "Hi"\n, and\n"bye"'
+
+
+def test_model_uses_the_parallel_load_for_large_files(empty_library, catalog, monkeypatch):
+    monkeypatch.setattr(parallel_load, "PARALLEL_MIN_BYTES", 0)
+    assert JukeboxModel().load_csv(catalog, jobs=2) == 6
+    assert sorted(empty_library) == ["01", "02", "03", "04", "05"]
+    assert empty_library["03"].name == "Duplicate, later row wins"
+    assert not track_library.is_dirty()
+
+
+def test_bad_rows_raise_like_the_serial_load(tmp_path):
+    path = tmp_path / "tracks.csv"
+    path.write_text("ID,Title,Artist,Play Count,Image Path,Rating\n01,Hello,Adele,many,,4\n")
+    with pytest.raises(ValueError):
+        list(parallel_load.iter_tracks_parallel(str(path), 2))
+    with pytest.raises(ValueError):
+        list(read_tracks_csv(io.StringIO(path.read_text())))
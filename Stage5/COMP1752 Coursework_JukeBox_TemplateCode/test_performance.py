@@ -0,0 +1,56 @@
+import pytest
+
+import synthetic_catalog
+import track_library
+from jukebox_model import JukeboxModel
+from library_item import LibraryItem
+
+# Run with: python -m pytest --perf test_performance.py
+# They drive JukeboxModel directly, so they run on a headless machine.
+
+pytestmark = pytest.mark.perf
+
+
+@pytest.fixture(scope="module")
+def million_tracks():
+    return {
+        row[0]: LibraryItem(row[1], row[2], rating=row[5], play_count=row[3], image_path=row[4])
+        for row in synthetic_catalog.iter_rows(1_000_000, seed=1)
+    }
+
+
+def test_load_100k_rows(perf_budget, empty_library, tmp_path):
+    csv_path = synthetic_catalog.write_catalog(str(tmp_path / "tracks.csv"), 100_000)
+
+    def load():
+        track_library.library.clear()
+        JukeboxModel().load_csv(csv_path)
+
+    perf_budget(load, repeats=3)
+    assert len(track_library.library) == 100_000
+
+
+def test_search_1m_rows(perf_budget, empty_library, million_tracks):
+    track_library.library.update(million_tracks)
+    model = JukeboxModel()
+
+    def search():
+        return sum(1 for _ in model.search("midnight", "ALL"))
+
+    perf_budget(search, repeats=3)
+    assert search() > 0
+
+
+def test_add_10k_to_playlist(perf_budget, empty_library):
+    for row in synthetic_catalog.iter_rows(10_000, seed=2):
+        track_library.library[row[0]] = LibraryItem(row[1], row[2])
+    ids = list(track_library.library)
+
+    def fill_playlist():
+        model = JukeboxModel()
+        for track_id in ids:
+            model.add_to_playlist(track_id)
+        return model
+
+    perf_budget(fill_playlist, repeats=3)
+    assert len(fill_playlist().playlist_items) == 10_000
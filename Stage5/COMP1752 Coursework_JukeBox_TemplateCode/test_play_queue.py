@@ -0,0 +1,87 @@
+import pytest
+
+from play_queue import PlaybackScheduler
+
+
+def make_scheduler(**kwargs):
+    played = []
+
+    def record_play(track_id):
+        played.append(track_id)
+        return played.count(track_id)
+
+    scheduler = PlaybackScheduler(record_play, track_seconds=0.01, **kwargs)
+    return scheduler, played
+
+
+def test_plays_queue_in_order_and_records_on_poll():
+    scheduler, played = make_scheduler()
+    events = []
+    scheduler.subscribe(events.append)
+    scheduler.play(["01", "02", "03"])
+    assert scheduler.run_until_finished(timeout=5)
+    scheduler.close()
+
+    assert played == ["01", "02", "03"]
+    assert [event.kind for event in events] == ["playing", "playing", "playing", "finished"]
+    assert [event.position for event in events[:3]] == [0, 1, 2]
+    assert events[0].total == 3
+
+
+def test_nothing_recorded_until_poll():
+    scheduler, played = make_scheduler()
+    scheduler.play(["01"])
+    assert played == []
+    scheduler.poll()
+    assert played == ["01"]
+    scheduler.close()
+
+
+def test_skip_and_stop():
+    scheduler, played = make_scheduler()
+    scheduler.track_seconds = 60
+    scheduler.play(["01", "02", "03"])
+    scheduler.skip()
+    assert scheduler.now_playing() == "02"
+    scheduler.stop()
+    assert not scheduler.is_playing
+    kinds = [event.kind for event in scheduler.poll()]
+    scheduler.close()
+
+    assert played == ["01", "02"]
+    assert kinds == ["playing", "playing", "stopped"]
+
+
+def test_repeat_one_replays_until_skipped():
+    scheduler, played = make_scheduler()
+    scheduler.set_repeat("one")
+    scheduler.track_seconds = 60
+    scheduler.play(["01", "02"])
+    with scheduler._condition:
+        scheduler._advance()  # The current track ends
+    assert scheduler.now_playing() == "01"
+    scheduler.skip()
+    assert scheduler.now_playing() == "02"
+    scheduler.close()
+
+
+def test_shuffle_is_repeatable_with_a_seed():
+    orders = []
+    for _ in range(2):
+        scheduler, played = make_scheduler(seed=7)
+        scheduler.set_shuffle(True)
+        scheduler.play([f"{i:02d}" for i in range(20)])
+        assert scheduler.run_until_finished(timeout=5)
+        scheduler.close()
+        orders.append(played)
+
+    assert orders[0] == orders[1]
+    assert sorted(orders[0]) == [f"{i:02d}" for i in range(20)]
+    assert orders[0] != sorted(orders[0])
+
+
+def test_invalid_repeat_mode():
+    scheduler, _ = make_scheduler()
+    with pytest.raises(ValueError):
+        scheduler.set_repeat("sometimes")
+    scheduler.close()
@@ -0,0 +1,179 @@
+import collections
+import random
+import threading
+
+import pytest
+
+import track_library
+from catalog_watch import CatalogDiff
+from jukebox_cli import _count_plays
+from jukebox_model import JukeboxModel
+from library_item import LibraryItem
+import play_stats
+from play_stats import PlayCharts, SpaceSaving, WindowedTopN
+from recommend import LiveRecommender
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_space_saving_keeps_heavy_hitters_within_capacity():
+    rng = random.Random(1)
+    summary = SpaceSaving(capacity=50)
+    exact = collections.Counter()
+    for _ in range(20_000):
+        # A few popular tracks over a long tail
+        item = f"hot{rng.randrange(5)}" if rng.random() < 0.3 else f"tail{rng.randrange(5000)}"
+        summary.add(item)
+        exact[item] += 1
+
+    assert len(summary) == 50
+    assert {item for item, _ in summary.top(5)} == {f"hot{index}" for index in range(5)}
+    for item, count in summary.counts.items():
+        assert count - summary.errors[item] <= exact[item] <= count
+
+
+def test_window_drops_old_buckets():
+    window = WindowedTopN(bucket_seconds=60, buckets=60)
+    window.add("01", 0, 5)
+    window.add("02", 1800, 3)
+    assert window.top(2, now=1800) == [("01", 5), ("02", 3)]
+    assert window.top(2, now=3600 + 30) == [("02", 3)]
+    assert window.top(2, now=10_000) == []
+
+
+def test_late_plays_land_in_their_bucket():
+    window = WindowedTopN(bucket_seconds=10, buckets=3)
+    window.add("01", 25)
+    window.add("02", 5)
+    window.add("03", 12)
+    window.add("04", -1)  # Older than the window
+    assert sorted(window.top(5)) == [("01", 1), ("02", 1), ("03", 1)]
+    assert [number for number, _ in window._buckets] == [0, 1, 2]
+    assert sorted(window.top(5, now=35)) == [("01", 1), ("03", 1)]
+
+
+def test_totals_match_buckets_after_evictions():
+    rng = random.Random(2)
+    window = WindowedTopN(bucket_seconds=10, buckets=5, capacity=8)
+    for second in range(200):
+        window.add(f"{rng.randrange(40):02d}", second)
+        expected = collections.Counter()
+        for _, summary in window._buckets:
+            expected.update(summary.counts)
+        assert window._totals == dict(+expected)
+
+
+@pytest.fixture
+def charts(empty_library, tmp_path):
+    empty_library["01"] = LibraryItem("Hello", "Adele")
+    empty_library["02"] = LibraryItem("Skyfall", "Adele")
+    clock = Clock()
+    charts = PlayCharts(str(tmp_path / "plays.log"), clock=clock)
+    yield charts, clock, tmp_path / "plays.log"
+    charts.close()
+
+
+def test_plays_are_logged_and_charted(charts):
+    charts, clock, log_path = charts
+    track_library.increment_play_count("01")
+    clock.now += 2 * 3600
+    track_library.increment_play_count("02", 3)
+    track_library.set_rating("01", 5)  # Not a play
+
+    assert charts.top("hour") == [("02", 3)]
+    assert charts.top("day") == [("02", 3), ("01", 1)]
+
+    charts.flush()
+    assert _count_plays(str(log_path)) == {"01": 1, "02": 3}
+
+
+def test_play_counts_set_from_a_catalog_reload_are_not_plays(charts):
+    charts, clock, log_path = charts
+    track_library.mark_clean()  # Dirty tracks keep their local counts
+    recommender = LiveRecommender()
+    try:
+        model = JukeboxModel()
+        model.apply_catalog_diff(CatalogDiff({}, [], {"01": {"play_count": 1000}}))
+        track_library.update("02", play_count=7)  # An edit in the track dialog
+        assert track_library.get_play_count("01") == 1000
+        assert charts.top("day") == []
+        assert not recommender._pending
+    finally:
+        recommender.close()
+    charts.flush()
+    assert _count_plays(str(log_path)) == {}
+    track_library.mark_clean()
+
+
+def test_charts_reload_recent_plays_from_log(charts):
+    charts, clock, log_path = charts
+    track_library.increment_play_count("01", 2)
+    clock.now += 8 * 86400
+    track_library.increment_play_count("02")
+    charts.close()
+
+    reloaded = PlayCharts(str(log_path), clock=clock)
+    try:
+        assert reloaded.top("week") == [("02", 1)]
+    finally:
+        reloaded.close()
+
+
+def test_loading_compacts_stale_plays_out_of_the_log(charts, monkeypatch):
+    charts, clock, log_path = charts
+    track_library.increment_play_count("01", 2)
+    charts.close()
+    with open(log_path, "a") as file:
+        file.write("damaged line\n")
+    clock.now += 8 * 86400
+    monkeypatch.setattr(play_stats, "COMPACT_MIN_LINES", 3)
+
+    reloaded = PlayCharts(str(log_path), clock=clock)  # Two stale lines, below the threshold
+    track_library.increment_play_count("02")
+    reloaded.close()
+    assert len(log_path.read_text().splitlines()) == 3
+
+    clock.now += 3600
+    monkeypatch.setattr(play_stats, "COMPACT_MIN_LINES", 2)
+    reloaded = PlayCharts(str(log_path), clock=clock)
+    try:
+        assert log_path.read_text() == f"02\t{clock.now - 3600:.3f}\t1\n"
+        assert reloaded.top("week") == [("02", 1)]
+        track_library.increment_play_count("01")
+        reloaded.flush()
+        assert _count_plays(str(log_path)) == {"02": 1, "01": 1}
+    finally:
+        reloaded.close()
+
+
+def test_background_load_keeps_plays_made_meanwhile(charts, monkeypatch):
+    charts, clock, log_path = charts
+    track_library.increment_play_count("01", 2)
+    charts.close()
+    release = threading.Event()
+    load_log = PlayCharts._load_log
+
+    def slow_load_log(self, windows):
+        release.wait(5)
+        load_log(self, windows)
+
+    monkeypatch.setattr(PlayCharts, "_load_log", slow_load_log)
+    reloaded = PlayCharts(str(log_path), clock=clock, background=True)
+    try:
+        assert not reloaded.loaded()
+        track_library.increment_play_count("02")
+        assert reloaded.top("day") == [("02", 1)]
+        release.set()
+        reloaded.flush()
+        assert reloaded.loaded() and reloaded.load_error is None
+        assert reloaded.top("day") == [("01", 2), ("02", 1)]
+        assert [line.split("\t")[0] for line in log_path.read_text().splitlines()] == ["01", "02"]
+    finally:
+        release.set()
+        reloaded.close()
@@ -0,0 +1,56 @@
+import pytest
+
+from playlist import Playlist
+
+
+def make_playlist(ids):
+    return Playlist((track_id, f"track {track_id}") for track_id in ids)
+
+
+def test_add_rejects_duplicates():
+    playlist = make_playlist(["01", "02"])
+    assert not playlist.add("01", "again")
+    assert playlist.ids() == ["01", "02"]
+    assert "02" in playlist and "03" not in playlist
+
+
+def test_remove_relinks_neighbours():
+    playlist = make_playlist(["01", "02", "03"])
+    assert playlist.remove("02")
+    assert not playlist.remove("02")
+    assert playlist.ids() == ["01", "03"]
+    playlist.remove("01")
+    playlist.remove("03")
+    assert playlist.ids() == [] and not playlist
+
+
+def test_insert_at_and_move():
+    playlist = make_playlist(["01", "02", "03"])
+    playlist.insert_at(1, "04", "track 04")
+    assert playlist.ids() == ["01", "04", "02", "03"]
+    playlist.move("01")
+    assert playlist.ids() == ["04", "02", "03", "01"]
+    playlist.move("03", "04")
+    assert playlist.ids() == ["03", "04", "02", "01"]
+
+
+@pytest.mark.parametrize("track_id, index", [("01", 0), ("01", 2), ("01", 4), ("05", 0), ("03", 1), ("03", 3)])
+def test_move_to_lands_at_index(track_id, index):
+    playlist = make_playlist(["01", "02", "03", "04", "05"])
+    playlist.move_to(track_id, index)
+    assert playlist.ids().index(track_id) == index
+    assert sorted(playlist.ids()) == ["01", "02", "03", "04", "05"]
+
+
+def test_changes_are_reported():
+    playlist = make_playlist(["01", "02"])
+    changes = []
+    playlist.subscribe(changes.append)
+    playlist.add("03", "track 03", "01")
+    playlist.move("01")
+    playlist.remove("02")
+    assert [tuple(change) for change in changes] == [
+        ("insert", "03", "01"),
+        ("move", "01", None),
+        ("remove", "02", None),
+    ]
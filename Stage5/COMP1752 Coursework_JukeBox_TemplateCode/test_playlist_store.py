@@ -0,0 +1,81 @@
+import io
+
+import pytest
+
+from jukebox_model import DEFAULT_PLAYLIST_NAME, JukeboxModel
+from library_item import LibraryItem
+from playlist_store import PlaylistStore, PlaylistStoreError
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PlaylistStore(str(tmp_path / "playlists.jbpl"))
+
+
+def test_save_and_load_single_playlist(store):
+    store.save("Rock", ["01", "03", "07"])
+    store.save("Empty", [])
+    store.save("Pop", ["04"])
+    assert store.names() == ["Rock", "Empty", "Pop"]
+    assert store.load("Rock") == ["01", "03", "07"]
+    assert store.load("Empty") == []
+    assert store.track_count("Rock") == 3
+
+
+def test_replace_delete_and_rename_keep_other_playlists(store):
+    store.save_many({"Rock": ["01", "02"], "Pop": ["04"]})
+    store.save("Rock", ["09"])
+    store.delete("Pop")
+    store.save("Jazz", ["05", "06"])
+    store.rename("Jazz", "Blues")
+    assert {name: store.load(name) for name in store.names()} == {"Rock": ["09"], "Blues": ["05", "06"]}
+    with pytest.raises(PlaylistStoreError):
+        store.rename("Rock", "Blues")
+
+
+def test_json_round_trip(store, tmp_path):
+    store.save_many({"Rock": ["01", "02"], "Pop": ["04"]})
+    exported = io.StringIO()
+    store.export_json(exported)
+
+    other = PlaylistStore(str(tmp_path / "other.jbpl"))
+    assert other.import_json(io.StringIO(exported.getvalue())) == ["Rock", "Pop"]
+    assert other.load("Pop") == ["04"]
+
+
+def test_truncated_file_is_a_store_error(store, empty_library):
+    store.save_many({DEFAULT_PLAYLIST_NAME: ["01", "02"], "Rock": ["03"]})
+    with open(store.path, "rb") as file:
+        data = file.read()
+    for size in (8, 20, 40, len(data) - 5):
+        with open(store.path, "wb") as file:
+            file.write(data[:size])
+        damaged = PlaylistStore(store.path)
+        with pytest.raises(PlaylistStoreError):
+            for name in damaged.names():
+                damaged.load(name)
+
+    with open(store.path, "wb") as file:
+        file.write(data[:40])  # Inside the index
+    model = JukeboxModel(PlaylistStore(store.path))
+    assert isinstance(model.playlist_error, PlaylistStoreError)
+    assert model.playlist.ids() == []
+    assert model.playlist_names() == [DEFAULT_PLAYLIST_NAME]
+
+
+def test_model_switches_and_persists_playlists(empty_library, store):
+    empty_library["01"] = LibraryItem("Hello", "Adele")
+    empty_library["02"] = LibraryItem("Hotel California", "Eagles")
+
+    model = JukeboxModel(store)
+    model.add_to_playlist("01")
+    model.open_playlist("Road Trip")
+    model.add_to_playlist("02")
+    model.open_playlist(DEFAULT_PLAYLIST_NAME)
+    assert model.playlist.ids() == ["01"]
+
+    reopened = JukeboxModel(store)
+    assert reopened.playlist.ids() == ["01"]
+    assert reopened.playlist_names() == [DEFAULT_PLAYLIST_NAME, "Road Trip"]
+    reopened.open_playlist("Road Trip")
+    assert [track.name for _, track in reopened.playlist] == ["Hotel California"]
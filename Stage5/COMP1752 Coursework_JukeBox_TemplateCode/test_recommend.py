@@ -0,0 +1,152 @@
+import threading
+import time
+
+import pytest
+
+import track_library
+from jukebox_model import JukeboxModel
+from library_index import ArtistIndex
+from library_item import LibraryItem
+from playlist_store import PlaylistStore
+from recommend import LiveRecommender, Recommender
+
+
+@pytest.fixture
+def library(empty_library):
+    for index in range(1, 10):
+        empty_library[f"0{index}"] = LibraryItem(f"Song {index}", "Band")
+    return empty_library
+
+
+def test_playlist_neighbours(library):
+    recommender = Recommender()
+    recommender.add_sequence(["01", "02", "03", "04", "05"], window=2)
+    recommender.add_sequence(["01", "02", "09"], window=2)
+    recommender.apply_batch()
+
+    assert recommender.weight("01", "02") == 2
+    assert recommender.weight("01", "03") == 1
+    assert recommender.weight("01", "04") == 0
+    assert recommender.recommend("01") == ["02", "03", "09"]
+    assert recommender.recommend("02", count=1) == ["01"]
+    assert recommender.recommend("99") == []
+
+
+def test_consecutive_plays_within_a_session(library):
+    recommender = Recommender()
+    recommender.add_play("01", 0)
+    recommender.add_play("02", 100)
+    recommender.add_play("03", 100 + 3 * 3600)  # A new session
+    recommender.add_play("03", 100 + 3 * 3600 + 10)
+    assert recommender.recommend("02") == ["01"]
+    assert recommender.recommend("03") == []
+
+
+def test_index_keeps_the_best_neighbours(library):
+    recommender = Recommender(neighbours=2, batch_size=1)
+    for other, times in [("02", 1), ("03", 3), ("04", 2), ("05", 5)]:
+        for _ in range(times):
+            recommender.add_sequence(["01", other], window=1)
+    assert recommender.recommend("01") == ["05", "03"]
+    for _ in range(4):
+        recommender.add_sequence(["01", "02"], window=1)
+    assert recommender.recommend("01") == ["05", "02"]
+
+
+def test_batches_wait_until_full_or_queried(library):
+    recommender = Recommender(batch_size=100)
+    recommender.add_sequence(["01", "02"])
+    assert len(recommender) == 0
+    assert recommender.recommend("01") == ["02"]
+    assert len(recommender) == 1
+
+
+def test_removed_tracks_are_not_suggested(library):
+    recommender = Recommender()
+    recommender.add_sequence(["01", "02", "03"])
+    track_library.remove("02")
+    assert recommender.recommend("01") == ["03"]
+
+
+def test_live_plays_update_the_model(library, tmp_path):
+    log = tmp_path / "plays.log"
+    log.write_text("01\t1000.000\t1\n02\t1010.000\t1\n")
+    times = iter([2000.0, 2005.0])
+    recommender = LiveRecommender([["05", "06"]], str(log), clock=lambda: next(times))
+    try:
+        assert recommender.recommend("01") == ["02"]
+        assert recommender.recommend("05") == ["06"]
+        track_library.increment_play_count("07")
+        track_library.increment_play_count("08")
+        assert recommender.recommend("08") == ["07"]
+    finally:
+        recommender.close()
+
+
+def test_model_builds_from_playlists(library):
+    model = JukeboxModel()
+    model.add_tracks_to_playlist(["03", "04"])
+    try:
+        assert model.recommend("03") == ["04"]
+    finally:
+        model.close()
+
+
+def test_playlist_edits_after_the_build_are_counted(library, tmp_path):
+    model = JukeboxModel(PlaylistStore(str(tmp_path / "playlists.jbpl")))
+    model.add_tracks_to_playlist(["01", "02"])
+    try:
+        assert model.recommend("01") == ["02"]
+        assert model.recommend("05") == []
+        model.add_tracks_to_playlist(["05", "06"])
+        assert sorted(model.recommend("05")) == ["01", "02", "06"]
+        assert model.recommender.weight("01", "05") == 1
+        model.move_in_playlist("06", -1)  # 01 02 06 05
+        model.recommender.apply_batch()
+        assert model.recommender.weight("05", "06") == 2 and model.recommender.weight("01", "06") == 2
+        model.remove_from_playlist("02")
+        assert model.recommender.weight("01", "02") == 1  # Weights only grow
+
+        (tmp_path / "mix.txt").write_text("08\n09\n")
+        model.import_playlists(str(tmp_path / "mix.txt"))
+        assert model.recommend("08") == ["09"]
+        model.open_playlist("mix")
+        assert model.recommender.weight("08", "09") == 1  # Counted once, on import
+    finally:
+        model.close()
+    model.add_to_playlist("07")
+    assert model.playlist._listeners == []
+
+
+def test_model_builds_in_worker_threads(library, monkeypatch):
+    release = threading.Event()
+    for cls in (ArtistIndex, LiveRecommender):
+        def slow_build(self, *args, build=cls.build):
+            release.wait(5)
+            build(self, *args)
+        monkeypatch.setattr(cls, "build", slow_build)
+
+    model = JukeboxModel()
+    model.add_tracks_to_playlist(["01", "02"])
+    try:
+        model.build_in_background("artist_index")
+        model.build_in_background("recommender")
+        assert model.recommend("01") == [] and model.poll_builds() == []
+        model.add_tracks_to_playlist(["03"])  # Noticed while the builds run
+        track_library.update("04", artist="Solo")
+        track_library.increment_play_count("05")
+        track_library.increment_play_count("06")
+        release.set()
+
+        deadline = time.monotonic() + 5
+        installed = []
+        while model.pending_builds() and time.monotonic() < deadline:
+            installed += model.poll_builds()
+            time.sleep(0.01)
+        assert sorted(installed) == ["artist_index", "recommender"]
+        assert model.recommend("01") == ["02", "03"]
+        assert model.recommend("05") == ["06"]
+        assert model.artist_index.get("solo").track_ids == {"04": None}
+    finally:
+        release.set()
+        model.close()
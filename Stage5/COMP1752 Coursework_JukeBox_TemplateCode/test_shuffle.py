@@ -0,0 +1,59 @@
+import itertools
+
+import pytest
+
+from shuffle import HOLD_LIMIT, ShuffleEngine
+
+
+@pytest.mark.parametrize("size", [0, 1, 2, 7, 64, 1000])
+def test_each_pass_is_a_permutation(size):
+    track_ids = [f"{index:04d}" for index in range(size)]
+    order = list(ShuffleEngine(track_ids, seed=1))
+    assert sorted(order) == track_ids
+
+
+def test_same_seed_same_order():
+    track_ids = list(range(500))
+    assert list(ShuffleEngine(track_ids, seed=5)) == list(ShuffleEngine(track_ids, seed=5))
+    assert list(ShuffleEngine(track_ids, seed=5)) != list(ShuffleEngine(track_ids, seed=6))
+
+
+def test_start_skips_earlier_tracks():
+    order = list(ShuffleEngine(list(range(100)), seed=2, start=40))
+    assert sorted(order) == list(range(40, 100))
+
+
+def test_huge_sequence_is_not_copied():
+    engine = ShuffleEngine(range(10 ** 12), seed=3)
+    first = [engine.next() for _ in range(1000)]
+    assert len(set(first)) == 1000
+    assert all(0 <= track_id < 10 ** 12 for track_id in first)
+
+
+def test_no_repeat_holds_across_passes():
+    engine = ShuffleEngine(list(range(20)), seed=4, no_repeat=15, repeat=True)
+    order = list(itertools.islice(engine, 400))
+    for position, track_id in enumerate(order):
+        assert track_id not in order[max(0, position - 15):position]
+
+
+def test_artists_are_spread_apart():
+    artists = {index: f"artist {index % 5}" for index in range(200)}
+    engine = ShuffleEngine(list(artists), artist_of=artists.get, seed=7, artist_gap=4)
+    order = list(engine)
+    assert sorted(order) == list(artists)
+    played = [artists[track_id] for track_id in order]
+    for position, artist in enumerate(played[:-HOLD_LIMIT]):
+        assert artist not in played[max(0, position - 4):position]
+
+
+def test_impossible_constraints_still_produce_everything():
+    engine = ShuffleEngine(list(range(300)), artist_of=lambda track_id: "same", seed=8, artist_gap=3)
+    assert sorted(engine) == list(range(300))
+    assert len(engine._held) <= HOLD_LIMIT
+
+
+def test_peek_does_not_consume():
+    engine = ShuffleEngine(list(range(50)), seed=9)
+    upcoming = engine.peek(5)
+    assert [engine.next() for _ in range(5)] == upcoming
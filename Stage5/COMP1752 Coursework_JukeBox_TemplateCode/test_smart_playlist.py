@@ -0,0 +1,138 @@
+import random
+
+import pytest
+
+import track_library
+from jukebox_model import JukeboxModel
+from library_item import LibraryItem
+from smart_playlist import SmartPlaylist, SmartPlaylists
+
+
+@pytest.fixture
+def smart(empty_library):
+    empty_library["01"] = LibraryItem("Hello", "Adele", 4, 10)
+    empty_library["02"] = LibraryItem("Someone Like You", "Adele", 5, 3)
+    empty_library["03"] = LibraryItem("Skyfall", "Adele", 2, 7)
+    empty_library["04"] = LibraryItem("Hotel California", "Eagles", 5, 1)
+    playlists = SmartPlaylists()
+    yield playlists
+    playlists.close()
+
+
+def test_rules_select_matching_tracks(smart):
+    playlist = smart.add(SmartPlaylist("Good Adele", [("rating", ">=", 4), ("artist", "==", " adele")]))
+    assert playlist.ids() == ["01", "02"]
+    assert playlist.artist == "adele"
+
+
+def test_updates_apply_incrementally(smart):
+    playlist = smart.add(SmartPlaylist("Good Adele", [("rating", ">=", 4), ("artist", "==", "Adele")]))
+    track_library.set_rating("03", 4)
+    track_library.set_rating("01", 1)
+    assert sorted(playlist.ids()) == ["02", "03"]
+
+    model = JukeboxModel()
+    model.update_track("02", "Someone Like You", "Not Adele", 5)
+    assert playlist.ids() == ["03"]
+    model.update_track("04", "Hotel California", "Adele", 5)
+    assert sorted(playlist.ids()) == ["03", "04"]
+
+
+def test_top_played_follows_play_counts(smart):
+    top = smart.add(SmartPlaylist("Top 2", order_by="play_count", limit=2))
+    assert top.ids() == ["01", "03"]
+    track_library.increment_play_count("04", 20)
+    assert top.ids() == ["04", "01"]
+    track_library.add("05", LibraryItem("New", "Band", 0, 15))
+    assert top.ids() == ["04", "05"]
+    track_library.remove("04")
+    assert top.ids() == ["05", "01"]
+
+
+def test_member_falling_behind_is_replaced(smart):
+    top = smart.add(SmartPlaylist("Top rated", order_by="rating", limit=2))
+    assert top.ids() == ["04", "02"]
+    JukeboxModel().update_track("04", "Hotel California", "Eagles", 0)
+    assert top.ids() == ["02", "01"]
+
+
+def test_removed_playlist_stops_updating(smart):
+    playlist = smart.add(SmartPlaylist("Fives", [("rating", "==", 5)]))
+    assert smart.remove("Fives")
+    track_library.set_rating("01", 5)
+    assert "01" not in playlist
+    assert smart.names() == []
+
+
+def test_invalid_rules():
+    with pytest.raises(ValueError):
+        SmartPlaylist("Bad", [("colour", "==", "red")])
+    with pytest.raises(ValueError):
+        SmartPlaylist("Bad", [("rating", "contains", 3)])
+    with pytest.raises(ValueError):
+        SmartPlaylist("Bad", limit=10)
+    for data in [None, {"name": " "}, {"name": "Bad", "rules": [1]}, {"name": "Bad", "rules": [["name", "==", 4]]},
+                 {"name": "Bad", "descending": "no"}, {"name": "Bad", "order_by": "rating", "limit": 0}]:
+        with pytest.raises(ValueError):
+            SmartPlaylist.from_dict(data)
+
+
+def test_definitions_are_saved_and_loaded(smart, tmp_path):
+    path = tmp_path / "smart.json"
+    model = JukeboxModel(smart_playlist_file=str(path))
+    model.save_smart_playlist(SmartPlaylist("Top Adele", [("artist", "==", "Adele")], order_by="play_count", limit=2))
+    model.save_smart_playlist(SmartPlaylist("Fives", [("rating", "==", 5)]))
+    assert model.delete_smart_playlist("Fives") and not model.delete_smart_playlist("Fives")
+    model.close()
+
+    model = JukeboxModel(smart_playlist_file=str(path))
+    assert model.smart_playlists.names() == ["Top Adele"]
+    assert model.smart_playlists.get("Top Adele").to_dict() == {
+        "name": "Top Adele", "rules": [["artist", "==", "adele"]], "order_by": "play_count", "descending": True,
+        "limit": 2}
+    assert [track_id for track_id, _ in model.smart_playlist_tracks("Top Adele")] == ["01", "03"]
+    model.close()
+
+
+def test_damaged_definitions_are_kept(smart, tmp_path):
+    path = tmp_path / "smart.json"
+    path.write_text("{not json")
+    model = JukeboxModel(smart_playlist_file=str(path))
+    model.save_smart_playlist(SmartPlaylist("Fives", [("rating", "==", 5)]))
+    assert isinstance(model.smart_playlist_error, ValueError)
+    assert path.read_text() == "{not json"
+    model.close()
+
+
+def test_random_updates_match_full_evaluation(smart, empty_library):
+    rng = random.Random(3)
+    artists = ["Adele", "Eagles", "Queen", "Abba"]
+    for index in range(200):
+        empty_library[f"{index:03d}"] = LibraryItem(
+            f"Song {index}", rng.choice(artists), rng.randint(0, 5), rng.randint(0, 50)
+        )
+    definitions = [
+        SmartPlaylist("Top 10", order_by="play_count", limit=10),
+        SmartPlaylist("Lowest 5", order_by="rating", descending=False, limit=5),
+        SmartPlaylist("Queen 4+", [("artist", "==", "queen"), ("rating", ">=", 4)], order_by="name"),
+        SmartPlaylist("Song 1x", [("name", "contains", "song 1")]),
+    ]
+    for playlist in definitions:
+        smart.add(playlist)
+
+    model = JukeboxModel()
+    for _ in range(500):
+        track_id = rng.choice(list(empty_library))
+        action = rng.random()
+        if action < 0.5:
+            track_library.increment_play_count(track_id, rng.randint(1, 5))
+        elif action < 0.8:
+            track_library.set_rating(track_id, rng.randint(0, 5))
+        else:
+            track = empty_library[track_id]
+            model.update_track(track_id, track.name, rng.choice(artists), rng.randint(0, 5))
+
+    for playlist in definitions:
+        expected = SmartPlaylist(playlist.name, playlist.rules, playlist.order_by, playlist.descending, playlist.limit)
+        expected.rebuild(empty_library.items())
+        assert playlist.ids() == expected.ids()
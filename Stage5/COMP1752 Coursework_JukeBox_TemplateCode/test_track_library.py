@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+import tracemalloc
+
+import pytest
+
+import track_library
+from jukebox_model import read_tracks_csv
+from library_item import LibraryItem
+
+
+@pytest.fixture
+def library(empty_library):
+    empty_library["01"] = LibraryItem("Hello", "Adele", 4, 10, "images/hello.png")
+    empty_library["02"] = LibraryItem("Hotel, California", "Eagles", 5, 1)
+    empty_library["03"] = LibraryItem("Skyfall", "Adele", 2, 7)
+    return empty_library
+
+
+class CountingWriter:
+    # A file-like object that only counts what it is given
+    def __init__(self):
+        self.writes = 0
+        self.characters = 0
+
+    def write(self, text):
+        self.writes += 1
+        self.characters += len(text)
+
+
+def test_list_all_lists_every_track(library):
+    assert track_library.list_all() == (
+        "01 Hello - Adele ****\n"
+        "02 Hotel, California - Eagles *****\n"
+        "03 Skyfall - Adele **\n"
+    )
+
+
+def test_csv_export_reads_back(library):
+    stream = io.StringIO()
+    assert track_library.export(stream, "csv") == 3
+    stream.seek(0)
+    assert next(csv.reader(io.StringIO(stream.getvalue()))) == track_library.CSV_HEADER
+    pairs = list(read_tracks_csv(stream))
+    assert [track_id for track_id, _ in pairs] == ["01", "02", "03"]
+    assert pairs[1][1].name == "Hotel, California"
+    assert pairs[0][1].image_path == "images/hello.png"
+    assert (pairs[0][1].play_count, pairs[0][1].rating) == (10, 4)
+
+
+def test_jsonl_export_with_filter(library):
+    stream = io.StringIO()
+    written = track_library.export(stream, "jsonl", where=lambda track_id, track: track.artist == "Adele")
+    assert written == 2
+    rows = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [row["id"] for row in rows] == ["01", "03"]
+    assert rows[1] == {"id": "03", "name": "Skyfall", "artist": "Adele", "play_count": 7,
+                       "image_path": None, "rating": 2}
+
+
+def test_export_writes_in_chunks(library):
+    writer = CountingWriter()
+    pairs = ((str(number), LibraryItem("Song", "Band", 3)) for number in range(2500))
+    assert track_library.export(writer, "text", pairs, chunk_rows=1000) == 2500
+    assert writer.writes == 3
+    with pytest.raises(ValueError):
+        track_library.export(writer, "xml")
+
+
+def test_export_memory_does_not_grow_with_track_count():
+    def peak(count):
+        pairs = ((str(number), LibraryItem(f"Song {number}", "Band", number % 6)) for number in range(count))
+        tracemalloc.start()
+        try:
+            track_library.export(CountingWriter(), "csv", pairs)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    assert peak(100_000) < peak(10_000) * 2
@@ -1,5 +1,31 @@
+import collections
+import csv
+import io
+import itertools
+import json
+import os
+import stat
+import tempfile
+
 from library_item import LibraryItem
+from instrumentation import timed
+
+# Column order of tracks_data.csv
+CSV_HEADER = ["ID", "Title", "Artist", "Play Count", "Image Path", "Rating"]
+EXPORT_FORMATS = ["text", "csv", "jsonl"]
+EXPORT_CHUNK_ROWS = 1000  # Rows formatted and written per stream.write()
+SAVE_BUFFER = 1024 * 1024  # Write buffer of save_csv()
 
+# A change to the library, passed to subscribers so indexes can update in place.
+#   kind   "add", "remove" or "update"
+#   key    the track ID
+#   field  for "update", the LibraryItem attribute that changed (None otherwise)
+#   old    the previous value, or the removed item for "remove"
+#   new    the new value, or the added item for "add"
+#   played True when a play_count update comes from plays (increment_play_count),
+#          False when the count was set, e.g. by an edit or a catalog reload
+LibraryChange = collections.namedtuple("LibraryChange", ["kind", "key", "field", "old", "new", "played"],
+                                       defaults=(False,))
 
 library = {}
 library["01"] = LibraryItem("Another Brick in the Wall", "Pink Floyd", 4)
@@ -8,15 +34,190 @@ library["03"] = LibraryItem("Highway to Hell ", "AC/DC", 2)
 library["04"] = LibraryItem("Shape of You", "Ed Sheeran", 1)
 library["05"] = LibraryItem("Someone Like You", "Adele", 3)
 
+_listeners = []
+_dirty = set()  # Track IDs added, changed or removed since the last save
+_saved_stats = {}  # Absolute path -> (mtime_ns, size) of the file save_csv() last wrote there
+
+
+def subscribe(callback):
+    # Call callback(change) after every change made through this module
+    _listeners.append(callback)
+
+
+def unsubscribe(callback):
+    _listeners.remove(callback)
+
+
+def _notify(kind, key, field=None, old=None, new=None, played=False):
+    change = LibraryChange(kind, key, field, old, new, played)
+    for callback in list(_listeners):
+        callback(change)
+
+
+def add(key, item):
+    # Add or replace a track
+    old = library.get(key)
+    library[key] = item
+    _dirty.add(key)
+    if _listeners:
+        if old is not None:
+            _notify("remove", key, old=old)
+        _notify("add", key, new=item)
+
+
+def remove(key):
+    # Remove a track, returning it, or None if it was not in the library
+    item = library.pop(key, None)
+    if item is not None:
+        _dirty.add(key)
+        if _listeners:
+            _notify("remove", key, old=item)
+    return item
+
+
+def update(key, **fields):
+    # Set LibraryItem attributes, notifying subscribers of each value that changed
+    item = library.get(key)
+    if item is None:
+        return None
+    for field, value in fields.items():
+        old = getattr(item, field)
+        if value != old:
+            setattr(item, field, value)
+            _dirty.add(key)
+            if _listeners:
+                _notify("update", key, field, old, value)
+    return item
+
+
+def is_dirty():
+    # Whether the library has changed since it was last saved or marked clean
+    return bool(_dirty)
+
+
+def dirty_keys():
+    return set(_dirty)
+
+
+def mark_clean(keys=None):
+    # The library, or the given tracks, now match the file, e.g. straight after loading it
+    if keys is None:
+        _dirty.clear()
+    else:
+        _dirty.difference_update(keys)
+
+
+def saved_stat(path):
+    # (mtime_ns, size) of the file save_csv() last wrote to path, or None
+    return _saved_stats.get(os.path.abspath(path))
 
+
+@timed()
+def save_csv(path):
+    # Write the whole library as tracks_data.csv rows, returning the row count.
+    # Rows go through large buffered writes to a temporary file next to path,
+    # which then replaces it in one rename, so readers and a crash mid-save
+    # see either the old file or the new one. The dirty set is swapped out
+    # first: changes made while the rows are written stay dirty for the next
+    # save, and a failed save puts the swapped-out keys back.
+    global _dirty
+    saving, _dirty = _dirty, set()
+    pairs = list(library.items())
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        handle, temp_path = tempfile.mkstemp(prefix=".tracks-", suffix=".csv", dir=directory)
+    except BaseException:
+        _dirty.update(saving)
+        raise
+    try:
+        with os.fdopen(handle, "w", newline="", buffering=SAVE_BUFFER) as file:
+            export(file, "csv", pairs)
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(path):
+            os.chmod(temp_path, stat.S_IMODE(os.stat(path).st_mode))
+        os.replace(temp_path, path)
+        saved = os.stat(path)
+        _saved_stats[os.path.abspath(path)] = (saved.st_mtime_ns, saved.st_size)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        _dirty.update(saving)
+        raise
+    return len(pairs)
+
+
+@timed()
 def list_all():
-    output = ""
-    for key in library:
-        item = library[key]
-        output += f"{key} {item.info()}\n"
-    return output
+    buffer = io.StringIO()
+    export(buffer)
+    return buffer.getvalue()
+
+
+def export(stream, output_format="text", pairs=None, where=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    # Write (track_id, track) pairs, the whole library by default, to a text
+    # file-like object and return how many were written. Rows are formatted
+    # and written chunk_rows at a time, so memory stays the same however
+    # many tracks there are. where(track_id, track) keeps only matching rows.
+    #   text   "ID Name - Artist ***" lines, as list_all() shows them
+    #   csv    tracks_data.csv rows with its header
+    #   jsonl  one JSON object per line
+    # Text rows are formatted directly rather than through the cached
+    # info() strings, which would otherwise be kept for every track exported.
+    try:
+        format_rows = _EXPORT_FORMATTERS[output_format]
+    except KeyError:
+        raise ValueError(f"Unknown export format {output_format!r}") from None
+    pairs = iter(library.items() if pairs is None else pairs)
+    if where is not None:
+        pairs = ((track_id, track) for track_id, track in pairs if where(track_id, track))
+
+    if output_format == "csv":
+        stream.write(",".join(CSV_HEADER) + "\n")
+    written = 0
+    while True:
+        rows = list(itertools.islice(pairs, chunk_rows))
+        if not rows:
+            return written
+        stream.write(format_rows(rows))
+        written += len(rows)
 
 
+def _format_text(rows):
+    return "".join(
+        f"{track_id} {track.name} - {track.artist} {track.stars()}\n"
+        for track_id, track in rows
+    )
+
+
+def _format_csv(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(
+        (track_id, track.name, track.artist, track.play_count, track.image_path or "", track.rating)
+        for track_id, track in rows
+    )
+    return buffer.getvalue()
+
+
+def _format_jsonl(rows):
+    # The same text json.dumps() gives for the row dict, without building the dict
+    quote = json.encoder.encode_basestring_ascii
+    return "".join(
+        f'{{"id": {quote(track_id)}, "name": {_json_text(quote, track.name)}, '
+        f'"artist": {_json_text(quote, track.artist)}, "play_count": {track.play_count}, '
+        f'"image_path": {_json_text(quote, track.image_path)}, "rating": {track.rating}}}\n'
+        for track_id, track in rows
+    )
+
+
+def _json_text(quote, value):
+    return "null" if value is None else quote(value)
+
+
+_EXPORT_FORMATTERS = {"text": _format_text, "csv": _format_csv, "jsonl": _format_jsonl}
+
+
+@timed()
 def get_name(key):
     try:
         item = library[key]
@@ -25,6 +226,7 @@ def get_name(key):
         return None
 
 
+@timed()
 def get_artist(key):
     try:
         item = library[key]
@@ -33,6 +235,7 @@ def get_artist(key):
         return None
 
 
+@timed()
 def get_rating(key):
     try:
         item = library[key]
@@ -41,14 +244,21 @@ def get_rating(key):
         return -1
 
 
+@timed()
 def set_rating(key, rating):
     try:
         item = library[key]
-        item.rating = rating
     except KeyError:
         return
+    old = item.rating
+    item.rating = rating
+    if rating != old:
+        _dirty.add(key)
+        if _listeners:
+            _notify("update", key, "rating", old, rating)
 
 
+@timed()
 def get_play_count(key):
     try:
         item = library[key]
@@ -57,9 +267,15 @@ def get_play_count(key):
         return -1
 
 
-def increment_play_count(key):
+@timed()
+def increment_play_count(key, amount=1):
     try:
         item = library[key]
-        item.play_count += 1
     except KeyError:
-        return
\ No newline at end of file
+        return
+    old = item.play_count
+    item.play_count += amount
+    if amount:
+        _dirty.add(key)
+        if _listeners:
+            _notify("update", key, "play_count", old, item.play_count, played=True)